@@ -0,0 +1,253 @@
+import hashlib
+import os
+import sqlite3
+import struct
+import sys
+import time
+import msgpack
+from logging_config import logger
+from analysis_model import DeckReport, REPORT_FORMAT_VERSION
+from slide_parser import PART_FORMAT_VERSION
+
+CACHE_FILENAME = 'analysis_cache.sqlite3'
+
+# Taille maximale par défaut des rapports conservés (octets)
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+
+# Délai d'attente du verrou SQLite lorsque plusieurs processus écrivent (secondes)
+LOCK_TIMEOUT = 30
+
+# Fin du répertoire central (EOCD) et ses variantes ZIP64
+EOCD_SIGNATURE = b'PK\x05\x06'
+EOCD_STRUCT = struct.Struct('<4s4H2LH')
+EOCD64_LOCATOR_SIGNATURE = b'PK\x06\x07'
+EOCD64_LOCATOR_STRUCT = struct.Struct('<4sLQL')
+EOCD64_SIGNATURE = b'PK\x06\x06'
+EOCD64_STRUCT = struct.Struct('<4sQ2H2L4Q')
+# Commentaire ZIP maximal + enregistrement EOCD
+MAX_EOCD_SEARCH = 0xFFFF + EOCD_STRUCT.size
+
+# Taille (octets) du hachage BLAKE2 du contenu d'une partie, ajouté à son CRC dans la clé du cache
+PART_DIGEST_SIZE = 16
+PART_DIGEST_CHUNK_SIZE = 1024 * 1024
+
+def default_cache_dir():
+    """Retourne le répertoire de cache de l'utilisateur pour l'application."""
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~\\AppData\\Local')
+        return os.path.join(base, 'Slim_PPTX', 'Cache')
+    if sys.platform == 'darwin':
+        return os.path.expanduser('~/Library/Caches/Slim_PPTX')
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'slim_pptx')
+
+def _central_directory_offset(f, file_size):
+    """Retourne la position du début du répertoire central, lue dans l'enregistrement de fin du ZIP."""
+    search_size = min(file_size, MAX_EOCD_SEARCH)
+    f.seek(file_size - search_size)
+    tail = f.read(search_size)
+    position = tail.rfind(EOCD_SIGNATURE)
+    if position < 0 or position + EOCD_STRUCT.size > len(tail):
+        raise ValueError("Fin du répertoire central introuvable")
+    cd_offset = EOCD_STRUCT.unpack_from(tail, position)[6]
+    if cd_offset != 0xFFFFFFFF:
+        return cd_offset
+
+    # Archive ZIP64 : le localisateur précède l'enregistrement EOCD
+    locator_position = position - EOCD64_LOCATOR_STRUCT.size
+    if locator_position < 0:
+        raise ValueError("Localisateur ZIP64 introuvable")
+    signature, _, eocd64_offset, _ = EOCD64_LOCATOR_STRUCT.unpack_from(tail, locator_position)
+    if signature != EOCD64_LOCATOR_SIGNATURE:
+        raise ValueError("Localisateur ZIP64 invalide")
+    f.seek(eocd64_offset)
+    record = EOCD64_STRUCT.unpack(f.read(EOCD64_STRUCT.size))
+    if record[0] != EOCD64_SIGNATURE:
+        raise ValueError("Fin du répertoire central ZIP64 invalide")
+    return record[9]
+
+def fingerprint(file_path):
+    """Empreinte rapide d'un PPTX : taille, date de modification et hachage du répertoire central.
+
+    Le répertoire central contient le CRC, la taille et la position de chaque partie :
+    son hachage suffit à détecter une modification du contenu sans lire l'archive entière.
+    """
+    stat = os.stat(file_path)
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_path, 'rb') as f:
+        f.seek(_central_directory_offset(f, stat.st_size))
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return f"{REPORT_FORMAT_VERSION}:{stat.st_size}:{stat.st_mtime_ns}:{digest.hexdigest()}"
+
+def part_digest(data):
+    """Hachage BLAKE2 du contenu d'une partie, donné en octets ou en flux (lu par blocs)."""
+    digest = hashlib.blake2b(digest_size=PART_DIGEST_SIZE)
+    if isinstance(data, bytes):
+        digest.update(data)
+    else:
+        for chunk in iter(lambda: data.read(PART_DIGEST_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class AnalysisCache:
+    """Cache persistant des rapports d'analyse (SQLite), indexé par l'empreinte des fichiers.
+
+    Les rapports sont stockés en msgpack. Le cache conserve aussi le résultat de l'analyse
+    de chaque partie XML (diapositive, layout, relations...), indexé par son CRC, sa taille
+    et un hachage BLAKE2 de son contenu (voir part_digest) : une présentation modifiée n'a
+    besoin de réanalyser que ses parties changées.
+    Au-delà de max_bytes, les entrées les moins récemment utilisées sont supprimées.
+    Une erreur de la base n'empêche jamais l'analyse : le cache se comporte alors comme
+    s'il était vide.
+    """
+
+    def __init__(self, path=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path or os.path.join(default_cache_dir(), CACHE_FILENAME)
+        self.max_bytes = max_bytes
+        self._connection = None
+        # Résultats par partie et dates d'utilisation, écrits en une fois par put()
+        self._pending_parts = {}
+        self._touched_parts = set()
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=LOCK_TIMEOUT)
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS reports ('
+                'fingerprint TEXT PRIMARY KEY, data BLOB NOT NULL, '
+                'size INTEGER NOT NULL, last_used REAL NOT NULL)')
+            self._connection.execute('CREATE INDEX IF NOT EXISTS reports_last_used ON reports (last_used)')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS parts ('
+                'key TEXT PRIMARY KEY, data BLOB NOT NULL, '
+                'size INTEGER NOT NULL, last_used REAL NOT NULL)')
+            self._connection.execute('CREATE INDEX IF NOT EXISTS parts_last_used ON parts (last_used)')
+            self._connection.commit()
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"Cache d'analyse désactivé ({self.path}) : {str(e)}")
+            self.close()
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def key_for(self, file_path):
+        """Retourne l'empreinte du fichier, ou None si le cache est inactif ou le fichier illisible."""
+        if self._connection is None:
+            return None
+        try:
+            return fingerprint(file_path)
+        except (OSError, ValueError) as e:
+            logger.debug(f"Empreinte impossible pour {file_path} : {str(e)}")
+            return None
+
+    def get(self, file_path, key=None):
+        """Retourne le rapport en cache pour le fichier, ou None s'il est absent ou périmé."""
+        if self._connection is None:
+            return None
+        try:
+            key = key or fingerprint(file_path)
+            row = self._connection.execute('SELECT data FROM reports WHERE fingerprint = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            self._connection.execute('UPDATE reports SET last_used = ? WHERE fingerprint = ?', (time.time(), key))
+            self._connection.commit()
+            report = DeckReport.from_msgpack(row[0])
+        except (OSError, ValueError, sqlite3.Error) as e:
+            logger.warning(f"Lecture du cache d'analyse impossible pour {file_path} : {str(e)}")
+            return None
+        # Le même contenu peut avoir été analysé sous un autre chemin
+        report.file_path = file_path
+        logger.info(f"Analyse retrouvée dans le cache : {file_path}")
+        return report
+
+    def put(self, file_path, report, key=None):
+        """Enregistre le rapport du fichier puis applique la limite de taille."""
+        if self._connection is None:
+            return
+        try:
+            key = key or fingerprint(file_path)
+            data = report.to_msgpack()
+            self._connection.execute('INSERT OR REPLACE INTO reports VALUES (?, ?, ?, ?)',
+                                     (key, data, len(data), time.time()))
+            self._write_parts()
+            self._evict()
+            self._connection.commit()
+        except (OSError, ValueError, sqlite3.Error) as e:
+            logger.warning(f"Écriture dans le cache d'analyse impossible pour {file_path} : {str(e)}")
+
+    @staticmethod
+    def _part_key(kind, crc, size, digest):
+        # Le CRC32 seul laisse passer des collisions : le hachage BLAKE2 identifie le contenu
+        return f"{kind}:{PART_FORMAT_VERSION}:{crc:08x}:{size}:{digest}"
+
+    def get_part(self, kind, crc, size, digest):
+        """Retourne le résultat mis en cache pour une partie (type, CRC, taille, part_digest), ou None."""
+        if self._connection is None:
+            return None
+        key = self._part_key(kind, crc, size, digest)
+        if key in self._pending_parts:
+            return self._pending_parts[key]
+        try:
+            row = self._connection.execute('SELECT data FROM parts WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            self._touched_parts.add(key)
+            return msgpack.unpackb(row[0], raw=False)
+        except (ValueError, sqlite3.Error) as e:
+            logger.warning(f"Lecture du cache des parties impossible : {str(e)}")
+            return None
+
+    def put_part(self, kind, crc, size, digest, value):
+        """Mémorise le résultat d'une partie ; il est écrit dans la base avec le rapport (put)."""
+        if self._connection is not None:
+            self._pending_parts[self._part_key(kind, crc, size, digest)] = value
+
+    def discard_parts(self):
+        """Oublie les parties mémorisées depuis le dernier put (nouvelle analyse, ou analyse échouée)."""
+        self._pending_parts.clear()
+        self._touched_parts.clear()
+
+    def _write_parts(self):
+        now = time.time()
+        for key, value in self._pending_parts.items():
+            data = msgpack.packb(value, use_bin_type=True)
+            self._connection.execute('INSERT OR REPLACE INTO parts VALUES (?, ?, ?, ?)', (key, data, len(data), now))
+        self._connection.executemany('UPDATE parts SET last_used = ? WHERE key = ?',
+                                     [(now, key) for key in self._touched_parts])
+        logger.debug(f"Cache d'analyse : {len(self._pending_parts)} partie(s) ajoutée(s), "
+                     f"{len(self._touched_parts)} réutilisée(s)")
+        self._pending_parts.clear()
+        self._touched_parts.clear()
+
+    def _evict(self):
+        """Supprime les entrées les moins récemment utilisées jusqu'à repasser sous max_bytes."""
+        total = self._connection.execute(
+            'SELECT (SELECT COALESCE(SUM(size), 0) FROM reports) + (SELECT COALESCE(SUM(size), 0) FROM parts)'
+        ).fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for table, column, key, size, _ in self._connection.execute(
+                "SELECT 'reports', 'fingerprint', fingerprint, size, last_used FROM reports "
+                "UNION ALL SELECT 'parts', 'key', key, size, last_used FROM parts ORDER BY last_used").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._connection.execute(f'DELETE FROM {table} WHERE {column} = ?', (key,))
+            total -= size
+            evicted += 1
+        logger.debug(f"Cache d'analyse : {evicted} entrée(s) supprimée(s), {total} octets conservés")
+
+    def clear(self):
+        if self._connection is None:
+            return
+        self._connection.execute('DELETE FROM reports')
+        self._connection.execute('DELETE FROM parts')
+        self._connection.commit()
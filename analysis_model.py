@@ -0,0 +1,182 @@
+import json
+import posixpath
+import msgpack
+
+# Version du format sérialisé, à incrémenter si les champs changent
+REPORT_FORMAT_VERSION = 2
+
+class ImageRecord:
+    """Image d'une présentation, identifiée par sa partie dans le paquet (ex: ppt/media/image1.png)."""
+
+    __slots__ = ('part_name', 'size', 'width', 'height', 'format', 'dpi', 'slide_index', 'used', 'is_hidden',
+                 'cropped', 'crop_left', 'crop_top', 'crop_right', 'crop_bottom', 'display_width_cm', 'display_height_cm')
+
+    def __init__(self, part_name, size=0, width=0, height=0, format=None, dpi=0.0, slide_index=None, used=False,
+                 is_hidden=False, cropped=False, crop_left=0.0, crop_top=0.0, crop_right=0.0, crop_bottom=0.0,
+                 display_width_cm=0.0, display_height_cm=0.0):
+        self.part_name = part_name
+        self.size = size
+        self.width = width
+        self.height = height
+        # Format (PNG, JPEG...) et résolution horizontale enregistrés dans le fichier (0 si absente)
+        self.format = format
+        self.dpi = dpi
+        self.slide_index = slide_index
+        self.used = used
+        self.is_hidden = is_hidden
+        self.cropped = cropped
+        self.crop_left = crop_left
+        self.crop_top = crop_top
+        self.crop_right = crop_right
+        self.crop_bottom = crop_bottom
+        self.display_width_cm = display_width_cm
+        self.display_height_cm = display_height_cm
+
+    @property
+    def filename(self):
+        return posixpath.basename(self.part_name)
+
+    @property
+    def crop_ratio(self):
+        """Part moyenne de l'image masquée par le rognage (0-1)."""
+        if not self.cropped:
+            return 0.0
+        return min((self.crop_left + self.crop_right + self.crop_top + self.crop_bottom) / 4, 1.0)
+
+    @property
+    def real_dpi(self):
+        """Résolution réelle à l'affichage (1 pouce = 2.54 cm), ou None sans dimensions d'affichage."""
+        if not self.width or not self.display_width_cm:
+            return None
+        return self.width / (self.display_width_cm / 2.54)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{name: data[name] for name in cls.__slots__ if name in data})
+
+    def __repr__(self):
+        return f"ImageRecord({self.part_name!r}, size={self.size}, {self.width}x{self.height})"
+
+class LayoutRecord:
+    """Layout d'une présentation et les images référencées par ses relations."""
+
+    __slots__ = ('layout_id', 'name', 'type', 'used', 'images')
+
+    def __init__(self, layout_id, name=None, type='unknown', used=False, images=None):
+        self.layout_id = layout_id
+        self.name = name if name is not None else f'Layout {layout_id}'
+        self.type = type
+        self.used = used
+        # Noms des parties média (ppt/media/...) référencées par le layout
+        self.images = list(images or [])
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{name: data[name] for name in cls.__slots__ if name in data})
+
+    def __repr__(self):
+        return f"LayoutRecord({self.layout_id!r}, {self.name!r}, used={self.used}, images={len(self.images)})"
+
+class DeckReport:
+    """Résultat de l'analyse d'un fichier PPTX, sérialisable en JSON et en msgpack.
+
+    Les images sont indexées par nom de partie ; les statistiques (poids, pourcentages)
+    sont calculées à partir des enregistrements.
+    """
+
+    __slots__ = ('file_path', 'file_size', 'used_images', 'unused_images', 'layouts', 'layout_images')
+
+    def __init__(self, file_path, file_size=0, used_images=None, unused_images=None, layouts=None, layout_images=None):
+        self.file_path = file_path
+        self.file_size = file_size
+        # Images des diapositives : part_name -> ImageRecord
+        self.used_images = used_images or {}
+        # Images supprimables : part_name -> ImageRecord
+        self.unused_images = unused_images or {}
+        # Layouts utilisés : layout_id -> LayoutRecord
+        self.layouts = layouts or {}
+        # Images des layouts utilisés : part_name -> ImageRecord
+        self.layout_images = layout_images or {}
+
+    @property
+    def cropped_images(self):
+        """Images des diapositives rognées : part_name -> ImageRecord."""
+        return {part_name: record for part_name, record in self.used_images.items() if record.cropped}
+
+    @property
+    def used_layout_ids(self):
+        return {layout_id for layout_id, layout in self.layouts.items() if layout.used}
+
+    @property
+    def layout_used_filenames(self):
+        """Noms de fichiers des images référencées par les layouts utilisés."""
+        return {posixpath.basename(part_name) for layout in self.layouts.values() if layout.used
+                for part_name in layout.images}
+
+    @property
+    def percentage_cropped(self):
+        if not self.used_images:
+            return 0
+        return len(self.cropped_images) / len(self.used_images) * 100
+
+    @property
+    def total_cropped_size(self):
+        """Poids estimé des parties rognées, en octets."""
+        return sum(record.size * record.crop_ratio for record in self.cropped_images.values())
+
+    @property
+    def total_unused_size(self):
+        """Poids total des images non utilisées, en octets."""
+        return sum(record.size for record in self.unused_images.values())
+
+    def to_dict(self):
+        return {
+            'version': REPORT_FORMAT_VERSION,
+            'file_path': self.file_path,
+            'file_size': self.file_size,
+            'used_images': [record.to_dict() for record in self.used_images.values()],
+            'unused_images': [record.to_dict() for record in self.unused_images.values()],
+            'layouts': [layout.to_dict() for layout in self.layouts.values()],
+            'layout_images': [record.to_dict() for record in self.layout_images.values()]
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get('version') != REPORT_FORMAT_VERSION:
+            raise ValueError(f"Version de rapport non supportée : {data.get('version')}")
+
+        def records(items):
+            return {item['part_name']: ImageRecord.from_dict(item) for item in items}
+
+        return cls(
+            data['file_path'],
+            data.get('file_size', 0),
+            used_images=records(data.get('used_images', [])),
+            unused_images=records(data.get('unused_images', [])),
+            layouts={item['layout_id']: LayoutRecord.from_dict(item) for item in data.get('layouts', [])},
+            layout_images=records(data.get('layout_images', []))
+        )
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), ensure_ascii=False)
+
+    @classmethod
+    def from_json(cls, text):
+        return cls.from_dict(json.loads(text))
+
+    def to_msgpack(self):
+        return msgpack.packb(self.to_dict(), use_bin_type=True)
+
+    @classmethod
+    def from_msgpack(cls, data):
+        return cls.from_dict(msgpack.unpackb(data, raw=False))
+
+    def __repr__(self):
+        return (f"DeckReport({self.file_path!r}, used={len(self.used_images)}, "
+                f"unused={len(self.unused_images)}, layouts={len(self.layouts)})")
@@ -0,0 +1,148 @@
+import multiprocessing
+import os
+import signal
+import time
+from multiprocessing.connection import wait
+from logging_config import logger
+
+try:
+    import resource
+except ImportError:
+    # Module indisponible sous Windows : la limite mémoire n'est alors pas appliquée
+    resource = None
+
+# Intervalle maximal entre deux vérifications des délais (secondes)
+POLL_INTERVAL = 0.5
+# Délai laissé à un processus pour se terminer une fois son résumé envoyé (secondes)
+JOIN_GRACE = 5
+
+def _apply_memory_limit(max_memory):
+    """Limite l'espace d'adressage du processus courant (POSIX uniquement)."""
+    if not max_memory:
+        return
+    if resource is None:
+        logger.warning("Limite mémoire non supportée sur ce système, elle est ignorée")
+        return
+    resource.setrlimit(resource.RLIMIT_AS, (max_memory, max_memory))
+
+def _run_file(conn, worker, file_path, worker_kwargs, max_memory, summary_fields):
+    """Point d'entrée du processus isolé chargé d'un seul fichier."""
+    start = time.monotonic()
+    if hasattr(os, 'setpgrp'):
+        # Groupe de processus propre au fichier : un arrêt emporte aussi les processus
+        # de rognage qu'il a lancés
+        os.setpgrp()
+    try:
+        _apply_memory_limit(max_memory)
+        summary = worker(file_path, **worker_kwargs)
+    except BaseException as e:
+        summary = _failure(file_path, f"{type(e).__name__}: {e}", start, summary_fields)
+    try:
+        conn.send(summary)
+    finally:
+        conn.close()
+
+def _failure(file_path, error, start, summary_fields):
+    """Résumé d'échec avec les mêmes clés que les résumés du worker (summary_fields), les autres à None."""
+    summary = dict.fromkeys(summary_fields or ('file', 'status', 'error', 'seconds'))
+    summary.update({'file': file_path, 'status': 'error', 'error': error,
+                    'seconds': round(time.monotonic() - start, 3)})
+    return summary
+
+def _kill(process):
+    """Arrête le processus d'un fichier et, sous POSIX, tout son groupe (processus de rognage compris)."""
+    if hasattr(os, 'killpg'):
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            # Groupe pas encore créé par le processus, ou déjà vide
+            pass
+    if process.is_alive():
+        process.kill()
+    process.join()
+
+def run_batch(files, worker, jobs=None, timeout=None, max_memory=None, worker_kwargs=None, summary_fields=None):
+    """Traite des fichiers dans des processus isolés et produit un résumé par fichier, au fil des fins de traitement.
+
+    - Chaque fichier est traité dans son propre processus : un plantage, un dépassement
+      de délai (timeout, en secondes) ou de mémoire (max_memory, en octets) ne marque
+      en échec que ce fichier.
+    - Les fichiers sont lancés du plus gros au plus petit ; dès qu'un processus se
+      libère il prend le fichier suivant, ce qui équilibre la charge entre les cœurs.
+    - Sous POSIX, chaque fichier a son propre groupe de processus : un arrêt (délai dépassé,
+      interruption du lot) emporte aussi les processus lancés par le worker.
+
+    worker : fonction de niveau module worker(file_path, **worker_kwargs) -> dict.
+    summary_fields : clés des résumés du worker, reprises (à None) dans les résumés d'échec.
+    """
+    worker_kwargs = worker_kwargs or {}
+    jobs = max(1, jobs or os.cpu_count() or 1)
+
+    # Tri par taille croissante : pop() prend le plus gros fichier restant, pour éviter
+    # qu'un gros fichier lancé en dernier allonge tout le lot
+    pending = sorted(files, key=lambda f: os.path.getsize(f) if os.path.isfile(f) else 0)
+    running = {}
+
+    logger.info(f"Traitement de {len(files)} fichier(s) avec {jobs} processus"
+                + (f", délai {timeout} s" if timeout else "")
+                + (f", mémoire {max_memory // (1024 * 1024)} Mo" if max_memory else ""))
+
+    try:
+        yield from _schedule(pending, running, worker, jobs, timeout, max_memory, worker_kwargs, summary_fields)
+    finally:
+        # Lot interrompu (Ctrl+C, générateur abandonné) : les groupes encore actifs sont arrêtés
+        for reader, (process, _, _) in running.items():
+            _kill(process)
+            reader.close()
+
+def _schedule(pending, running, worker, jobs, timeout, max_memory, worker_kwargs, summary_fields):
+    while pending or running:
+        # Démarrage de nouveaux processus tant qu'il reste des places
+        while pending and len(running) < jobs:
+            file_path = pending.pop()
+            reader, writer = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(target=_run_file,
+                                              args=(writer, worker, file_path, worker_kwargs, max_memory,
+                                                    summary_fields))
+            process.start()
+            writer.close()
+            running[reader] = (process, file_path, time.monotonic())
+
+        # Attente d'un résultat, d'une fin de processus ou de la prochaine échéance
+        now = time.monotonic()
+        wait_time = POLL_INTERVAL
+        if timeout:
+            next_deadline = min(started + timeout for _, _, started in running.values())
+            wait_time = max(0.0, min(wait_time, next_deadline - now))
+        ready = wait(list(running) + [process.sentinel for process, _, _ in running.values()], wait_time)
+
+        for reader in list(running):
+            process, file_path, started = running[reader]
+            summary = None
+            if reader in ready or process.sentinel in ready:
+                try:
+                    if reader.poll():
+                        summary = reader.recv()
+                except (EOFError, OSError):
+                    pass
+                # Résumé reçu ou tube fermé : le processus doit se terminer dans le délai de grâce,
+                # sinon (threads, atexit, processus enfants) il est arrêté avec son groupe
+                process.join(JOIN_GRACE)
+                if process.is_alive():
+                    logger.warning(f"Processus de {file_path} arrêté : il ne s'est pas terminé après son résumé")
+                if summary is None or process.is_alive():
+                    _kill(process)
+                if summary is None:
+                    summary = _failure(file_path, f"Processus interrompu (code {process.exitcode})", started,
+                                       summary_fields)
+                    logger.error(f"Échec du traitement de {file_path} : processus interrompu (code {process.exitcode})")
+            elif timeout and time.monotonic() - started > timeout:
+                _kill(process)
+                summary = _failure(file_path, f"Délai dépassé ({timeout} s)", started, summary_fields)
+                logger.error(f"Délai dépassé pour {file_path} : processus arrêté")
+            else:
+                continue
+
+            reader.close()
+            del running[reader]
+            yield summary
@@ -0,0 +1,114 @@
+import posixpath
+import numpy as np
+
+# Tolérance (pixels) sur les bords calculés, pour absorber l'arrondi des pourcentages
+EDGE_TOLERANCE = 1e-6
+# Unité des pourcentages OOXML (ST_Percentage) : 100000 = 100 %
+PERCENTAGE_UNIT = 100000
+
+class CropPlan:
+    """Parties média à produire par rognage et images (p:pic) à rediriger vers elles.
+
+    - targets : nom de la partie à écrire -> (média source, boîte en pixels (x0, y0, x1, y1)), trié
+    - pictures : partie source -> [(rId, rang de l'a:blip, partie cible, a:srcRect résiduel)],
+      le rognage résiduel (l, t, r, b) étant en ST_Percentage par rapport à la boîte
+    - retargets : (partie source, rId) -> partie cible, pour les relations dont toutes les
+      utilisations ont la même boîte (la relation est redirigée sans nouveau rId)
+    - kept : médias rognés encore utilisés tels quels (sans rognage, ou hors d'une p:pic)
+    """
+
+    def __init__(self):
+        self.targets = {}
+        self.pictures = {}
+        self.retargets = {}
+        self.kept = set()
+
+def crop_boxes(crops, sizes):
+    """Boîtes en pixels des zones visibles d'un lot d'images, en un seul calcul vectoriel.
+
+    crops : (n, 4) marges a:srcRect (l, t, r, b) en fractions, négatives pour une marge ajoutée
+    autour de l'image ; sizes : (n, 2) largeurs et hauteurs en pixels. Le rognage s'applique
+    à l'image avant la transformation de la forme (rotation, retournement) : les boîtes sont
+    donc dans le repère de l'image. Chaque boîte couvre les pixels au moins en partie visibles,
+    bornée à l'image ; le reste (fraction de pixel en bordure, marge ajoutée hors de l'image)
+    est rendu en marges résiduelles relatives à la boîte, à réécrire dans a:srcRect pour un
+    affichage identique.
+    Retourne (boxes (n, 4) x0, y0, x1, y1 ; residuals (n, 4) en fractions ; valid (n,) zone visible non vide).
+    """
+    crops = np.asarray(crops, dtype=np.float64).reshape(-1, 4)
+    sizes = np.asarray(sizes, dtype=np.float64).reshape(-1, 2)
+    # Bords de la zone visible en pixels de l'image : gauche, haut, droite, bas
+    edges = np.concatenate([crops[:, :2] * sizes, (1 - crops[:, 2:]) * sizes], axis=1)
+    boxes = np.concatenate([np.floor(edges[:, :2] + EDGE_TOLERANCE), np.ceil(edges[:, 2:] - EDGE_TOLERANCE)], axis=1)
+    boxes = np.clip(boxes, 0, np.tile(sizes, 2)).astype(np.int64)
+    box_sizes = np.tile(boxes[:, 2:] - boxes[:, :2], 2)
+    valid = (box_sizes[:, 0] > 0) & (box_sizes[:, 1] > 0) & (edges[:, 2] > edges[:, 0]) & (edges[:, 3] > edges[:, 1])
+    residuals = np.concatenate([edges[:, :2] - boxes[:, :2], boxes[:, 2:] - edges[:, 2:]], axis=1)
+    residuals = np.divide(residuals, box_sizes, out=np.zeros_like(residuals), where=box_sizes > 0)
+    return boxes, residuals, valid
+
+def _crop_part_name(media_name, number, taken):
+    """Nom libre pour le rognage n° number d'un média (ex: ppt/media/image3_crop2.png)."""
+    base, extension = posixpath.splitext(media_name)
+    candidate = f'{base}_crop{number}{extension}'
+    while taken(candidate):
+        number += 1
+        candidate = f'{base}_crop{number}{extension}'
+    return candidate
+
+def plan_crops(uses, sizes, taken):
+    """Une partie par zone visible distincte de chaque média, sans toucher aux autres utilisations.
+
+    uses : média -> [(partie source, rId, rang de l'a:blip ou None, rognage (l, t, r, b) ou None)] ;
+    un rang None désigne une utilisation dont le rognage ne peut pas être appliqué (arrière-plan,
+    remplissage, mosaïque, groupe...) et qui garde donc le média d'origine.
+    sizes : média -> (largeur, hauteur) en pixels ; un média sans taille (image vectorielle,
+    format inconnu) n'est pas rogné. taken : indique si un nom de partie est pris.
+    Les boîtes de toutes les images sont calculées en une passe (crop_boxes) ; une image dont
+    la boîte couvre toute l'image (marges ajoutées seulement) n'est pas rognée. Si le média
+    n'est plus utilisé tel quel, sa première boîte (ordre trié) le remplace sous le même nom ;
+    sinon, chaque boîte devient une nouvelle partie. Le plan ne dépend que de ses entrées.
+    Retourne un CropPlan.
+    """
+    plan = CropPlan()
+    rows = [(media_name, source_part, rId, ordinal, crop)
+            for media_name in sorted(uses) if media_name in sizes
+            for source_part, rId, ordinal, crop in uses[media_name] if ordinal is not None]
+    if not rows:
+        return plan
+    boxes, residuals, valid = crop_boxes([row[4] for row in rows], [sizes[row[0]] for row in rows])
+    full = (boxes[:, :2] == 0).all(axis=1) & (boxes[:, 2:] == np.array([sizes[row[0]] for row in rows])).all(axis=1)
+    cropped = valid & ~full
+    residuals = np.rint(residuals * PERCENTAGE_UNIT).astype(np.int64)
+
+    by_media = {}
+    for position, row in enumerate(rows):
+        if cropped[position]:
+            by_media.setdefault(row[0], []).append((row[1], row[2], row[3], tuple(boxes[position].tolist()),
+                                                    tuple(residuals[position].tolist())))
+    for media_name, media_crops in sorted(by_media.items()):
+        # Relations qui gardent le média d'origine pour au moins une utilisation
+        cropped_uses = {(source_part, ordinal) for source_part, _, ordinal, _, _ in media_crops}
+        kept_rels = {(source_part, rId) for source_part, rId, ordinal, _ in uses[media_name]
+                     if (source_part, ordinal) not in cropped_uses}
+        if kept_rels:
+            plan.kept.add(media_name)
+
+        names = {}
+        for number, box in enumerate(sorted({box for _, _, _, box, _ in media_crops}), 1):
+            if number == 1 and not kept_rels:
+                names[box] = media_name
+            else:
+                names[box] = _crop_part_name(media_name, number, lambda name: taken(name) or name in plan.targets)
+            plan.targets[names[box]] = (media_name, box)
+
+        by_rel = {}
+        for source_part, rId, ordinal, box, residual in media_crops:
+            target = names[box]
+            plan.pictures.setdefault(source_part, []).append((rId, ordinal, target, residual))
+            by_rel.setdefault((source_part, rId), set()).add(target)
+        for rel, targets in sorted(by_rel.items()):
+            if rel not in kept_rels and len(targets) == 1:
+                plan.retargets[rel] = next(iter(targets))
+    plan.targets = dict(sorted(plan.targets.items()))
+    return plan
@@ -0,0 +1,185 @@
+import io
+import time
+import numpy as np
+from PIL import Image
+from logging_config import logger
+
+# Seuil de similarité structurelle (SSIM) en dessous duquel un encodage avec perte est refusé
+DEFAULT_SSIM_THRESHOLD = 0.98
+# Bornes de la recherche de qualité JPEG
+MIN_JPEG_QUALITY = 50
+MAX_JPEG_QUALITY = 95
+# Côté des fenêtres du calcul du SSIM (pixels)
+SSIM_WINDOW = 8
+# Constantes de stabilisation du SSIM pour des valeurs sur 8 bits
+SSIM_C1 = (0.01 * 255) ** 2
+SSIM_C2 = (0.03 * 255) ** 2
+# Nombre maximal de couleurs d'une image en palette
+PALETTE_COLORS = 256
+# Modes Pillow de plus de 8 bits par canal (PNG 16 bits en niveaux de gris...) : leur conversion
+# en 8 bits (palette, JPEG, canaux du SSIM) perd de l'information
+HIGH_DEPTH_MODES = ('I', 'I;16', 'I;16B', 'I;16L', 'I;16N', 'F')
+
+def ssim(reference, candidate):
+    """SSIM moyen de deux tableaux 2D de même taille, sur des fenêtres SSIM_WINDOW x SSIM_WINDOW disjointes."""
+    height, width = reference.shape
+    window = min(SSIM_WINDOW, height, width)
+    rows, columns = height // window, width // window
+    shape = (rows, window, columns, window)
+    x = reference[:rows * window, :columns * window].astype(np.float64).reshape(shape)
+    y = candidate[:rows * window, :columns * window].astype(np.float64).reshape(shape)
+    mean_x = x.mean(axis=(1, 3))
+    mean_y = y.mean(axis=(1, 3))
+    var_x = x.var(axis=(1, 3))
+    var_y = y.var(axis=(1, 3))
+    covariance = (x * y).mean(axis=(1, 3)) - mean_x * mean_y
+    index = ((2 * mean_x * mean_y + SSIM_C1) * (2 * covariance + SSIM_C2)
+             / ((mean_x ** 2 + mean_y ** 2 + SSIM_C1) * (var_x + var_y + SSIM_C2)))
+    return float(index.mean())
+
+def _channels(image):
+    """Canaux comparés par le SSIM : luminance, et opacité si l'image en a une."""
+    channels = [np.asarray(image.convert('L'))]
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        channels.append(np.asarray(image.convert('RGBA').getchannel('A')))
+    return channels
+
+def similarity(reference_channels, candidate):
+    """Plus faible SSIM, canal par canal, entre l'image de référence et un candidat décodé."""
+    return min(ssim(reference, channel) for reference, channel in zip(reference_channels, _channels(candidate)))
+
+def _is_opaque(image):
+    if 'transparency' in image.info:
+        return False
+    if image.mode in ('RGBA', 'LA'):
+        return image.getchannel('A').getextrema()[0] == 255
+    return image.mode in ('RGB', 'L', 'CMYK', 'P', '1')
+
+def _save(image, format, **params):
+    output = io.BytesIO()
+    image.save(output, format=format, **params)
+    return output.getvalue()
+
+def _search_jpeg_quality(image, reference_channels, threshold, **params):
+    """Plus petite qualité JPEG dont le SSIM atteint le seuil (recherche dichotomique), ou None."""
+    if image.mode not in ('RGB', 'L', 'CMYK'):
+        image = image.convert('RGB')
+    best = None
+    low, high = MIN_JPEG_QUALITY, MAX_JPEG_QUALITY
+    while low <= high:
+        quality = (low + high) // 2
+        data = _save(image, 'JPEG', quality=quality, optimize=True, **params)
+        if similarity(reference_channels, Image.open(io.BytesIO(data))) >= threshold:
+            best = (data, quality)
+            high = quality - 1
+        else:
+            low = quality + 1
+    return best
+
+def _exact_palette(image):
+    """Image en palette sans perte si elle a au plus PALETTE_COLORS couleurs, sinon None."""
+    rgba = np.asarray(image.convert('RGBA'))
+    codes = rgba.reshape(-1, 4).view(np.uint32).ravel()
+    colors, indices = np.unique(codes, return_inverse=True)
+    if len(colors) > PALETTE_COLORS:
+        return None
+    palette = colors.view(np.uint8).reshape(-1, 4)
+    indexed = Image.fromarray(indices.reshape(rgba.shape[:2]).astype(np.uint8), 'P')
+    indexed.putpalette(palette[:, :3].tobytes())
+    if (palette[:, 3] < 255).any():
+        indexed.info['transparency'] = palette[:, 3].tobytes()
+    return indexed
+
+def _palette_candidate(image, reference_channels, threshold, **params):
+    """PNG en palette : exacte si possible, sinon quantifiée et acceptée selon le SSIM."""
+    indexed = _exact_palette(image)
+    label = 'PNG palette'
+    if indexed is None:
+        source = image if image.mode in ('RGB', 'RGBA') else image.convert('RGBA')
+        indexed = source.quantize(PALETTE_COLORS, method=Image.Quantize.FASTOCTREE, dither=Image.Dither.NONE)
+        if similarity(reference_channels, indexed) < threshold:
+            return None
+        label = 'PNG palette quantifiée'
+    params['optimize'] = True
+    if 'transparency' in indexed.info:
+        params['transparency'] = indexed.info['transparency']
+    return _save(indexed, 'PNG', **params), label
+
+class EncodeResult:
+    """Encodage retenu pour une image, avec le gain et le temps d'encodage."""
+
+    __slots__ = ('data', 'format', 'method', 'original_size', 'seconds')
+
+    def __init__(self, data, format, method, original_size, seconds):
+        self.data = data
+        self.format = format
+        self.method = method
+        self.original_size = original_size
+        self.seconds = seconds
+
+    @property
+    def delta(self):
+        """Variation de taille par rapport à l'image d'origine (négative si gain)."""
+        return len(self.data) - self.original_size
+
+def encode_image(image, source_format, original, unchanged=False, threshold=DEFAULT_SSIM_THRESHOLD, dpi=None):
+    """Choisit l'encodage le moins coûteux d'une image transformée (rognée, réduite).
+
+    - JPEG : qualité la plus basse dont le SSIM reste au-dessus du seuil ;
+    - PNG opaque de type photo (plus de 256 couleurs) : essayé aussi en JPEG ;
+    - PNG en aplats : palette exacte, ou quantifiée si le SSIM le permet ;
+    - PNG de plus de 8 bits par canal (HIGH_DEPTH_MODES) : seulement réenregistré en PNG optimisé ;
+    - autres formats : réenregistrés dans leur format.
+    original : octets de l'image d'origine ; si ses pixels n'ont pas changé (unchanged), elle
+    est conservée lorsqu'aucun encodage n'est plus petit.
+    Retourne un EncodeResult.
+    """
+    start = time.perf_counter()
+    params = {'dpi': dpi} if dpi else {}
+    original_size = len(original)
+    candidates = []
+    if source_format == 'PNG' and image.mode in HIGH_DEPTH_MODES:
+        candidates.append((_save(image, 'PNG', optimize=True, **params), 'PNG', 'PNG optimisé'))
+    elif source_format in ('JPEG', 'PNG'):
+        reference_channels = _channels(image)
+        if source_format == 'PNG':
+            candidates.append((_save(image, 'PNG', optimize=True, **params), 'PNG', 'PNG optimisé'))
+            palette = _palette_candidate(image, reference_channels, threshold, **params)
+            if palette is not None:
+                candidates.append((palette[0], 'PNG', palette[1]))
+        photo = source_format == 'JPEG' or (_is_opaque(image) and image.getcolors(PALETTE_COLORS) is None)
+        if photo:
+            found = _search_jpeg_quality(image, reference_channels, threshold, **params)
+            if found is not None:
+                candidates.append((found[0], 'JPEG', f'JPEG q{found[1]}'))
+            elif source_format == 'JPEG':
+                candidates.append((_save(image, 'JPEG', quality=MAX_JPEG_QUALITY, **params), 'JPEG', f'JPEG q{MAX_JPEG_QUALITY}'))
+    else:
+        candidates.append((_save(image, source_format or 'PNG', **params), source_format or 'PNG', 'format d\'origine'))
+
+    data, format, method = min(candidates, key=lambda candidate: len(candidate[0]))
+    if unchanged and len(data) >= original_size:
+        data, format, method = original, source_format, 'original conservé'
+    result = EncodeResult(data, format, method, original_size, time.perf_counter() - start)
+    logger.debug(f"Encodage : {method}, {original_size} -> {len(data)} octets en {result.seconds*1000:.1f} ms")
+    return result
+
+class EncodeReport:
+    """Gain en octets et temps d'encodage par image, et total de la réécriture."""
+
+    def __init__(self):
+        self.images = {}
+
+    def add(self, part_name, result):
+        self.images[part_name] = (result.method, result.original_size, len(result.data), result.seconds)
+
+    def format(self):
+        before = sum(entry[1] for entry in self.images.values())
+        after = sum(entry[2] for entry in self.images.values())
+        seconds = sum(entry[3] for entry in self.images.values())
+        lines = [f"{len(self.images)} image(s) encodée(s) : {before/1024:.2f} Ko -> {after/1024:.2f} Ko "
+                 f"en {seconds*1000:.1f} ms"]
+        for part_name, (method, original_size, size, seconds) in sorted(self.images.items()):
+            lines.append(f"  {part_name} : {method}, {original_size} -> {size} octets "
+                         f"({size - original_size:+d}) en {seconds*1000:.1f} ms")
+        return '\n'.join(lines)
@@ -0,0 +1,300 @@
+import io
+import math
+import os
+import shutil
+import subprocess
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import PIL
+from PIL import Image
+from logging_config import logger
+from image_encoder import encode_image, EncodeResult
+from crop_planner import crop_boxes
+
+# Archive source ouverte une fois par processus de travail
+_worker_zip = None
+
+# Méthode d'encodage indiquée quand la transformation a échoué (l'image d'origine est rendue)
+FAILED_METHOD = 'original (erreur)'
+
+# Le décodage limité aux lignes visibles pilote le décodeur JPEG de Pillow par des API internes
+# (Image._getdecoder, ImageFile.load_prepare, _size, decoderconfig), vérifiées pour ces versions
+# de Pillow ; ailleurs, ou si elles ont changé, le JPEG est décodé en entier avant le rognage
+PILLOW_INTERNALS_VERSIONS = ((9, 1), (12, 99))
+PILLOW_INTERNALS = (PILLOW_INTERNALS_VERSIONS[0]
+                    <= tuple(int(part) for part in PIL.__version__.split('.')[:2])
+                    <= PILLOW_INTERNALS_VERSIONS[1])
+# Marqueurs SOF (début de trame) des JPEG, qui portent la hauteur de l'image
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# Marqueurs JPEG sans segment de longueur (SOI, EOI, RSTn, TEM)
+JPEG_STANDALONE_MARKERS = {0x01, 0xD8, 0xD9} | set(range(0xD0, 0xD8))
+
+# Outil de rognage JPEG sans perte (jpegtran de libjpeg), facultatif
+JPEGTRAN = shutil.which('jpegtran')
+# Délai maximal accordé à jpegtran pour une image (secondes)
+JPEGTRAN_TIMEOUT = 30
+
+def _draft_decode(image, box, size):
+    """Prépare le décodage JPEG réduit par libjpeg (mise à l'échelle DCT 1/2, 1/4 ou 1/8).
+
+    L'échelle retenue est la plus forte qui laisse à la zone box au moins la taille cible size :
+    il ne reste ensuite qu'un petit rééchantillonnage. Retourne box ramenée à l'échelle de
+    l'image décodée (inchangée si le décodage réduit n'est pas possible).
+    """
+    width, height = image.size
+    requested = (math.ceil(width * size[0] / (box[2] - box[0])), math.ceil(height * size[1] / (box[3] - box[1])))
+    if image.draft(image.mode, requested) is None or image.size == (width, height):
+        return box
+    ratio_x, ratio_y = image.size[0] / width, image.size[1] / height
+    logger.debug(f"Décodage JPEG réduit : {width}x{height} -> {image.size[0]}x{image.size[1]}")
+    return (round(box[0] * ratio_x), round(box[1] * ratio_y),
+            min(image.size[0], round(box[2] * ratio_x)), min(image.size[1], round(box[3] * ratio_y)))
+
+def _mcu_size(image):
+    """Largeur et hauteur (pixels) d'un MCU JPEG, d'après les facteurs d'échantillonnage des composantes."""
+    layers = getattr(image, 'layer', None) or [(None, 1, 1, None)]
+    return 8 * max(layer[1] for layer in layers), 8 * max(layer[2] for layer in layers)
+
+def _lossless_crop(blob, image, box):
+    """Rogne un JPEG sans le décoder ni le réencoder (jpegtran -crop), ou retourne None.
+
+    Possible seulement si jpegtran est installé et si le coin haut-gauche de box tombe
+    sur une frontière de MCU : sinon jpegtran élargirait la zone conservée.
+    """
+    if JPEGTRAN is None:
+        return None
+    mcu_width, mcu_height = _mcu_size(image)
+    if box[0] % mcu_width or box[1] % mcu_height:
+        return None
+    geometry = f'{box[2] - box[0]}x{box[3] - box[1]}+{box[0]}+{box[1]}'
+    try:
+        completed = subprocess.run([JPEGTRAN, '-copy', 'all', '-optimize', '-crop', geometry],
+                                   input=blob, capture_output=True, check=True, timeout=JPEGTRAN_TIMEOUT)
+    except (OSError, subprocess.SubprocessError) as e:
+        logger.debug(f"Rognage sans perte impossible ({geometry}) : {e}")
+        return None
+    return completed.stdout or None
+
+def _sof_height_position(data):
+    """Position dans data des deux octets de hauteur du marqueur SOF d'un JPEG, ou None."""
+    position = 2
+    while position + 4 <= len(data):
+        if data[position] != 0xFF:
+            return None
+        marker = data[position + 1]
+        if marker == 0xFF:
+            # Octet de remplissage avant un marqueur
+            position += 1
+            continue
+        if marker in JPEG_STANDALONE_MARKERS:
+            position += 2
+            continue
+        if marker in JPEG_SOF_MARKERS:
+            return position + 5 if position + 7 <= len(data) else None
+        if marker == 0xDA:
+            return None
+        position += 2 + int.from_bytes(data[position + 2:position + 4], 'big')
+    return None
+
+def _decode_rows(image, rows):
+    """Décode seulement les rows premières lignes d'un JPEG ouvert (image.tile non encore lu).
+
+    La hauteur déclarée dans le marqueur SOF est ramenée à ces lignes (à l'échelle du décodage
+    réduit éventuel) : libjpeg décode une image complète plus courte, puis parcourt les
+    marqueurs restants sans décoder leurs données. Un flux corrompu lève OSError comme un
+    décodage complet, de même qu'un flux qui s'arrête avant la dernière ligne demandée.
+    Retourne False si le JPEG ne s'y prête pas (hauteur absente du SOF), l'image est alors intacte.
+    """
+    width = image.size[0]
+    decoder_name, _, offset, args = image.tile[0]
+    scale = image.decoderconfig[0] if image.decoderconfig else 1
+    image.fp.seek(offset)
+    data = bytearray(image.fp.read())
+    position = _sof_height_position(data)
+    if position is None:
+        return False
+    height = int.from_bytes(data[position:position + 2], 'big')
+    if not height:
+        # Hauteur donnée par un marqueur DNL après les données
+        return False
+    data[position:position + 2] = min(height, rows * scale).to_bytes(2, 'big')
+
+    image._size = (width, rows)
+    image.tile = []
+    image.load_prepare()
+    decoder = Image._getdecoder(image.mode, decoder_name, args, image.decoderconfig)
+    decoder.setimage(image.im, (0, 0, width, rows))
+    try:
+        consumed, error = decoder.decode(bytes(data))
+    finally:
+        decoder.cleanup()
+    if error < 0:
+        raise OSError(f"Erreur de décodage JPEG ({error})")
+    if consumed >= 0:
+        # Le décodeur attend encore des données : flux tronqué avant la dernière ligne
+        raise OSError(f"image file is truncated ({rows} ligne(s) attendues)")
+    return True
+
+def _crop_decoded_rows(image, box):
+    """Rogne un JPEG en ne décodant que ses lignes jusqu'au bas de box.
+
+    Le JPEG se décode séquentiellement : les lignes situées sous la zone visible ne sont
+    pas décodées (ni IDCT ni conversion de couleurs). Réservé aux JPEG séquentiels et aux
+    versions de Pillow de PILLOW_INTERNALS_VERSIONS ; sinon, ou si les API internes de Pillow
+    font défaut, l'image est décodée en entier. Un JPEG tronqué avant le bas de box ou
+    corrompu lève OSError (l'image d'origine est alors gardée).
+    """
+    width, height = image.size
+    if (PILLOW_INTERNALS and len(image.tile) == 1 and image.tile[0][0] == 'jpeg' and box[3] < height
+            and not image.info.get('progressive')):
+        fp, mode = image.fp, image.mode
+        # Une ligne de MCU de plus que la zone visible : le suréchantillonnage de la chrominance
+        # de la dernière ligne visible s'appuie sur les lignes suivantes, comme en décodage complet
+        mcu_height = max(1, _mcu_size(image)[1] // (image.decoderconfig[0] if image.decoderconfig else 1))
+        rows = min(height, (-(-box[3] // mcu_height) + 1) * mcu_height)
+        try:
+            if rows < height and _decode_rows(image, rows):
+                logger.debug(f"Décodage JPEG limité à {rows} ligne(s) sur {height}")
+        except (AttributeError, TypeError) as e:
+            logger.debug(f"Décodage JPEG limité impossible ({e}) : décodage complet")
+            # Image rouverte, au même facteur de décodage réduit que box
+            fp.seek(0)
+            image = Image.open(fp)
+            image.draft(mode, (width, height))
+    return image.crop(box)
+
+def transform_image(blob, info, scale=None, box=None):
+    """Recadre l'image selon les paramètres de rognage, la réduit puis choisit son encodage.
+
+    box : zone à conserver en pixels (x0, y0, x1, y1), telle que calculée par plan_crops ;
+    sans boîte, elle est déduite des marges de rognage de info (voir crop_boxes).
+    scale : facteur de réduction calculé d'après la taille d'affichage (voir plan_downsampling) ;
+    sans facteur, l'image est convertie à 150 DPI si sa résolution déclarée est supérieure.
+    Un JPEG à réduire est décodé directement à l'échelle la plus proche (voir _draft_decode) ;
+    un JPEG seulement rogné l'est sans perte si possible (voir _lossless_crop), sinon seules ses
+    lignes jusqu'au bas de la zone visible sont décodées.
+    L'encodage est choisi par encode_image. Retourne un EncodeResult.
+    """
+    source_format = None
+    start = time.perf_counter()
+    try:
+        # Conversion du blob en image PIL (seul l'en-tête est lu, les pixels le sont au rognage)
+        image = Image.open(io.BytesIO(blob))
+        # Le format n'est connu que de l'image ouverte : crop() et resize() le perdent
+        source_format = image.format
+        
+        # Récupération de la résolution actuelle
+        current_dpi = image.info.get('dpi', (72, 72))[0]
+        
+        # Zone visible en pixels, bornée à l'image (les marges négatives ajoutent du vide autour)
+        width, height = image.size
+        if box is None:
+            boxes, _, valid = crop_boxes([(info.crop_left, info.crop_top, info.crop_right, info.crop_bottom)],
+                                         [(width, height)])
+            box = tuple(boxes[0].tolist()) if valid[0] else (0, 0, width, height)
+        
+        # Calcul des dimensions de la zone visible
+        visible_width = box[2] - box[0]
+        visible_height = box[3] - box[1]
+        
+        # Taille cible, calculée avant tout décodage
+        new_size = None
+        dpi = None
+        if scale is not None:
+            # Réduction d'après la taille d'affichage, quelle que soit la résolution déclarée
+            if scale < 1:
+                new_size = (max(1, round(visible_width * scale)), max(1, round(visible_height * scale)))
+                logger.debug(f"Réduction de l'image {info.filename} de {visible_width}x{visible_height} à "
+                             f"{new_size[0]}x{new_size[1]}")
+        # Si la résolution est supérieure à 150 DPI, on convertit
+        elif current_dpi > 150:
+            logger.debug(f"Conversion de l'image {info.filename} de {current_dpi} DPI à 150 DPI")
+            
+            # Calcul des nouvelles dimensions pour maintenir la taille physique
+            new_width = int(visible_width * (150 / current_dpi))
+            new_height = int(visible_height * (150 / current_dpi))
+            new_size = (new_width, new_height)
+            dpi = (150, 150)
+        
+        if new_size is not None and source_format == 'JPEG' and min(new_size) > 0:
+            box = _draft_decode(image, box, new_size)
+        elif new_size is None and source_format == 'JPEG' and box != (0, 0, width, height):
+            # Rognage seul : pas de réencodage, donc pas de perte de génération
+            lossless = _lossless_crop(blob, image, box)
+            if lossless is not None:
+                logger.debug(f"Image recadrée sans perte : {info.filename} - Nouvelles dimensions : "
+                             f"{visible_width}x{visible_height}")
+                return EncodeResult(lossless, source_format, 'JPEG rognage sans perte', len(blob),
+                                    time.perf_counter() - start)
+        
+        # Recadrage de l'image
+        unchanged = True
+        if box != (0, 0, *image.size):
+            image = _crop_decoded_rows(image, box) if source_format == 'JPEG' else image.crop(box)
+            unchanged = False
+            logger.debug(f"Image recadrée : {info.filename} - Nouvelles dimensions : {visible_width}x{visible_height}")
+        
+        # Redimensionnement de l'image (rééchantillonnage limité si le JPEG a été décodé réduit)
+        if new_size is not None:
+            image = image.resize(new_size, Image.Resampling.LANCZOS)
+            unchanged = False
+        
+        # Encodage le moins coûteux pour le format d'origine (qualité JPEG, palette PNG...)
+        return encode_image(image, source_format, blob, unchanged, dpi=dpi)
+            
+    except Exception as e:
+        logger.error(f"Erreur lors de la conversion de l'image {getattr(info, 'filename', 'inconnue')}: {str(e)}")
+        return EncodeResult(blob, source_format, FAILED_METHOD, len(blob), 0.0)
+
+def crop_image(blob, info, scale=None):
+    """Recadre et réduit l'image (voir transform_image) et retourne ses nouveaux octets."""
+    return transform_image(blob, info, scale).data
+
+def _crop_job(pptx_path, part_name, info, scale, box):
+    """Tâche exécutée dans un processus de travail : lit l'image dans l'archive et la rogne."""
+    global _worker_zip
+    if _worker_zip is None or _worker_zip.filename != pptx_path:
+        if _worker_zip is not None:
+            _worker_zip.close()
+        _worker_zip = zipfile.ZipFile(pptx_path, 'r')
+    return transform_image(_worker_zip.read(part_name), info, scale, box)
+
+def crop_images_parallel(pptx_path, jobs, workers=None, max_pending=None):
+    """Rogne des images du PPTX dans un pool de processus et produit (part_name, EncodeResult) dans l'ordre des jobs.
+
+    jobs : liste de (part_name, ImageRecord, facteur de réduction ou None, boîte en pixels ou None). Les octets des images sont lus par les processus
+    de travail ; au plus max_pending images (2 par processus par défaut) sont en cours
+    de traitement à la fois pour borner la mémoire. L'ordre de sortie ne dépend pas du
+    nombre de processus, le résultat est donc identique quel que soit workers.
+    """
+    jobs = list(jobs)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(jobs)))
+
+    # Un seul processus : traitement direct, sans coût de démarrage du pool
+    if workers == 1:
+        with zipfile.ZipFile(pptx_path, 'r') as zip_ref:
+            for part_name, info, scale, box in jobs:
+                yield part_name, transform_image(zip_ref.read(part_name), info, scale, box)
+        return
+
+    if max_pending is None:
+        max_pending = workers * 2
+    logger.info(f"Rognage de {len(jobs)} images avec {workers} processus")
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        job_iter = iter(jobs)
+        for part_name, info, scale, box in job_iter:
+            pending.append((part_name, executor.submit(_crop_job, pptx_path, part_name, info, scale, box)))
+            if len(pending) >= max_pending:
+                break
+        while pending:
+            part_name, future = pending.popleft()
+            yield part_name, future.result()
+            # Une place s'est libérée : soumission du job suivant
+            for next_name, next_info, next_scale, next_box in job_iter:
+                pending.append((next_name, executor.submit(_crop_job, pptx_path, next_name, next_info, next_scale, next_box)))
+                break
@@ -0,0 +1,188 @@
+import struct
+from PIL import Image
+from logging_config import logger
+from media_cache import MediaMetadata
+
+# Nombre maximal d'octets lus par la sonde avant de renoncer au profit de PIL
+MAX_PROBE_BYTES = 1024 * 1024
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# Marqueurs JPEG de début de trame (SOFn) portant les dimensions
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# Marqueurs JPEG sans segment de données
+JPEG_STANDALONE_MARKERS = {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7}
+EXIF_X_RESOLUTION = 0x011A
+EXIF_RESOLUTION_UNIT = 0x0128
+
+class _HeaderReader:
+    """Lecture séquentielle d'un flux limitée à MAX_PROBE_BYTES."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.consumed = 0
+
+    def read(self, size):
+        if self.consumed + size > MAX_PROBE_BYTES:
+            raise EOFError("En-tête trop long pour la sonde")
+        data = self.stream.read(size)
+        self.consumed += len(data)
+        if len(data) != size:
+            raise EOFError("Flux tronqué")
+        return data
+
+def _probe_png(reader):
+    """IHDR pour les dimensions, pHYs (pixels par mètre) pour la résolution."""
+    length, chunk_type = struct.unpack('>I4s', reader.read(8))
+    if chunk_type != b'IHDR' or length < 8:
+        return None
+    width, height = struct.unpack('>II', reader.read(8))
+    reader.read(length - 8 + 4)
+    dpi = 0.0
+    # Les blocs auxiliaires de l'en-tête précèdent les données d'image (IDAT)
+    while True:
+        length, chunk_type = struct.unpack('>I4s', reader.read(8))
+        if chunk_type in (b'IDAT', b'IEND'):
+            break
+        if chunk_type == b'pHYs' and length >= 9:
+            pixels_x, _, unit = struct.unpack('>IIB', reader.read(9))
+            if unit == 1:
+                dpi = pixels_x * 0.0254
+            reader.read(length - 9 + 4)
+        else:
+            reader.read(length + 4)
+    return MediaMetadata(width, height, 'PNG', float(dpi))
+
+def _exif_dpi(exif):
+    """Résolution horizontale de l'IFD0 d'un bloc EXIF (sans l'en-tête Exif\\0\\0), ou None."""
+    byte_order = {b'II': '<', b'MM': '>'}.get(exif[:2])
+    if byte_order is None:
+        return None
+    ifd_offset = struct.unpack_from(byte_order + 'I', exif, 4)[0]
+    count = struct.unpack_from(byte_order + 'H', exif, ifd_offset)[0]
+    x_resolution = unit = None
+    for i in range(count):
+        tag, field_type, _, value = struct.unpack_from(byte_order + 'HHI4s', exif, ifd_offset + 2 + i * 12)
+        if tag == EXIF_X_RESOLUTION and field_type in (5, 10):
+            # RATIONAL (5) ou SRATIONAL (10), stocké hors de l'entrée
+            rational = byte_order + ('II' if field_type == 5 else 'ii')
+            numerator, denominator = struct.unpack_from(rational, exif, struct.unpack(byte_order + 'I', value)[0])
+            x_resolution = numerator / denominator
+        elif tag == EXIF_RESOLUTION_UNIT and field_type == 3:
+            unit = struct.unpack_from(byte_order + 'H', value)[0]
+    if x_resolution is None or unit is None:
+        return None
+    # Unité 3 : pixels par centimètre
+    return x_resolution * 2.54 if unit == 3 else x_resolution
+
+def _probe_jpeg(reader):
+    """Parcourt les segments jusqu'au début des données (SOS) : SOFn, JFIF (APP0) et EXIF (APP1)."""
+    size = None
+    jfif_dpi = None
+    exif = None
+    while True:
+        byte = reader.read(1)
+        if byte != b'\xff':
+            return None
+        marker = reader.read(1)[0]
+        while marker == 0xFF:
+            # Octets de remplissage entre les marqueurs
+            marker = reader.read(1)[0]
+        if marker in JPEG_STANDALONE_MARKERS:
+            continue
+        if marker in (0xD9, 0xDA):
+            break
+        length = struct.unpack('>H', reader.read(2))[0]
+        if length < 2:
+            return None
+        segment = reader.read(length - 2)
+        if marker in JPEG_SOF_MARKERS and size is None and len(segment) >= 5:
+            height, width = struct.unpack_from('>HH', segment, 1)
+            size = width, height
+        elif marker == 0xE0 and segment.startswith(b'JFIF') and len(segment) >= 12:
+            unit = segment[7]
+            density = struct.unpack_from('>H', segment, 8)[0]
+            if unit == 1:
+                jfif_dpi = density
+            elif unit == 2:
+                jfif_dpi = density * 2.54
+        elif marker == 0xE1 and segment.startswith(b'Exif\0\0') and exif is None:
+            exif = segment[6:]
+    if size is None:
+        return None
+
+    dpi = jfif_dpi
+    if dpi is None and exif is not None:
+        # Comme PIL : un bloc EXIF sans résolution exploitable vaut 72 DPI
+        try:
+            dpi = _exif_dpi(exif)
+        except (struct.error, ZeroDivisionError):
+            dpi = None
+        if dpi is None:
+            dpi = 72
+    return MediaMetadata(size[0], size[1], 'JPEG', float(dpi or 0))
+
+def _probe_gif(header):
+    width, height = struct.unpack_from('<HH', header, 6)
+    return MediaMetadata(width, height, 'GIF', 0.0)
+
+def _probe_bmp(reader):
+    """En-tête de fichier (14 octets) puis en-tête DIB, dont la résolution en pixels par mètre."""
+    header_size = struct.unpack('<I', reader.read(4))[0]
+    if header_size == 12:
+        width, height = struct.unpack('<HH', reader.read(4))
+        return MediaMetadata(width, height, 'BMP', 0.0)
+    if header_size not in (40, 52, 56, 64, 108, 124):
+        return None
+    width, height, _, _, _, _, pixels_x = struct.unpack('<iiHHIIi', reader.read(24))
+    # Une hauteur négative indique une image enregistrée de haut en bas
+    return MediaMetadata(width, abs(height), 'BMP', pixels_x / 39.3701)
+
+def _probe_emf(header):
+    """Enregistrement EMR_HEADER : rectangle en unités du périphérique et cadre en 0.01 mm."""
+    x0, y0, x1, y1, frame_x0, _, frame_x1, _ = struct.unpack_from('<8i', header, 8)
+    dpi = 2540.0 * (x1 - x0) / (frame_x1 - frame_x0) if frame_x1 != frame_x0 else 0.0
+    # Même nom de format que PIL (WMF pour les deux formats de métafichier) : le cache des
+    # métadonnées ne dépend pas de la façon dont elles ont été lues
+    return MediaMetadata(x1 - x0, y1 - y0, 'WMF', dpi)
+
+def probe_image(stream):
+    """Lit dimensions, format et résolution dans l'en-tête d'une image (PNG, JPEG, GIF, BMP, EMF).
+
+    Seuls les premiers octets du flux sont lus. Retourne None pour un format non reconnu
+    ou un en-tête inexploitable : l'appelant se rabat alors sur PIL.
+    """
+    reader = _HeaderReader(stream)
+    try:
+        header = reader.read(2)
+        if header == b'\xff\xd8':
+            return _probe_jpeg(reader)
+        if header == b'BM':
+            reader.read(12)
+            return _probe_bmp(reader)
+        header += reader.read(6)
+        if header == PNG_SIGNATURE:
+            return _probe_png(reader)
+        if header[:6] in (b'GIF87a', b'GIF89a'):
+            return _probe_gif(header + reader.read(4))
+        if header[:4] == b'\x01\x00\x00\x00':
+            header += reader.read(36)
+            if header[40:44] == b' EMF':
+                return _probe_emf(header)
+    except (EOFError, struct.error, IndexError) as e:
+        logger.debug(f"En-tête d'image non exploitable par la sonde : {str(e)}")
+    return None
+
+def read_image_metadata(open_stream):
+    """Métadonnées d'une image : sonde de l'en-tête, puis PIL pour les autres formats (TIFF, WMF...).
+
+    open_stream : fonction retournant un nouveau flux sur l'image (ex: lambda: index.open(part_name)).
+    """
+    with open_stream() as stream:
+        metadata = probe_image(stream)
+    if metadata is not None:
+        return metadata
+    with open_stream() as stream, Image.open(stream) as image:
+        dpi = image.info.get('dpi', (0, 0))
+        if not isinstance(dpi, tuple):
+            dpi = (dpi, dpi)
+        return MediaMetadata(image.width, image.height, image.format, float(dpi[0]))
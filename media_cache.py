@@ -0,0 +1,142 @@
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from logging_config import logger
+from analysis_cache import default_cache_dir, LOCK_TIMEOUT
+
+CACHE_FILENAME = 'media_cache.sqlite3'
+
+# Nombre d'entrées conservées en mémoire et sur disque
+DEFAULT_MAX_ENTRIES = 4096
+DEFAULT_MAX_DISK_ENTRIES = 200000
+
+class MediaMetadata:
+    """Métadonnées d'une image lues dans son en-tête : dimensions, format et résolution."""
+
+    __slots__ = ('width', 'height', 'format', 'dpi')
+
+    def __init__(self, width, height, format=None, dpi=0.0):
+        self.width = width
+        self.height = height
+        self.format = format
+        self.dpi = dpi
+
+    def __repr__(self):
+        return f"MediaMetadata({self.width}x{self.height}, {self.format}, {self.dpi} DPI)"
+
+class MediaMetadataCache:
+    """Cache des métadonnées d'images, indexé par le couple (CRC32, taille) du répertoire central.
+
+    Le CRC et la taille sont connus sans lire l'image : une image déjà rencontrée, dans ce
+    fichier ou dans un autre (logos et fonds des modèles), ne voit pas son en-tête relu.
+    Les entrées sont gardées en mémoire (LRU, max_entries) et, si path est indiqué, dans une
+    base SQLite partagée entre les exécutions.
+    """
+
+    def __init__(self, path=None, max_entries=DEFAULT_MAX_ENTRIES, max_disk_entries=DEFAULT_MAX_DISK_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._connection = None
+        if path is None:
+            return
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._connection = sqlite3.connect(path, timeout=LOCK_TIMEOUT)
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS media ('
+                'crc INTEGER NOT NULL, size INTEGER NOT NULL, width INTEGER NOT NULL, height INTEGER NOT NULL, '
+                'format TEXT, dpi REAL NOT NULL, last_used REAL NOT NULL, PRIMARY KEY (crc, size))')
+            self._connection.execute('CREATE INDEX IF NOT EXISTS media_last_used ON media (last_used)')
+            self._connection.commit()
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"Cache disque des images désactivé ({path}) : {str(e)}")
+            self.close()
+
+    @classmethod
+    def persistent(cls, **kwargs):
+        """Cache conservé sur disque dans le répertoire de cache de l'utilisateur."""
+        return cls(os.path.join(default_cache_dir(), CACHE_FILENAME), **kwargs)
+
+    def close(self):
+        if self._connection is not None:
+            self.flush()
+            self._connection.close()
+            self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _remember(self, key, metadata):
+        self._entries[key] = metadata
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, crc, size):
+        """Retourne les métadonnées connues de l'image (CRC, taille), ou None."""
+        key = (crc, size)
+        metadata = self._entries.get(key)
+        if metadata is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return metadata
+        if self._connection is not None:
+            try:
+                row = self._connection.execute(
+                    'SELECT width, height, format, dpi FROM media WHERE crc = ? AND size = ?', key).fetchone()
+                if row is not None:
+                    self._connection.execute('UPDATE media SET last_used = ? WHERE crc = ? AND size = ?',
+                                             (time.time(), crc, size))
+                    metadata = MediaMetadata(*row)
+                    self._remember(key, metadata)
+                    self.hits += 1
+                    return metadata
+            except sqlite3.Error as e:
+                logger.warning(f"Lecture du cache des images impossible : {str(e)}")
+        self.misses += 1
+        return None
+
+    def put(self, crc, size, metadata):
+        """Enregistre les métadonnées de l'image (CRC, taille) ; l'écriture disque est validée par flush()."""
+        self._remember((crc, size), metadata)
+        if self._connection is None:
+            return
+        try:
+            self._connection.execute('INSERT OR REPLACE INTO media VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                     (crc, size, metadata.width, metadata.height, metadata.format,
+                                      metadata.dpi, time.time()))
+        except sqlite3.Error as e:
+            logger.warning(f"Écriture dans le cache des images impossible : {str(e)}")
+
+    def flush(self):
+        """Valide en une transaction les écritures en attente et applique la limite d'entrées sur disque."""
+        if self._connection is None:
+            return
+        try:
+            count = self._connection.execute('SELECT COUNT(*) FROM media').fetchone()[0]
+            if count > self.max_disk_entries:
+                # Suppression des entrées les moins récemment utilisées
+                self._connection.execute(
+                    'DELETE FROM media WHERE rowid IN (SELECT rowid FROM media ORDER BY last_used LIMIT ?)',
+                    (count - self.max_disk_entries,))
+            self._connection.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Mise à jour du cache des images impossible : {str(e)}")
+
+# Cache en mémoire partagé par les analyses du processus
+_default_cache = None
+
+def default_media_cache():
+    """Retourne le cache en mémoire utilisé par défaut par les analyses du processus."""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = MediaMetadataCache()
+    return _default_cache
@@ -0,0 +1,83 @@
+import hashlib
+import posixpath
+from logging_config import logger
+from package_index import rels_path_for
+from package_gc import retarget_relationship
+
+# Taille des blocs lus pour le hachage des médias
+HASH_CHUNK_SIZE = 1024 * 1024
+
+class DedupReport:
+    """Groupes de médias identiques : partie conservée, doublons retirés et octets récupérés."""
+
+    def __init__(self):
+        # Partie conservée -> doublons redirigés vers elle
+        self.groups = {}
+        self.bytes_reclaimed = 0
+        self.relationships_retargeted = 0
+
+    @property
+    def duplicates(self):
+        return sum(len(duplicates) for duplicates in self.groups.values())
+
+    def format(self):
+        lines = [f"{self.duplicates} doublon(s) de {len(self.groups)} média(s), "
+                 f"{self.bytes_reclaimed/1024:.2f} Ko récupérés, {self.relationships_retargeted} relation(s) redirigée(s)"]
+        for canonical, duplicates in sorted(self.groups.items()):
+            lines.append(f"  {canonical} <- {', '.join(sorted(duplicates))}")
+        return '\n'.join(lines)
+
+def _content_hash(index, part_name):
+    digest = hashlib.blake2b()
+    with index.open(part_name) as stream:
+        for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.digest()
+
+def find_duplicate_media(index, excluded=()):
+    """Groupes de médias au contenu identique, du moins coûteux au plus sûr.
+
+    Taille, puis CRC32 (tous deux lus dans le répertoire central), puis BLAKE2b du contenu
+    pour les seuls candidats restants. Retourne une liste de groupes triés : la première
+    partie de chaque groupe est celle qui sera conservée.
+    """
+    by_key = {}
+    for media_name, info in index.media.items():
+        if media_name not in excluded:
+            by_key.setdefault((info.file_size, info.CRC), []).append(media_name)
+
+    groups = []
+    for candidates in by_key.values():
+        if len(candidates) < 2:
+            continue
+        by_hash = {}
+        for media_name in candidates:
+            by_hash.setdefault(_content_hash(index, media_name), []).append(media_name)
+        for names in by_hash.values():
+            if len(names) > 1:
+                # Nom le plus court puis ordre alphabétique : image2.png avant image10.png
+                groups.append(sorted(names, key=lambda name: (len(name), name)))
+    return sorted(groups)
+
+def deduplicate_media(index, rewriter, excluded=()):
+    """Redirige toutes les relations vers un seul exemplaire de chaque média dupliqué.
+
+    Les .rels concernés sont corrigés dans l'archive réécrite et le graphe de l'index est
+    mis à jour : les doublons, devenus inatteignables, sont ensuite supprimés par
+    collect_garbage. excluded : médias déjà voués à la suppression, ignorés ici.
+    Retourne un DedupReport.
+    """
+    report = DedupReport()
+    graph = index.graph
+    for canonical, *duplicates in find_duplicate_media(index, set(excluded)):
+        for duplicate in duplicates:
+            for source_part, rId in list(graph.referrers.get(duplicate, ())):
+                rels_name = rels_path_for(source_part)
+                target = posixpath.relpath(canonical, posixpath.dirname(source_part) or '.')
+                rewriter.replace(rels_name, retarget_relationship(rewriter.read(rels_name), rId, target))
+                graph.retarget(source_part, rId, canonical)
+                report.relationships_retargeted += 1
+            report.bytes_reclaimed += index.infos[duplicate].compress_size
+        report.groups[canonical] = duplicates
+        logger.debug(f"Médias identiques à {canonical} : {duplicates}")
+    return report
@@ -0,0 +1,320 @@
+import posixpath
+import re
+from logging_config import logger
+from package_graph import SLIDE_LAYOUT_REL, SLIDE_MASTER_PREFIX
+from package_index import rels_path_for
+from package_writer import CONTENT_TYPES_PART
+from slide_parser import A_NS, R_NS
+
+# Préfixe des types de contenu dont le dernier segment nomme la partie (ex: ...presentationml.slideLayout+xml)
+VENDOR_CONTENT_TYPE_PREFIX = 'application/vnd.'
+
+PRESENTATION_PART = 'ppt/presentation.xml'
+# Fin des types de relation (ex: .../relationships/slide)
+SLIDE_REL = '/slide'
+SLIDE_MASTER_REL = '/slideMaster'
+
+def part_type(part_name, content_type=None):
+    """Nom court du type d'une partie pour les rapports (ex: slideLayout, theme, image/png)."""
+    if part_name.endswith('.rels'):
+        return 'relationships'
+    if content_type is None:
+        return part_name.rsplit('.', 1)[-1].lower() if '.' in part_name else 'inconnu'
+    if content_type.startswith(VENDOR_CONTENT_TYPE_PREFIX):
+        return content_type.split('+', 1)[0].rsplit('.', 1)[-1]
+    return content_type
+
+class GarbageReport:
+    """Parties supprimées et octets gagnés (compressés et décompressés), par type de partie."""
+
+    def __init__(self):
+        self.entries = {}
+        self.relationships_removed = 0
+
+    def add(self, part_type, info):
+        entry = self.entries.setdefault(part_type, {'parts': 0, 'bytes': 0, 'uncompressed_bytes': 0})
+        entry['parts'] += 1
+        entry['bytes'] += info.compress_size
+        entry['uncompressed_bytes'] += info.file_size
+
+    @property
+    def total_parts(self):
+        return sum(entry['parts'] for entry in self.entries.values())
+
+    @property
+    def total_bytes(self):
+        return sum(entry['bytes'] for entry in self.entries.values())
+
+    def format(self):
+        """Résumé lisible du rapport, une ligne par type de partie, du plus lourd au plus léger."""
+        lines = [f"{self.total_parts} parties supprimées, {self.total_bytes/1024:.2f} Ko gagnés, "
+                 f"{self.relationships_removed} relations retirées"]
+        for name, entry in sorted(self.entries.items(), key=lambda item: -item[1]['bytes']):
+            lines.append(f"  {name} : {entry['parts']} parties, {entry['bytes']/1024:.2f} Ko "
+                         f"({entry['uncompressed_bytes']/1024:.2f} Ko décompressés)")
+        return '\n'.join(lines)
+
+def _alternatives(values):
+    return b'|'.join(re.escape(value.encode('utf-8')) for value in sorted(values))
+
+def remove_relationships(rels_xml, rIds):
+    """Retire d'un fichier .rels les éléments Relationship dont l'Id est dans rIds."""
+    pattern = rb'<(?:\w+:)?Relationship\b[^>]*?\sId=(["\'])(?:' + _alternatives(rIds) + rb')\1[^>]*?(?:/>|>\s*</(?:\w+:)?Relationship>)'
+    return re.sub(pattern, b'', rels_xml)
+
+def retarget_relationship(rels_xml, rId, target):
+    """Remplace la cible (Target) de la relation rId d'un fichier .rels."""
+    def replace_target(match):
+        element = match.group(0)
+        return re.sub(rb'(\sTarget=)(["\']).*?\2', lambda m: m.group(1) + m.group(2) + target.encode('utf-8') + m.group(2), element, count=1)
+    pattern = rb'<(?:\w+:)?Relationship\b[^>]*?\sId=(["\'])' + re.escape(rId.encode('utf-8')) + rb'\1[^>]*?>'
+    return re.sub(pattern, replace_target, rels_xml, count=1)
+
+def add_relationship(rels_xml, rId, rel_type, target):
+    """Ajoute à un fichier .rels une relation interne rId de type rel_type vers target."""
+    relationship = (f'<Relationship Id="{rId}" Type="{rel_type}" Target="{target}"/>').encode('utf-8')
+    return re.sub(rb'</(?:\w+:)?Relationships\s*>', lambda match: relationship + match.group(0), rels_xml, count=1)
+
+def _namespace_prefixes(part_xml, namespace):
+    return set(re.findall(rb'xmlns:([\w.-]+)=["\']' + re.escape(namespace.encode('utf-8')) + rb'["\']', part_xml))
+
+# Balise XML : commentaire, instruction, CDATA ou déclaration (ignorés), sinon balise
+# ouvrante ou fermante (groupes : fermante, nom qualifié, attributs, balise vide)
+TAG_PATTERN = re.compile(rb'<!--.*?-->|<!\[CDATA\[.*?\]\]>|<[?!][^>]*>'
+                         rb'|<(/?)([\w.:-]+)((?:\s+[\w.:-]+\s*=\s*(?:"[^"]*"|\'[^\']*\'))*)\s*(/?)>', re.DOTALL)
+ATTRIBUTE_PATTERN = re.compile(rb'([\w.:-]+)\s*=\s*(["\'])(.*?)\2', re.DOTALL)
+XML_NS = b'http://www.w3.org/XML/1998/namespace'
+
+def _scan_elements(part_xml):
+    """Parcourt les balises d'une partie XML en résolvant les espaces de noms, quels que soient les préfixes.
+
+    Produit (fermante, match de la balise, (espace de noms, nom local), profondeur, préfixes ->
+    espaces de noms en vigueur) ; une balise ouvrante et sa fermante ont la même profondeur, une
+    balise vide n'est produite qu'une fois. Le préfixe vide désigne l'espace de noms par défaut.
+    """
+    scopes = [{b'xml': XML_NS}]
+    for match in TAG_PATTERN.finditer(part_xml):
+        closing, qualified_name, attributes, empty = match.groups()
+        if qualified_name is None:
+            continue
+        if closing:
+            bindings = scopes.pop()
+            depth = len(scopes)
+        else:
+            bindings = scopes[-1]
+            declarations = [(name, value) for name, _, value in ATTRIBUTE_PATTERN.findall(attributes)
+                            if name == b'xmlns' or name.startswith(b'xmlns:')]
+            if declarations:
+                bindings = dict(bindings)
+                bindings.update((name[6:], value) for name, value in declarations)
+            depth = len(scopes)
+            if not empty:
+                scopes.append(bindings)
+        prefix, _, local = qualified_name.rpartition(b':')
+        yield bool(closing), match, (bindings.get(prefix), local), depth, bindings
+
+def _attribute_span(part_xml, match, bindings, namespace, local):
+    """Position (début, fin) dans part_xml de la valeur d'un attribut qualifié de la balise, ou None."""
+    for attribute in ATTRIBUTE_PATTERN.finditer(part_xml, match.start(3), match.end(3)):
+        prefix, _, name = attribute.group(1).rpartition(b':')
+        # Un attribut sans préfixe n'a pas d'espace de noms (l'espace par défaut ne s'y applique pas)
+        if name == local and prefix and bindings.get(prefix) == namespace:
+            return attribute.start(3), attribute.end(3)
+    return None
+
+def repoint_blips(part_xml, blips):
+    """Remplace le rognage (a:srcRect) des images dont l'a:blip est dans blips et change leur r:embed.
+
+    blips : rang de l'a:blip parmi ceux de la partie qui ont un r:embed (ordre du document,
+    voir parse_shape_part) -> (nouveau rId ou None pour garder la relation, rognage résiduel
+    (l, t, r, b) en ST_Percentage). Seuls l'attribut r:embed et l'a:srcRect qui suit l'a:blip
+    dans son a:blipFill sont modifiés. Les éléments sont reconnus par espace de noms, quel
+    que soit leur préfixe (ou espace de noms par défaut).
+    Retourne (partie modifiée, nombre d'a:blip de blips trouvées et modifiées).
+    """
+    a_ns = A_NS.encode('utf-8')
+    r_ns = R_NS.encode('utf-8')
+    output = []
+    position = 0
+    ordinal = 0
+    patched = 0
+    # a:blip modifiée dont l'a:srcRect (élément frère) reste à réduire : profondeur et rognage
+    pending = None
+    src_rect_start = None
+    for closing, match, name, depth, bindings in _scan_elements(part_xml):
+        if pending is not None and depth < pending[0]:
+            # Fin de l'a:blipFill sans a:srcRect
+            pending = None
+        elif not closing and name == (a_ns, b'blip'):
+            embed = _attribute_span(part_xml, match, bindings, r_ns, b'embed')
+            if embed is None:
+                continue
+            if ordinal in blips:
+                rId, residual = blips[ordinal]
+                if rId is not None:
+                    output.append(part_xml[position:embed[0]])
+                    output.append(rId.encode('utf-8'))
+                    position = embed[1]
+                patched += 1
+                pending = (depth, residual)
+            ordinal += 1
+        elif pending is not None and depth == pending[0] and name == (a_ns, b'srcRect'):
+            if not closing:
+                src_rect_start = match.start()
+                if not match.group(4):
+                    continue
+            # a:srcRect complet : remplacé par le rognage résiduel, sous le même nom
+            attributes = b''.join(f' {key}="{value}"'.encode('utf-8')
+                                  for key, value in zip(('l', 't', 'r', 'b'), pending[1]) if value)
+            output.append(part_xml[position:src_rect_start])
+            output.append(b'<' + match.group(2) + attributes + b'/>')
+            position = match.end()
+            pending = None
+    output.append(part_xml[position:])
+    return b''.join(output), patched
+
+def strip_relationship_refs(part_xml, rIds):
+    """Retire d'une partie XML les attributs r:xxx (r:embed, r:link, r:id...) qui désignent les rIds."""
+    prefixes = _namespace_prefixes(part_xml, R_NS)
+    if not prefixes:
+        return part_xml
+    pattern = (rb'\s(?:' + b'|'.join(re.escape(prefix) for prefix in sorted(prefixes)) + rb'):[\w.-]+='
+               rb'(["\'])(?:' + _alternatives(rIds) + rb')\1')
+    return re.sub(pattern, b'', part_xml)
+
+def remove_content_type_overrides(content_types_xml, part_names):
+    """Retire de [Content_Types].xml les Override des parties supprimées."""
+    names = {f'/{part_name}' for part_name in part_names}
+    pattern = rb'<(?:\w+:)?Override\b[^>]*?\sPartName=(["\'])(?:' + _alternatives(names) + rb')\1[^>]*?/>'
+    return re.sub(pattern, b'', content_types_xml)
+
+def remove_elements_by_rid(part_xml, local_name, rIds):
+    """Retire d'une partie XML les éléments local_name (ex: sldLayoutId) dont le r:id est dans rIds."""
+    name = local_name.encode('utf-8')
+    pattern = (rb'<(?:\w+:)?' + name + rb'\b[^>]*?\s[\w.-]+:id=(["\'])(?:' + _alternatives(rIds)
+               + rb')\1[^>]*?(?:/>|>.*?</(?:\w+:)?' + name + rb'>)')
+    return re.sub(pattern, b'', part_xml, flags=re.DOTALL)
+
+def find_slides(index):
+    """Diapositives de la présentation (cibles des relations slide de presentation.xml)."""
+    return [target for _, rel_type, target in index.graph.edges.get(PRESENTATION_PART, ()) if rel_type.endswith(SLIDE_REL)]
+
+def find_unused_layouts(index):
+    """Layouts qu'aucune diapositive de la présentation n'utilise, et masques sans layout utilisé.
+
+    Retourne (layouts, masques) en noms de parties. Un masque dont tous les layouts sont
+    inutilisés est retiré avec eux ; les autres masques gardent leurs layouts utilisés.
+    """
+    edges = index.graph.edges
+    presentation_targets = edges.get(PRESENTATION_PART, ())
+    slides = find_slides(index)
+    used_layouts = {
+        target for slide_part in slides
+        for _, rel_type, target in edges.get(slide_part, ()) if rel_type.endswith(SLIDE_LAYOUT_REL)
+    }
+    unused_layouts = set()
+    unused_masters = set()
+    for _, rel_type, master_part in presentation_targets:
+        if not rel_type.endswith(SLIDE_MASTER_REL):
+            continue
+        layouts = {target for _, layout_type, target in edges.get(master_part, ()) if layout_type.endswith(SLIDE_LAYOUT_REL)}
+        unused_layouts.update(layouts - used_layouts)
+        if not layouts & used_layouts:
+            unused_masters.add(master_part)
+    return unused_layouts, unused_masters
+
+def prune_unused_layouts(index, rewriter):
+    """Retire les layouts inutilisés des listes p:sldLayoutIdLst des masques et les masques vides de
+    p:sldMasterIdLst de presentation.xml.
+
+    Retourne les parties à supprimer, à passer à collect_garbage qui retire les relations,
+    les types de contenu et les parties (images, thèmes) qui n'étaient utilisées que par elles.
+    """
+    unused_layouts, unused_masters = find_unused_layouts(index)
+    edges = index.graph.edges
+    for master_part in {source for source, targets in edges.items()
+                        if source.startswith(SLIDE_MASTER_PREFIX) and source not in unused_masters}:
+        dropped = {rId for rId, _, target in edges[master_part] if target in unused_layouts}
+        if dropped and rewriter.has_part(master_part):
+            rewriter.replace(master_part, remove_elements_by_rid(rewriter.read(master_part), 'sldLayoutId', dropped))
+    dropped = {rId for rId, _, target in edges.get(PRESENTATION_PART, ()) if target in unused_masters}
+    if dropped:
+        rewriter.replace(PRESENTATION_PART, remove_elements_by_rid(rewriter.read(PRESENTATION_PART), 'sldMasterId', dropped))
+    logger.info(f"Élagage : {len(unused_layouts)} layout(s) et {len(unused_masters)} masque(s) inutilisés")
+    return unused_layouts | unused_masters
+
+def add_default_content_type(content_types_xml, extension, content_type):
+    """Ajoute à [Content_Types].xml un Default pour l'extension, s'il n'y en a pas déjà un."""
+    extension = extension.encode('utf-8')
+    if re.search(rb'<(?:\w+:)?Default\b[^>]*?\sExtension=(["\'])' + re.escape(extension) + rb'\1',
+                 content_types_xml, flags=re.IGNORECASE):
+        return content_types_xml
+    default = b'<Default Extension="' + extension + b'" ContentType="' + content_type.encode('utf-8') + b'"/>'
+    return re.sub(rb'<(?:\w+:)?Types\b[^>]*?>', lambda match: match.group(0) + default, content_types_xml, count=1)
+
+def rename_part(index, rewriter, part_name, new_name, data, content_type):
+    """Écrit data sous new_name à la place de part_name et redirige vers elle toutes les relations.
+
+    Le type de contenu de la nouvelle partie est déclaré par un Default sur son extension.
+    """
+    rewriter.delete(part_name)
+    rewriter.replace(new_name, data)
+    graph = index.graph
+    for source_part, rId in list(graph.referrers.get(part_name, ())):
+        rels_name = rels_path_for(source_part)
+        target = posixpath.relpath(new_name, posixpath.dirname(source_part) or '.')
+        rewriter.replace(rels_name, retarget_relationship(rewriter.read(rels_name), rId, target))
+        graph.retarget(source_part, rId, new_name)
+    if rewriter.has_part(CONTENT_TYPES_PART):
+        content_types = remove_content_type_overrides(rewriter.read(CONTENT_TYPES_PART), [part_name])
+        extension = posixpath.splitext(new_name)[1].lstrip('.')
+        rewriter.replace(CONTENT_TYPES_PART, add_default_content_type(content_types, extension, content_type))
+
+def collect_garbage(index, rewriter, forced=()):
+    """Supprime de l'archive réécrite toutes les parties inatteignables (mark-and-sweep).
+
+    Marquage : parcours du graphe des relations depuis la racine du paquet (_rels/.rels).
+    Balayage : toute partie non marquée est supprimée avec son .rels. Les parties de forced
+    (ex: images inutilisées encore référencées par un layout) sont supprimées même si elles
+    sont atteignables ; les relations qui les désignent sont retirées des .rels et les
+    attributs r:embed/r:link correspondants du XML source. Les Override de
+    [Content_Types].xml des parties supprimées sont retirés.
+    Le XML n'est pas réanalysé : seules les balises concernées sont retirées.
+    Retourne un GarbageReport.
+    """
+    report = GarbageReport()
+    forced = {part_name for part_name in forced if index.has_part(part_name)}
+    graph = index.graph
+    live = graph.reachable(include_unused_layouts=True, excluded=forced)
+    garbage = {
+        name for name in index.infos
+        if name not in live and name != CONTENT_TYPES_PART and not name.endswith(('.rels', '/'))
+    }
+
+    for part_name in sorted(garbage):
+        rewriter.delete(part_name)
+        report.add(part_type(part_name, rewriter.content_type(part_name)), index.infos[part_name])
+        rels_name = rels_path_for(part_name)
+        if index.has_part(rels_name):
+            rewriter.delete(rels_name)
+            report.add('relationships', index.infos[rels_name])
+    logger.debug(f"Parties supprimées : {sorted(garbage)}")
+
+    # Relations des parties conservées vers des parties supprimées
+    for source_part, targets in graph.edges.items():
+        if source_part and source_part not in live:
+            continue
+        dropped = {rId for rId, _, target in targets if target in garbage}
+        if not dropped:
+            continue
+        rels_name = rels_path_for(source_part)
+        rewriter.replace(rels_name, remove_relationships(rewriter.read(rels_name), dropped))
+        report.relationships_removed += len(dropped)
+        if source_part and index.has_part(source_part):
+            rewriter.replace(source_part, strip_relationship_refs(rewriter.read(source_part), dropped))
+        logger.debug(f"Relations retirées de {rels_name} : {sorted(dropped)}")
+
+    if garbage and rewriter.has_part(CONTENT_TYPES_PART):
+        rewriter.replace(CONTENT_TYPES_PART,
+                         remove_content_type_overrides(rewriter.read(CONTENT_TYPES_PART), garbage))
+    return report
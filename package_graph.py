@@ -0,0 +1,71 @@
+from collections import deque
+
+# Fin des types de relation (ex: .../relationships/slideLayout)
+SLIDE_LAYOUT_REL = '/slideLayout'
+SLIDE_MASTER_PREFIX = 'ppt/slideMasters/'
+MEDIA_PREFIX = 'ppt/media/'
+
+class PackageGraph:
+    """Graphe des relations internes d'un paquet, construit à partir de tous ses fichiers .rels.
+
+    Chaque partie (diapositive, layout, masque, notes, graphique, SmartArt, arrière-plan,
+    aperçu OLE...) est un nœud ; chaque relation interne est un arc vers sa cible.
+    La racine du paquet (_rels/.rels) est le nœud ''.
+    """
+
+    def __init__(self, rels):
+        # Partie source -> [(rId, type, cible)] et cible -> [(partie source, rId)]
+        self.edges = {}
+        self.referrers = {}
+        for source_part, relationships in rels.items():
+            targets = self.edges.setdefault(source_part, [])
+            for rId, rel in relationships.items():
+                if rel['external']:
+                    continue
+                targets.append((rId, rel['type'], rel['target']))
+                self.referrers.setdefault(rel['target'], []).append((source_part, rId))
+
+    @classmethod
+    def from_index(cls, index):
+        return cls(index.rels)
+
+    def add(self, source_part, rId, rel_type, target):
+        """Ajoute la relation rId de source_part vers target (ex: vers une image rognée)."""
+        self.edges.setdefault(source_part, []).append((rId, rel_type, target))
+        self.referrers.setdefault(target, []).append((source_part, rId))
+
+    def retarget(self, source_part, rId, target):
+        """Fait pointer la relation rId de source_part vers target (ex: après dédoublonnage d'un média)."""
+        targets = self.edges.get(source_part, [])
+        for position, (edge_rId, rel_type, old_target) in enumerate(targets):
+            if edge_rId == rId:
+                targets[position] = (rId, rel_type, target)
+                self.referrers[old_target].remove((source_part, rId))
+                self.referrers.setdefault(target, []).append((source_part, rId))
+                return
+
+    def media_referrers(self):
+        """Retourne, pour chaque partie ppt/media référencée, la liste de ses (partie source, rId)."""
+        return {target: sources for target, sources in self.referrers.items() if target.startswith(MEDIA_PREFIX)}
+
+    def reachable(self, roots=('',), include_unused_layouts=False, excluded=()):
+        """Parties atteignables depuis roots (par défaut la racine du paquet, donc presentation.xml).
+
+        Le parcours est linéaire en nombre de relations. Sauf include_unused_layouts, les
+        relations d'un masque vers ses layouts sont ignorées : un layout n'est alors
+        atteint que par les diapositives qui l'utilisent. Les parties de excluded (vouées
+        à la suppression) ne sont ni atteintes ni traversées.
+        """
+        seen = set(roots)
+        seen.update(excluded)
+        queue = deque(roots)
+        while queue:
+            source_part = queue.popleft()
+            skip_layouts = not include_unused_layouts and source_part.startswith(SLIDE_MASTER_PREFIX)
+            for _, rel_type, target in self.edges.get(source_part, ()):
+                if skip_layouts and rel_type.endswith(SLIDE_LAYOUT_REL):
+                    continue
+                if target not in seen:
+                    seen.add(target)
+                    queue.append(target)
+        return seen.difference(excluded)
@@ -0,0 +1,210 @@
+import posixpath
+import zipfile
+import zlib
+import xml.etree.ElementTree as ET
+from contextlib import nullcontext
+from logging_config import logger
+from package_graph import PackageGraph
+from analysis_cache import part_digest
+
+RELS_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+RELS_TAG = f'{{{RELS_NS}}}Relationship'
+
+def rels_path_for(part_name):
+    """Retourne le chemin du fichier .rels associé à une partie (ex: ppt/slides/_rels/slide1.xml.rels)."""
+    directory, filename = posixpath.split(part_name)
+    return posixpath.join(directory, '_rels', f'{filename}.rels')
+
+def source_part_for(rels_name):
+    """Retourne la partie source décrite par un fichier .rels ('' pour les relations du paquet)."""
+    directory, filename = posixpath.split(rels_name)
+    base_dir = posixpath.dirname(directory)
+    return posixpath.join(base_dir, filename[:-len('.rels')])
+
+def resolve_target(source_part, target):
+    """Convertit une cible relative d'une relation en nom de partie absolu dans le ZIP."""
+    if target.startswith('/'):
+        return target.lstrip('/')
+    return posixpath.normpath(posixpath.join(posixpath.dirname(source_part), target))
+
+def _part_number(part_name, prefix):
+    """Extrait le numéro d'une partie (ex: 'ppt/slides/slide12.xml' -> '12')."""
+    filename = posixpath.basename(part_name)
+    if filename.startswith(prefix) and filename.endswith('.xml'):
+        return filename[len(prefix):-len('.xml')]
+    return None
+
+class PackageIndex:
+    """Index d'un fichier PPTX construit en une seule ouverture de l'archive.
+
+    Le répertoire central et toutes les parties .rels sont lus une fois ; les
+    fonctions d'analyse interrogent ensuite l'index au lieu de rouvrir le ZIP.
+    part_cache : AnalysisCache optionnel ; les .rels dont le CRC est connu ne sont pas relus.
+    """
+
+    def __init__(self, pptx_path, part_cache=None):
+        self.pptx_path = pptx_path
+        self.part_cache = part_cache
+        self._zip = zipfile.ZipFile(pptx_path, 'r')
+        try:
+            self.infos = {info.filename: info for info in self._zip.infolist()}
+
+            # Fichiers média, par nom, par CRC et par couple (CRC, taille décompressée)
+            self.media = {name: info for name, info in self.infos.items() if name.startswith('ppt/media/')}
+            self.media_by_crc = {}
+            self.media_by_key = {}
+            for name, info in self.media.items():
+                self.media_by_crc.setdefault(info.CRC, []).append(name)
+                self.media_by_key.setdefault((info.CRC, info.file_size), []).append(name)
+
+            # Relations de toutes les parties : partie source -> {rId: relation}
+            self.rels = {}
+            for name in self.infos:
+                if name.endswith('.rels'):
+                    self.rels[source_part_for(name)] = self._parse_rels(name)
+
+            # Slide -> layout et layout -> images
+            self.slide_layouts = {}
+            self.layout_media = {}
+            for part_name, relationships in self.rels.items():
+                slide_id = _part_number(part_name, 'slide')
+                layout_id = _part_number(part_name, 'slideLayout')
+                for rel in relationships.values():
+                    if rel['external']:
+                        continue
+                    target = rel['target']
+                    if slide_id is not None and part_name.startswith('ppt/slides/'):
+                        target_layout = _part_number(target, 'slideLayout')
+                        if target_layout is not None and target.startswith('ppt/slideLayouts/'):
+                            self.slide_layouts[slide_id] = target_layout
+                    elif layout_id is not None and part_name.startswith('ppt/slideLayouts/'):
+                        if target.startswith('ppt/media/'):
+                            self.layout_media.setdefault(layout_id, set()).add(posixpath.basename(target))
+
+            self._hidden_slides = {}
+            self._graph = None
+        except Exception:
+            self._zip.close()
+            raise
+
+        logger.debug(f"Index du paquet construit : {len(self.infos)} parties, {len(self.media)} médias, "
+                     f"{len(self.rels)} fichiers de relations")
+
+    def _read_rels(self, rels_name):
+        """Lit un fichier .rels et retourne ses relations brutes [Id, Type, Target, externe]."""
+        info = self.infos[rels_name]
+        data = self._zip.read(rels_name)
+        digest = part_digest(data) if self.part_cache is not None else None
+        if self.part_cache is not None:
+            cached = self.part_cache.get_part('rels', info.CRC, info.file_size, digest)
+            if cached is not None:
+                return cached
+        try:
+            root = ET.fromstring(data)
+        except ET.ParseError as e:
+            logger.error(f"Fichier de relations invalide {rels_name} : {str(e)}")
+            return []
+        raw = [[rel.get('Id'), rel.get('Type', ''), rel.get('Target', ''), rel.get('TargetMode') == 'External']
+               for rel in root.iter(RELS_TAG)]
+        if self.part_cache is not None:
+            self.part_cache.put_part('rels', info.CRC, info.file_size, digest, raw)
+        return raw
+
+    def _parse_rels(self, rels_name):
+        """Lit un fichier .rels et retourne ses relations indexées par Id."""
+        source_part = source_part_for(rels_name)
+        relationships = {}
+        for rId, rel_type, target, external in self._read_rels(rels_name):
+            relationships[rId] = {
+                'type': rel_type,
+                'target': target if external else resolve_target(source_part, target),
+                'external': external
+            }
+        return relationships
+
+    def close(self):
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def namelist(self):
+        return list(self.infos)
+
+    def has_part(self, part_name):
+        return part_name in self.infos
+
+    def read(self, part_name):
+        """Lit le contenu d'une partie de l'archive déjà ouverte."""
+        return self._zip.read(part_name)
+
+    def open(self, part_name):
+        """Ouvre une partie en flux, sans charger tout son contenu en mémoire."""
+        return self._zip.open(part_name)
+
+    @property
+    def graph(self):
+        """Graphe des relations du paquet (PackageGraph), construit à la première utilisation."""
+        if self._graph is None:
+            self._graph = PackageGraph.from_index(self)
+        return self._graph
+
+    def media_by_name(self, filename):
+        """Retourne le ZipInfo d'un média à partir de son nom de fichier (ex: image1.png)."""
+        return self.media.get(f'ppt/media/{filename}')
+
+    def media_names_for_crc(self, crc):
+        """Retourne les noms des médias dont le CRC32 correspond."""
+        return self.media_by_crc.get(crc, [])
+
+    def media_for_blob(self, blob):
+        """Retrouve le média correspondant à un blob via la table (CRC, taille).
+
+        En cas de collision réelle, les candidats sont départagés par comparaison des octets.
+        """
+        candidates = self.media_by_key.get((zlib.crc32(blob) & 0xFFFFFFFF, len(blob)), [])
+        if len(candidates) == 1:
+            return candidates[0]
+        for media_name in candidates:
+            if self._zip.read(media_name) == blob:
+                return media_name
+        return None
+
+    def media_for_rel(self, source_part, rId):
+        """Retourne le média ciblé par la relation rId de la partie source (ex: ppt/slides/slide1.xml)."""
+        rel = self.rels.get(source_part, {}).get(rId)
+        if rel is None or rel['external'] or rel['target'] not in self.media:
+            return None
+        return rel['target']
+
+    def layout_for_slide(self, slide_index):
+        """Retourne l'identifiant du layout utilisé par la diapositive slide{N}.xml."""
+        return self.slide_layouts.get(str(slide_index))
+
+    def media_for_layout(self, layout_id):
+        """Retourne les noms des images référencées par slideLayout{N}.xml."""
+        return self.layout_media.get(str(layout_id), set())
+
+    def is_slide_hidden(self, slide_index):
+        """Indique si la diapositive slide{N}.xml est masquée (attribut show="0")."""
+        slide_index = str(slide_index)
+        if slide_index not in self._hidden_slides:
+            hidden = False
+            slide_xml_path = f'ppt/slides/slide{slide_index}.xml'
+            if slide_xml_path in self.infos:
+                # Seule la balise racine est nécessaire : on s'arrête au premier élément
+                with self._zip.open(slide_xml_path) as slide_file:
+                    for _, element in ET.iterparse(slide_file, events=('start',)):
+                        hidden = element.get('show') == '0'
+                        break
+            self._hidden_slides[slide_index] = hidden
+        return self._hidden_slides[slide_index]
+
+def open_index(pptx_path, index=None):
+    """Retourne un contexte donnant l'index fourni, ou un index temporaire ouvert sur pptx_path."""
+    if index is not None:
+        return nullcontext(index)
+    return PackageIndex(pptx_path)
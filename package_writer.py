@@ -0,0 +1,305 @@
+import copy
+import posixpath
+import shutil
+import struct
+import sys
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+from logging_config import logger
+
+# Taille des blocs copiés d'une archive à l'autre
+COPY_CHUNK_SIZE = 1024 * 1024
+
+# En-tête local d'un membre ZIP : signature + champs fixes (30 octets)
+LOCAL_HEADER_SIGNATURE = b'PK\x03\x04'
+LOCAL_HEADER_SIZE = 30
+FLAG_ENCRYPTED = 0x01
+FLAG_DATA_DESCRIPTOR = 0x08
+ZIP64_EXTRA_ID = 0x0001
+
+# La copie brute et le niveau de compression par membre s'appuient sur des attributs internes
+# de zipfile (ZipInfo._compresslevel, ZipFile.filelist, NameToInfo, start_dir, _didModify),
+# vérifiés pour ces versions de Python ; ailleurs, l'archive est écrite par l'API publique
+ZIPFILE_INTERNALS_VERSIONS = ((3, 8), (3, 13))
+ZIPFILE_INTERNALS = ZIPFILE_INTERNALS_VERSIONS[0] <= sys.version_info[:2] <= ZIPFILE_INTERNALS_VERSIONS[1]
+ZIPFILE_WRITER_ATTRIBUTES = ('fp', 'filelist', 'NameToInfo', 'start_dir', '_didModify')
+
+CONTENT_TYPES_PART = '[Content_Types].xml'
+CONTENT_TYPES_NS = 'http://schemas.openxmlformats.org/package/2006/content-types'
+
+# Médias déjà compressés : les dégonfler à nouveau ne réduit pas leur taille
+STORED_EXTENSIONS = {
+    'jpg', 'jpeg', 'jpe', 'png', 'gif', 'wdp', 'jxr', 'webp', 'heic',
+    'mp4', 'm4v', 'mov', 'avi', 'wmv', 'mpg', 'mpeg', 'mkv', 'webm',
+    'mp3', 'm4a', 'aac', 'wma', 'ogg',
+    'zip', 'docx', 'xlsx', 'pptx', 'docm', 'xlsm', 'pptm'
+}
+STORED_CONTENT_TYPE_PREFIXES = ('image/jpeg', 'image/png', 'image/gif', 'image/vnd.ms-photo', 'video/', 'audio/mpeg', 'audio/mp4')
+
+class CompressionPolicy:
+    """Politique de compression par membre de l'archive de sortie.
+
+    Les médias déjà compressés (par extension ou type de contenu) sont stockés
+    sans compression ; le reste (XML, relations, polices...) est dégonflé avec
+    un niveau réglable.
+    """
+
+    def __init__(self, stored_extensions=None, stored_content_types=None, deflate_level=6, recompress_stored=True):
+        self.stored_extensions = {ext.lower().lstrip('.') for ext in (stored_extensions if stored_extensions is not None else STORED_EXTENSIONS)}
+        self.stored_content_types = tuple(stored_content_types if stored_content_types is not None else STORED_CONTENT_TYPE_PREFIXES)
+        self.deflate_level = deflate_level
+        # Dégonfle les membres inchangés stockés sans compression dans la source lorsque la politique le demande
+        self.recompress_stored = recompress_stored
+
+    def choose(self, part_name, content_type=None):
+        """Retourne (méthode de compression, niveau) pour une partie."""
+        extension = posixpath.splitext(part_name)[1].lower().lstrip('.')
+        if extension in self.stored_extensions:
+            return zipfile.ZIP_STORED, None
+        if content_type and content_type.startswith(self.stored_content_types):
+            return zipfile.ZIP_STORED, None
+        return zipfile.ZIP_DEFLATED, self.deflate_level
+
+DEFAULT_POLICY = CompressionPolicy()
+
+class CompressionReport:
+    """Temps et octets par choix de compression lors de l'écriture d'une archive."""
+
+    def __init__(self):
+        self.entries = {}
+
+    def add(self, choice, files, bytes_in, bytes_out, seconds):
+        entry = self.entries.setdefault(choice, {'files': 0, 'bytes_in': 0, 'bytes_out': 0, 'seconds': 0.0})
+        entry['files'] += files
+        entry['bytes_in'] += bytes_in
+        entry['bytes_out'] += bytes_out
+        entry['seconds'] += seconds
+
+    def deflate_rate(self):
+        """Débit de compression mesuré pendant l'écriture (secondes par octet), ou None."""
+        seconds = sum(e['seconds'] for c, e in self.entries.items() if c.startswith('deflate'))
+        bytes_in = sum(e['bytes_in'] for c, e in self.entries.items() if c.startswith('deflate'))
+        return seconds / bytes_in if bytes_in else None
+
+    def format(self):
+        """Résumé lisible du rapport, une ligne par choix de compression."""
+        rate = self.deflate_rate()
+        lines = []
+        for choice, entry in sorted(self.entries.items()):
+            line = (f"{choice} : {entry['files']} fichiers, {entry['bytes_in']/1024:.2f} Ko -> "
+                    f"{entry['bytes_out']/1024:.2f} Ko en {entry['seconds']*1000:.1f} ms")
+            # Les membres stockés ou copiés tels quels évitent une compression : temps économisé estimé au débit mesuré
+            if rate is not None and not choice.startswith('deflate'):
+                line += f" (≈ {entry['bytes_in'] * rate * 1000:.1f} ms de compression évités)"
+            if choice.startswith('deflate'):
+                line += f" ({(entry['bytes_in'] - entry['bytes_out'])/1024:.2f} Ko gagnés)"
+            lines.append(line)
+        return '\n'.join(lines)
+
+def _strip_extra_field(extra, header_id):
+    """Retire un champ du bloc « extra » d'un en-tête ZIP (ex: le champ ZIP64, recalculé à l'écriture)."""
+    result = b''
+    position = 0
+    while position + 4 <= len(extra):
+        field_id, field_size = struct.unpack('<HH', extra[position:position + 4])
+        field_end = position + 4 + field_size
+        if field_id != header_id:
+            result += extra[position:field_end]
+        position = field_end
+    return result
+
+def _set_compress_level(info, level):
+    """Fixe le niveau de compression d'un ZipInfo écrit par ZipFile.open(..., 'w').
+
+    Attribut public depuis Python 3.13, interne auparavant ; retourne False si le niveau
+    ne peut pas être fixé.
+    """
+    if 'compress_level' in dir(zipfile.ZipInfo):
+        info.compress_level = level
+    elif ZIPFILE_INTERNALS:
+        info._compresslevel = level
+    else:
+        return False
+    return True
+
+class PackageRewriter:
+    """Réécrit un fichier PPTX directement d'archive ZIP à archive ZIP.
+
+    Chaque membre de l'archive source est lu en flux et écrit dans l'archive de
+    sortie ; les suppressions et substitutions (médias retirés, images
+    réencodées, XML de diapositive corrigé) sont appliquées au passage, sans
+    extraction dans un répertoire temporaire. Les membres inchangés sont
+    recopiés tels quels (octets compressés, CRC et tailles d'origine) : seuls
+    les membres modifiés sont recompressés.
+    """
+
+    def __init__(self, source_path, policy=None):
+        self.source_path = source_path
+        self.policy = policy or DEFAULT_POLICY
+        self.report = CompressionReport()
+        self._source = zipfile.ZipFile(source_path, 'r')
+        self._names = set(self._source.namelist())
+        self._raw = open(source_path, 'rb')
+        self._deleted = set()
+        self._replaced = {}
+        self._content_types = None
+
+    def close(self):
+        self._raw.close()
+        self._source.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def has_part(self, part_name):
+        """Indique si part_name est pris : partie de l'archive source ou ajoutée par replace()."""
+        return part_name in self._names or part_name in self._replaced
+
+    def read(self, part_name):
+        """Lit une partie de l'archive source (ou son contenu de remplacement)."""
+        if part_name in self._replaced:
+            return self._replaced[part_name]
+        return self._source.read(part_name)
+
+    def delete(self, part_name):
+        """Retire une partie de l'archive de sortie."""
+        self._replaced.pop(part_name, None)
+        self._deleted.add(part_name)
+
+    def replace(self, part_name, data):
+        """Remplace (ou ajoute) le contenu d'une partie dans l'archive de sortie."""
+        self._deleted.discard(part_name)
+        self._replaced[part_name] = data
+
+    def content_type(self, part_name):
+        """Retourne le type de contenu d'une partie d'après [Content_Types].xml (Override, puis Default)."""
+        if self._content_types is None:
+            self._content_types = ({}, {})
+            if self.has_part(CONTENT_TYPES_PART):
+                root = ET.fromstring(self._source.read(CONTENT_TYPES_PART))
+                defaults, overrides = self._content_types
+                for default in root.iter(f'{{{CONTENT_TYPES_NS}}}Default'):
+                    defaults[default.get('Extension', '').lower()] = default.get('ContentType')
+                for override in root.iter(f'{{{CONTENT_TYPES_NS}}}Override'):
+                    overrides[override.get('PartName', '').lstrip('/')] = override.get('ContentType')
+        defaults, overrides = self._content_types
+        if part_name in overrides:
+            return overrides[part_name]
+        return defaults.get(posixpath.splitext(part_name)[1].lower().lstrip('.'))
+
+    def write(self, output_path):
+        """Écrit l'archive de sortie en un seul passage sur l'archive source."""
+        self.report = CompressionReport()
+        with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zip_out:
+            raw_copy = ZIPFILE_INTERNALS and all(hasattr(zip_out, name) for name in ZIPFILE_WRITER_ATTRIBUTES)
+            for info in self._source.infolist():
+                name = info.filename
+                if name in self._deleted:
+                    logger.debug(f"Suppression du fichier : {name}")
+                    continue
+
+                compress_type, level = self.policy.choose(name, self.content_type(name))
+
+                if name in self._replaced:
+                    self._write_member(zip_out, name, self._replaced[name], compress_type, level, info.date_time, info.external_attr)
+                    logger.debug(f"Remplacement du fichier dans l'archive : {name}")
+                    continue
+
+                # Membre inchangé : copie brute des octets compressés, sauf s'il est stocké
+                # alors que la politique demande de le dégonfler
+                recompress = (self.policy.recompress_stored and info.compress_type == zipfile.ZIP_STORED
+                              and compress_type != zipfile.ZIP_STORED)
+                if raw_copy and not info.flag_bits & FLAG_ENCRYPTED and not recompress:
+                    start = time.perf_counter()
+                    self._copy_raw(zip_out, info)
+                    self.report.add('copie brute', 1, info.file_size, info.compress_size, time.perf_counter() - start)
+                    logger.debug(f"Copie brute du fichier dans l'archive : {name}")
+                    continue
+
+                # Copie en flux avec (re)compression selon la politique
+                start = time.perf_counter()
+                out_info = zipfile.ZipInfo(name, date_time=info.date_time)
+                out_info.compress_type = compress_type
+                out_info.external_attr = info.external_attr
+                out_info.file_size = info.file_size
+                if not _set_compress_level(out_info, level):
+                    # Niveau non réglable par membre : écriture en une fois par writestr
+                    self._write_member(zip_out, name, self._source.read(info), compress_type, level,
+                                       info.date_time, info.external_attr)
+                    continue
+                with self._source.open(info) as src, zip_out.open(out_info, 'w') as dst:
+                    shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+                self.report.add(self._choice_label(compress_type, level), 1, info.file_size,
+                                out_info.compress_size, time.perf_counter() - start)
+                logger.debug(f"Ajout du fichier dans l'archive : {name}")
+
+            # Parties nouvelles, absentes de l'archive source
+            for name, data in self._replaced.items():
+                if name not in self._names:
+                    compress_type, level = self.policy.choose(name, self.content_type(name))
+                    self._write_member(zip_out, name, data, compress_type, level)
+                    logger.debug(f"Ajout du nouveau fichier dans l'archive : {name}")
+        logger.info(f"Archive écrite : {output_path} ({len(self._replaced)} fichiers remplacés, "
+                    f"{len(self._deleted)} supprimés)\n{self.report.format()}")
+        return output_path
+
+    @staticmethod
+    def _choice_label(compress_type, level):
+        if compress_type == zipfile.ZIP_STORED:
+            return 'stockage'
+        return f'deflate-{level}' if level is not None else 'deflate'
+
+    def _write_member(self, zip_out, name, data, compress_type, level, date_time=None, external_attr=None):
+        """Écrit un membre modifié avec la méthode de compression choisie et l'ajoute au rapport."""
+        start = time.perf_counter()
+        out_info = zipfile.ZipInfo(name, date_time=date_time) if date_time else zipfile.ZipInfo(name)
+        if external_attr is not None:
+            out_info.external_attr = external_attr
+        zip_out.writestr(out_info, data, compress_type=compress_type, compresslevel=level)
+        self.report.add(self._choice_label(compress_type, level), 1, len(data),
+                        zip_out.getinfo(name).compress_size, time.perf_counter() - start)
+
+    def _data_offset(self, info):
+        """Retourne la position des données compressées d'un membre dans l'archive source."""
+        self._raw.seek(info.header_offset)
+        header = self._raw.read(LOCAL_HEADER_SIZE)
+        if len(header) != LOCAL_HEADER_SIZE or header[:4] != LOCAL_HEADER_SIGNATURE:
+            raise zipfile.BadZipFile(f"En-tête local invalide pour {info.filename}")
+        name_length, extra_length = struct.unpack('<HH', header[26:30])
+        return info.header_offset + LOCAL_HEADER_SIZE + name_length + extra_length
+
+    def _copy_raw(self, zip_out, info):
+        """Copie un membre inchangé sans décompression ni recompression.
+
+        Le ZipInfo source (CRC, tailles, méthode de compression) est réutilisé ;
+        l'en-tête local est réécrit et les octets compressés sont recopiés
+        directement. Le ZipFile de sortie est ensuite mis à jour comme après
+        une écriture normale pour que le répertoire central soit complet.
+        Réservé aux versions de Python de ZIPFILE_INTERNALS_VERSIONS.
+        """
+        data_offset = self._data_offset(info)
+
+        out_info = copy.copy(info)
+        # CRC et tailles sont connus : ils sont écrits dans l'en-tête local, sans descripteur de données
+        out_info.flag_bits &= ~FLAG_DATA_DESCRIPTOR
+        out_info.extra = _strip_extra_field(info.extra, ZIP64_EXTRA_ID)
+        out_info.header_offset = zip_out.fp.tell()
+        zip_out.fp.write(out_info.FileHeader())
+
+        self._raw.seek(data_offset)
+        remaining = info.compress_size
+        while remaining > 0:
+            chunk = self._raw.read(min(COPY_CHUNK_SIZE, remaining))
+            if not chunk:
+                raise zipfile.BadZipFile(f"Données tronquées pour {info.filename}")
+            zip_out.fp.write(chunk)
+            remaining -= len(chunk)
+
+        zip_out.filelist.append(out_info)
+        zip_out.NameToInfo[out_info.filename] = out_info
+        zip_out.start_dir = zip_out.fp.tell()
+        zip_out._didModify = True
@@ -0,0 +1,164 @@
+import io
+import xml.etree.ElementTree as ET
+
+# Version du format des résultats par partie, à incrémenter si l'extraction change
+PART_FORMAT_VERSION = 4
+
+P_NS = 'http://schemas.openxmlformats.org/presentationml/2006/main'
+A_NS = 'http://schemas.openxmlformats.org/drawingml/2006/main'
+R_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+NS = {'p': P_NS, 'a': A_NS, 'r': R_NS}
+
+R_ID = f'{{{R_NS}}}id'
+R_EMBED = f'{{{R_NS}}}embed'
+PIC_TAG = f'{{{P_NS}}}pic'
+SP_TAG = f'{{{P_NS}}}sp'
+BLIP_TAG = f'{{{A_NS}}}blip'
+CSLD_TAG = f'{{{P_NS}}}cSld'
+SP_TREE_TAG = f'{{{P_NS}}}spTree'
+SLD_LAYOUT_ID_LST_TAG = f'{{{P_NS}}}sldLayoutIdLst'
+SLD_ID_LST_TAG = f'{{{P_NS}}}sldIdLst'
+SLD_MASTER_ID_LST_TAG = f'{{{P_NS}}}sldMasterIdLst'
+# Éléments de p:spTree considérés comme des formes (comme python-pptx)
+SHAPE_TAGS = {f'{{{P_NS}}}{name}' for name in ('sp', 'grpSp', 'graphicFrame', 'cxnSp', 'pic', 'contentPart')}
+# Emplacement de l'étendue (a:ext) selon le type de forme
+EXTENT_PATHS = ('p:spPr/a:xfrm/a:ext', 'p:xfrm/a:ext', 'p:grpSpPr/a:xfrm/a:ext')
+
+# Type d'espace réservé du masque dont hérite un espace réservé de layout (voir python-pptx)
+LAYOUT_BASE_PLACEHOLDER_TYPES = {
+    'body': 'body', 'chart': 'body', 'clipArt': 'body', 'ctrTitle': 'title', 'dgm': 'body',
+    'dt': 'dt', 'ftr': 'ftr', 'media': 'body', 'obj': 'body', 'pic': 'body', 'sldNum': 'sldNum',
+    'subTitle': 'body', 'tbl': 'body', 'title': 'title'
+}
+
+def _percentage(value):
+    """Convertit un ST_Percentage (ex: '12500' ou '12.5%') en fraction (0-1)."""
+    if not value:
+        return 0.0
+    if value.endswith('%'):
+        return float(value[:-1]) / 100
+    return int(value) / 100000
+
+def _extent(shape):
+    """Largeur et hauteur (EMU) appliquées directement à la forme, ou None."""
+    for path in EXTENT_PATHS:
+        ext = shape.find(path, NS)
+        if ext is not None:
+            return int(ext.get('cx', 0)), int(ext.get('cy', 0))
+    return None, None
+
+def _placeholder(shape):
+    """Index et type de l'espace réservé de la forme (p:nvXxPr/p:nvPr/p:ph), ou None."""
+    ph = shape.find('*/p:nvPr/p:ph', NS)
+    if ph is None:
+        return None
+    return int(ph.get('idx', 0)), ph.get('type', 'obj')
+
+def _collect_shape(shape, pictures, placeholders, blip_ordinals):
+    """Relève l'espace réservé et, pour une image (p:pic), la relation, la taille, le rognage
+    et le rang de son a:blip (blip_ordinals : a:blip -> rang dans la partie)."""
+    cx, cy = _extent(shape)
+    placeholder = _placeholder(shape)
+    if placeholder is not None:
+        placeholders.append([placeholder[0], placeholder[1], shape.tag == SP_TAG, cx, cy])
+    if shape.tag != PIC_TAG:
+        return
+    blip = shape.find('p:blipFill/a:blip', NS)
+    rId = blip.get(R_EMBED) if blip is not None else None
+    if rId is None:
+        return
+    src_rect = shape.find('p:blipFill/a:srcRect', NS)
+    crop = [_percentage(src_rect.get(attr)) if src_rect is not None else 0.0 for attr in ('l', 't', 'r', 'b')]
+    # Zone de la forme dans laquelle l'image rognée est étirée (a:stretch/a:fillRect), sinon mosaïque
+    stretch = shape.find('p:blipFill/a:stretch', NS)
+    fill_rect = stretch.find('a:fillRect', NS) if stretch is not None else None
+    fill = [_percentage(fill_rect.get(attr)) if fill_rect is not None else 0.0 for attr in ('l', 't', 'r', 'b')]
+    ph_idx, ph_type = placeholder if placeholder is not None else (None, None)
+    pictures.append([rId, cx, cy, *crop, ph_idx, ph_type, blip_ordinals[blip], *fill, stretch is not None])
+
+def _iterparse(source):
+    """iterparse sur un flux, ou sur le contenu XML déjà lu."""
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    return ET.iterparse(source, events=('start', 'end'))
+
+def parse_shape_part(source):
+    """Extrait d'une diapositive, d'un layout ou d'un masque ce dont l'analyse a besoin.
+
+    Le XML (flux ou octets) est lu en continu : chaque forme de premier niveau est
+    analysée dès sa fin puis vidée, l'arbre complet n'est jamais construit en mémoire.
+    Retourne un dictionnaire sérialisable :
+    - hidden : diapositive masquée (show="0")
+    - pictures : [rId, cx, cy, l, t, r, b, ph_idx, ph_type, blip, fl, ft, fr, fb, stretched] pour chaque
+      p:pic de premier niveau : rognage a:srcRect (l, t, r, b, négatifs pour une marge ajoutée),
+      rang de son a:blip parmi ceux de la partie qui ont un r:embed (ordre du document), marges
+      a:fillRect (fl, ft, fr, fb) et étirement (a:stretch ; sinon l'image est en mosaïque)
+    - placeholders : [idx, type, is_sp, cx, cy] pour chaque espace réservé
+    - layout_rids : rId des layouts d'un masque (p:sldLayoutIdLst)
+    - blips : nombre de a:blip par rId, à toute profondeur (images, groupes, remplissages, arrière-plan)
+    """
+    hidden = False
+    pictures = []
+    blips = {}
+    # a:blip de la forme de premier niveau en cours -> rang dans la partie
+    blip_ordinals = {}
+    blip_count = 0
+    placeholders = []
+    layout_rids = []
+    # Balises des éléments ouverts, de la racine à l'élément courant
+    path = []
+    for event, element in _iterparse(source):
+        if event == 'start':
+            if not path:
+                hidden = element.get('show') == '0'
+            path.append(element.tag)
+            continue
+        path.pop()
+        depth = len(path)
+        if element.tag == BLIP_TAG and element.get(R_EMBED) is not None:
+            rId = element.get(R_EMBED)
+            blips[rId] = blips.get(rId, 0) + 1
+            blip_ordinals[element] = blip_count
+            blip_count += 1
+        if depth == 3 and path[1] == CSLD_TAG and path[2] == SP_TREE_TAG:
+            # Forme de premier niveau de p:cSld/p:spTree, complète à sa balise de fin
+            if element.tag in SHAPE_TAGS:
+                _collect_shape(element, pictures, placeholders, blip_ordinals)
+            blip_ordinals.clear()
+            element.clear()
+        elif depth == 2 and path[1] == SLD_LAYOUT_ID_LST_TAG:
+            layout_rids.append(element.get(R_ID))
+        elif depth == 1:
+            element.clear()
+    return {
+        'hidden': hidden,
+        'pictures': pictures,
+        'placeholders': placeholders,
+        'layout_rids': layout_rids,
+        'blips': blips
+    }
+
+def parse_presentation_part(source):
+    """Retourne les rId des diapositives et des masques, dans l'ordre de presentation.xml."""
+    slide_rids = []
+    master_rids = []
+    path = []
+    for event, element in _iterparse(source):
+        if event == 'start':
+            path.append(element.tag)
+            continue
+        path.pop()
+        if len(path) == 2 and path[1] == SLD_ID_LST_TAG:
+            slide_rids.append(element.get(R_ID))
+        elif len(path) == 2 and path[1] == SLD_MASTER_ID_LST_TAG:
+            master_rids.append(element.get(R_ID))
+        elif len(path) == 1:
+            element.clear()
+    return {'slide_rids': slide_rids, 'master_rids': master_rids}
+
+def find_placeholder(placeholders, idx=None, ph_type=None):
+    """Premier espace réservé d'index idx ou de type ph_type, comme placeholders.get() de python-pptx."""
+    for placeholder in placeholders:
+        if (idx is not None and placeholder[0] == idx) or (ph_type is not None and placeholder[1] == ph_type):
+            return placeholder
+    return None
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Traitement en ligne de commande de fichiers PowerPoint, sans interface graphique
+Usage: python slim_pptx.py [options] <fichiers | répertoires | motifs glob> ...
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import nullcontext
+from logging_config import logger
+from slim_pptx import (analyze_pptx, create_light_version, update_pptx_with_cropped_images,
+                       ANALYSIS_BACKENDS, DEFAULT_BACKEND)
+from batch_scheduler import run_batch
+from analysis_cache import AnalysisCache
+from media_cache import MediaMetadataCache
+
+# Codes de sortie
+EXIT_OK = 0
+EXIT_FAILURES = 1
+EXIT_USAGE = 2
+
+# Fichiers produits par l'application, jamais retraités
+OUTPUT_SUFFIXES = ('_light.pptx', '_cropped.pptx')
+
+def _is_output_file(file_path):
+    return os.path.basename(file_path).lower().endswith(OUTPUT_SUFFIXES)
+
+def collect_pptx_files(paths):
+    """Développe les fichiers, répertoires (récursivement) et motifs glob en une liste de fichiers .pptx.
+
+    Les fichiers produits par l'application (voir OUTPUT_SUFFIXES) sont ignorés, même désignés
+    explicitement ou par un motif : un nouveau passage ne retraite pas les versions déjà créées.
+    """
+    files = []
+    seen = set()
+
+    def add(file_path):
+        if _is_output_file(file_path):
+            logger.info(f"Fichier produit par l'application ignoré : {file_path}")
+            return
+        key = os.path.normcase(os.path.abspath(file_path))
+        if key not in seen:
+            seen.add(key)
+            files.append(file_path)
+
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, filenames in os.walk(path):
+                dirs.sort()
+                for filename in sorted(filenames):
+                    if filename.lower().endswith('.pptx') and not _is_output_file(filename):
+                        add(os.path.join(root, filename))
+        elif os.path.isfile(path):
+            add(path)
+        else:
+            matches = sorted(glob.glob(path, recursive=True))
+            if not matches:
+                logger.warning(f"Aucun fichier ne correspond à : {path}")
+            for match in matches:
+                if os.path.isfile(match) and match.lower().endswith('.pptx'):
+                    add(match)
+    return files
+
+# Clés du résumé JSON produit pour chaque fichier, y compris en cas d'échec
+SUMMARY_FIELDS = ('file', 'status', 'error', 'size', 'unused_images', 'unused_bytes', 'percentage_cropped',
+                  'cropped_images', 'light_path', 'light_size', 'cropped_path', 'cropped_size', 'seconds')
+
+def process_file(file_path, light=True, cropped=True, workers=None, use_cache=True, backend=DEFAULT_BACKEND,
+                 prune_layouts=False, target_dpi=None):
+    """Enchaîne analyse, version allégée et version rognée pour un fichier et retourne son résumé.
+
+    use_cache : réutilise l'analyse d'un fichier inchangé et les métadonnées des images déjà vues
+    depuis les caches persistants.
+    backend : moteur d'analyse des diapositives (voir analyze_pptx).
+    prune_layouts : retire aussi de la version allégée les layouts et masques inutilisés.
+    target_dpi : réduit dans la version rognée les images affichées au-delà de cette résolution.
+    """
+    start = time.perf_counter()
+    summary = dict.fromkeys(SUMMARY_FIELDS)
+    summary.update({'file': file_path, 'status': 'ok'})
+    try:
+        summary['size'] = os.path.getsize(file_path)
+        with AnalysisCache() if use_cache else nullcontext() as cache, \
+                MediaMetadataCache.persistent() if use_cache else nullcontext() as media_cache:
+            report = analyze_pptx(file_path, cache, media_cache, backend=backend)
+        cropped_images = report.cropped_images
+        summary['unused_images'] = len(report.unused_images)
+        summary['unused_bytes'] = report.total_unused_size
+        summary['percentage_cropped'] = round(report.percentage_cropped, 2)
+        summary['cropped_images'] = len(cropped_images)
+
+        if light:
+            light_path = create_light_version(file_path, report.unused_images, prune_layouts=prune_layouts)
+            if light_path is None:
+                raise RuntimeError("Échec de la création de la version allégée")
+            summary['light_path'] = light_path
+            summary['light_size'] = os.path.getsize(light_path)
+
+        if cropped:
+            cropped_path = update_pptx_with_cropped_images(file_path, cropped_images, workers=workers,
+                                                           target_dpi=target_dpi)
+            if cropped_path is None:
+                raise RuntimeError("Échec de la création de la version rognée")
+            summary['cropped_path'] = cropped_path
+            summary['cropped_size'] = os.path.getsize(cropped_path)
+    except Exception as e:
+        logger.error(f"Erreur lors du traitement de {file_path} : {str(e)}")
+        summary['status'] = 'error'
+        summary['error'] = str(e)
+    summary['seconds'] = round(time.perf_counter() - start, 3)
+    return summary
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='slim_pptx',
+        description="Allège des fichiers PowerPoint sans interface graphique. "
+                    "Un résumé JSON par fichier est écrit sur la sortie standard.")
+    parser.add_argument('paths', nargs='+', help="fichiers .pptx, répertoires ou motifs glob")
+    parser.add_argument('--no-light', action='store_true', help="ne pas créer la version allégée")
+    parser.add_argument('--no-cropped', action='store_true', help="ne pas créer la version rognée")
+    parser.add_argument('--prune-layouts', action='store_true',
+                        help="retirer de la version allégée les layouts qu'aucune diapositive n'utilise "
+                             "et les masques restés sans layout")
+    parser.add_argument('--target-dpi', type=float, default=None,
+                        help="réduire dans la version rognée toutes les images affichées au-delà de cette "
+                             "résolution, calculée d'après leur taille sur les diapositives (ex: 150)")
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help="nombre de fichiers traités en parallèle, chacun dans son propre processus (par défaut : 1)")
+    parser.add_argument('--timeout', type=float, default=None,
+                        help="durée maximale de traitement d'un fichier, en secondes")
+    parser.add_argument('--max-memory', type=int, default=None,
+                        help="mémoire maximale par fichier, en Mo (Linux/macOS uniquement)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="processus de rognage d'images par fichier "
+                             "(par défaut : un par cœur, ou 1 avec --jobs > 1)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="ne pas utiliser le cache des analyses (fichiers déjà analysés et inchangés)")
+    parser.add_argument('--backend', default=DEFAULT_BACKEND, choices=ANALYSIS_BACKENDS,
+                        help="moteur d'analyse des diapositives : lecture en continu du XML (iterparse) "
+                             "ou chargement complet avec python-pptx")
+    parser.add_argument('--summary', default=None,
+                        help="écrit aussi les résumés JSON (une ligne par fichier) dans ce fichier")
+    parser.add_argument('--log-level', default='INFO', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                        help="niveau des messages affichés sur la console (le fichier de log reste en DEBUG)")
+    return parser
+
+def set_console_log_level(level):
+    """Applique le niveau aux seuls gestionnaires console, le fichier de log garde tous les messages."""
+    for handler in logging.getLogger().handlers:
+        if type(handler) is logging.StreamHandler:
+            handler.setLevel(level)
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    set_console_log_level(args.log_level)
+
+    files = collect_pptx_files(args.paths)
+    if not files:
+        logger.error("Aucun fichier .pptx à traiter")
+        return EXIT_USAGE
+
+    logger.info(f"{len(files)} fichier(s) à traiter")
+    summary_file = open(args.summary, 'a', encoding='utf-8') if args.summary else None
+    worker_kwargs = {'light': not args.no_light, 'cropped': not args.no_cropped, 'workers': args.workers,
+                     'use_cache': not args.no_cache, 'backend': args.backend,
+                     'prune_layouts': args.prune_layouts, 'target_dpi': args.target_dpi}
+    if args.jobs > 1 or args.timeout or args.max_memory:
+        # Chaque fichier dans un processus isolé ; le rognage reste séquentiel par fichier
+        # lorsque plusieurs fichiers sont traités en parallèle, ou lorsqu'un délai est imposé
+        # sans groupes de processus (Windows) : l'arrêt du fichier n'emporterait pas ses
+        # processus de rognage
+        if args.workers is None and (args.jobs > 1 or (args.timeout and not hasattr(os, 'killpg'))):
+            worker_kwargs['workers'] = 1
+        max_memory = args.max_memory * 1024 * 1024 if args.max_memory else None
+        summaries = run_batch(files, process_file, jobs=args.jobs, timeout=args.timeout,
+                              max_memory=max_memory, worker_kwargs=worker_kwargs, summary_fields=SUMMARY_FIELDS)
+    else:
+        summaries = (process_file(file_path, **worker_kwargs) for file_path in files)
+
+    failures = 0
+    try:
+        for summary in summaries:
+            if summary['status'] != 'ok':
+                failures += 1
+            line = json.dumps(summary, ensure_ascii=False)
+            print(line, flush=True)
+            if summary_file:
+                summary_file.write(line + '\n')
+                summary_file.flush()
+    finally:
+        if summary_file:
+            summary_file.close()
+
+    logger.info(f"Traitement terminé : {len(files) - failures} réussi(s), {failures} échec(s)")
+    return EXIT_FAILURES if failures else EXIT_OK
+
+if __name__ == "__main__":
+    sys.exit(main())
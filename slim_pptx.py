@@ -1,87 +1,117 @@
 import os
-from tkinter import Tk, Label, StringVar, Scrollbar, Text, Button, Frame
-from tkinterdnd2 import DND_FILES, TkinterDnD
+import posixpath
+import sys
 from pptx import Presentation
 from logging_config import logger
 import shutil
 import zipfile
-import tempfile
+import multiprocessing
 import xml.etree.ElementTree as ET
-import zlib
 from PIL import Image
 import io
-from tkinter import ttk
-from PIL import ImageTk
-import tkinter.messagebox as messagebox
-from tkinter import Toplevel
 from PIL import ImageDraw
-
-def get_image_filename_from_zip(pptx_path, image_blob):
-    """Trouve le nom du fichier image dans le ZIP en comparant les CRC."""
+from package_index import PackageIndex, open_index, rels_path_for
+from package_writer import PackageRewriter, CONTENT_TYPES_PART
+from package_gc import (collect_garbage, prune_unused_layouts, find_slides, rename_part, retarget_relationship,
+                        add_relationship, add_default_content_type, repoint_blips)
+from crop_planner import PERCENTAGE_UNIT, plan_crops
+from image_encoder import EncodeReport
+from media_dedup import deduplicate_media
+from image_ops import crop_images_parallel, FAILED_METHOD
+from analysis_model import ImageRecord, LayoutRecord, DeckReport
+from analysis_cache import AnalysisCache, part_digest
+from media_cache import MediaMetadataCache, default_media_cache
+from image_probe import read_image_metadata
+from slide_parser import (parse_shape_part, parse_presentation_part, find_placeholder,
+                          LAYOUT_BASE_PLACEHOLDER_TYPES)
+
+# Résolution visée par défaut pour la réduction des images (voir plan_downsampling)
+DEFAULT_TARGET_DPI = 150
+EMU_PER_INCH = 914400
+# Formats matriciels réencodés lors de la réduction (pas de vectoriel ni de GIF animé)
+RESAMPLABLE_FORMATS = {'JPEG', 'PNG', 'BMP', 'TIFF'}
+# Formats matriciels découpés au pixel près (les images vectorielles EMF/WMF gardent leur a:srcRect)
+CROPPABLE_FORMATS = RESAMPLABLE_FORMATS | {'GIF'}
+# Part visible minimale retenue pour un rognage dégénéré
+MIN_VISIBLE_FRACTION = 0.01
+SHAPE_PART_PREFIXES = ('ppt/slides/', 'ppt/slideLayouts/', 'ppt/slideMasters/')
+
+# Extension et type de contenu d'une image réencodée dans un autre format, extensions reconnues
+MEDIA_FORMAT_EXTENSIONS = {'JPEG': ('jpeg', 'image/jpeg'), 'PNG': ('png', 'image/png')}
+MEDIA_FORMAT_NAMES = {'JPEG': ('jpg', 'jpeg', 'jpe', 'jfif'), 'PNG': ('png',)}
+
+# Moteurs d'analyse des diapositives : lecture en continu du XML ou modèle objet python-pptx
+ANALYSIS_BACKENDS = ('iterparse', 'python-pptx')
+DEFAULT_BACKEND = 'iterparse'
+
+def get_image_filename_from_zip(pptx_path, image_blob, index=None):
+    """Trouve le nom du fichier image dans le ZIP en comparant le CRC et la taille."""
     try:
-        # Calcul du CRC32 du blob de l'image
-        image_crc = zlib.crc32(image_blob) & 0xFFFFFFFF
-        
-        with zipfile.ZipFile(pptx_path, 'r') as zip_ref:
-            # Parcours des fichiers dans ppt/media
-            for file_info in zip_ref.infolist():
-                if file_info.filename.startswith('ppt/media/'):
-                    # Si le CRC correspond, on a trouvé le fichier
-                    if file_info.CRC == image_crc:
-                        return os.path.basename(file_info.filename)
+        with open_index(pptx_path, index) as index:
+            # Recherche directe dans la table (CRC, taille) de l'index
+            media_name = index.media_for_blob(image_blob)
+            if media_name:
+                return os.path.basename(media_name)
         
         return "Image sans nom"
     except Exception as e:
         logger.error(f"Erreur lors de la recherche du nom de fichier : {str(e)}")
         return "Image sans nom"
 
-def get_images_from_shapes(shapes, pptx_path, slide_index=None):
-    """Récupère le blob d'image et vérifie si l'image est rognée."""
+def get_image_part_from_rel(shape, index):
+    """Trouve la partie média de l'image à partir de la relation a:blip/@r:embed de la forme."""
+    try:
+        rId = shape._element.blip_rId
+        return index.media_for_rel(shape.part.partname.lstrip('/'), rId)
+    except Exception as e:
+        logger.debug(f"Relation de l'image introuvable : {str(e)}")
+        return None
+
+def get_images_from_shapes(shapes, pptx_path, slide_index=None, index=None):
+    """Retourne les images des formes (part_name -> ImageRecord) et relève leur rognage.
+
+    L'image est résolue via a:blip/@r:embed -> relations -> ppt/media/* : ses octets ne sont pas chargés.
+    """
     logger.debug(f"Analyse de {len(shapes)} formes")
     images = {}
-    for i, shape in enumerate(shapes):
-        logger.debug(f"Traitement de la forme {i+1}/{len(shapes)}")
-        if hasattr(shape, "image"):
-            image_blob = shape.image.blob
-            if image_blob not in images:
-                # Utilisation de la nouvelle fonction pour obtenir le nom du fichier
-                filename = get_image_filename_from_zip(pptx_path, image_blob)
-                logger.debug(f"Nouvelle image détectée, taille : {len(image_blob)/1024:.2f} KB, nom : {filename}")
-                images[image_blob] = {
-                    "used": False, 
-                    "cropped": False,
-                    "crop_ratio": 0.0,
-                    "filename": filename,
-                    "crop_left": 0.0,
-                    "crop_top": 0.0,
-                    "crop_right": 0.0,
-                    "crop_bottom": 0.0,
-                    "slide_index": slide_index,
-                    "display_width_cm": 0.0,
-                    "display_height_cm": 0.0
-                }
+    with open_index(pptx_path, index) as index:
+        for i, shape in enumerate(shapes):
+            logger.debug(f"Traitement de la forme {i+1}/{len(shapes)}")
+            if getattr(shape._element, "blip_rId", None) is None:
+                continue
+            # Le média est résolu par la relation de l'image (rId -> ppt/media/...)
+            media_name = get_image_part_from_rel(shape, index)
+            if media_name is None:
+                # Repli : recherche du blob dans la table (CRC, taille) de l'index
+                media_name = index.media_for_blob(shape.image.blob)
+            if media_name is None:
+                logger.warning(f"Image sans fichier média correspondant ignorée (slide {slide_index if slide_index is not None else 'N/A'})")
+                continue
+            if media_name not in images:
+                size = index.infos[media_name].file_size
+                logger.debug(f"Nouvelle image détectée, taille : {size/1024:.2f} KB, nom : {media_name}")
+                images[media_name] = ImageRecord(media_name, size=size, slide_index=slide_index)
+            record = images[media_name]
             
             # Récupération des dimensions d'affichage en EMUs
             if hasattr(shape, "width") and hasattr(shape, "height"):
                 # Conversion des EMUs en centimètres (1 cm = 360000 EMUs)
-                images[image_blob]["display_width_cm"] = shape.width / 360000
-                images[image_blob]["display_height_cm"] = shape.height / 360000
+                record.display_width_cm = shape.width / 360000
+                record.display_height_cm = shape.height / 360000
             
-            # Calcul du ratio de rognage
+            # Relevé des valeurs de rognage (le ratio est calculé par l'enregistrement)
             if shape.crop_left > 0 or shape.crop_top > 0 or shape.crop_right > 0 or shape.crop_bottom > 0:
                 logger.debug(f"Image rognée détectée - Crop values: L={shape.crop_left}, T={shape.crop_top}, R={shape.crop_right}, B={shape.crop_bottom}")
-                images[image_blob]["cropped"] = True
-                images[image_blob]["crop_left"] = shape.crop_left
-                images[image_blob]["crop_top"] = shape.crop_top
-                images[image_blob]["crop_right"] = shape.crop_right
-                images[image_blob]["crop_bottom"] = shape.crop_bottom
-                crop_ratio = (shape.crop_left + shape.crop_right + shape.crop_top + shape.crop_bottom) / 4
-                images[image_blob]["crop_ratio"] = min(crop_ratio, 1.0)
-                logger.debug(f"Image rognée - Nom: {images[image_blob]['filename']}, "
-                           f"Taille: {len(image_blob)/1024:.2f} KB, "
-                           f"Ratio de rognage: {images[image_blob]['crop_ratio']*100:.1f}%, "
+                record.cropped = True
+                record.crop_left = shape.crop_left
+                record.crop_top = shape.crop_top
+                record.crop_right = shape.crop_right
+                record.crop_bottom = shape.crop_bottom
+                logger.debug(f"Image rognée - Nom: {record.filename}, "
+                           f"Taille: {record.size/1024:.2f} KB, "
+                           f"Ratio de rognage: {record.crop_ratio*100:.1f}%, "
                            f"Slide: {slide_index if slide_index is not None else 'N/A'}, "
-                           f"Dimensions d'affichage: {images[image_blob]['display_width_cm']:.2f}x{images[image_blob]['display_height_cm']:.2f} cm")
+                           f"Dimensions d'affichage: {record.display_width_cm:.2f}x{record.display_height_cm:.2f} cm")
     return images
 
 def extract_image(blob, filename, output_dir):
@@ -104,26 +134,15 @@ def extract_image(blob, filename, output_dir):
         logger.error(f"Erreur lors de l'extraction de l'image {filename}: {str(e)}")
         return None
 
-def get_used_layouts_from_rels(pptx_path):
+def get_used_layouts_from_rels(pptx_path, index=None):
     """Récupère la liste des layouts utilisés en analysant les fichiers de relations."""
     used_layouts = set()
     try:
-        with zipfile.ZipFile(pptx_path, 'r') as zip_ref:
-            # Parcours des fichiers de relations des slides
-            for file_info in zip_ref.infolist():
-                if file_info.filename.startswith('ppt/slides/_rels/slide') and file_info.filename.endswith('.xml.rels'):
-                    # Lecture du fichier de relations
-                    rels_content = zip_ref.read(file_info.filename)
-                    root = ET.fromstring(rels_content)
-                    
-                    # Recherche des références aux layouts
-                    for rel in root.findall('.//{http://schemas.openxmlformats.org/package/2006/relationships}Relationship'):
-                        target = rel.get('Target', '')
-                        if 'slideLayouts/slideLayout' in target:
-                            # Extraction de l'ID du layout : Target="../slideLayouts/slideLayout88.xml"
-                            layout_id = target.split('slideLayouts/slideLayout')[1].split('.')[0]
-                            used_layouts.add(layout_id)
-                            logger.debug(f"Layout utilisé détecté dans {file_info.filename}: {target}")
+        with open_index(pptx_path, index) as index:
+            # Relations slide -> layout déjà extraites des fichiers .rels par l'index
+            for slide_id, layout_id in index.slide_layouts.items():
+                used_layouts.add(layout_id)
+                logger.debug(f"Layout utilisé détecté dans la slide {slide_id}: slideLayout{layout_id}.xml")
         
         logger.info(f"Layouts utilisés détectés : {sorted(used_layouts)}")
         return used_layouts
@@ -131,51 +150,46 @@ def get_used_layouts_from_rels(pptx_path):
         logger.error(f"Erreur lors de la lecture des relations : {str(e)}")
         return set()
 
-def get_layout_images(pptx_path, used_layout_ids):
+def get_layout_images(pptx_path, used_layout_ids, index=None):
     """Récupère les images utilisées dans les layouts en analysant les fichiers de relations."""
     layout_images = {}
     try:
-        with zipfile.ZipFile(pptx_path, 'r') as zip_ref:
-            # Parcours des fichiers de relations des layouts
+        with open_index(pptx_path, index) as index:
+            # Relations layout -> images déjà extraites des fichiers .rels par l'index
             for layout_id in used_layout_ids:
-                rels_path = f'ppt/slideLayouts/_rels/slideLayout{layout_id}.xml.rels'
-                if rels_path in zip_ref.namelist():
-                    # Lecture du fichier de relations
-                    rels_content = zip_ref.read(rels_path)
-                    root = ET.fromstring(rels_content)
-                    
-                    # Recherche des références aux images
-                    for rel in root.findall('.//{http://schemas.openxmlformats.org/package/2006/relationships}Relationship'):
-                        target = rel.get('Target', '')
-                        if target.startswith('../media/'):
-                            image_name = os.path.basename(target)
-                            if layout_id not in layout_images:
-                                layout_images[layout_id] = set()
-                            layout_images[layout_id].add(image_name)
-                            logger.debug(f"Image {image_name} trouvée dans le layout {layout_id} via {rels_path}")
+                for image_name in index.media_for_layout(layout_id):
+                    if layout_id not in layout_images:
+                        layout_images[layout_id] = set()
+                    layout_images[layout_id].add(image_name)
+                    logger.debug(f"Image {image_name} trouvée dans le layout {layout_id}")
         
         return layout_images
     except Exception as e:
         logger.error(f"Erreur lors de la récupération des images des layouts : {str(e)}")
         return {}
 
-def is_slide_hidden(pptx_path, slide_index):
+def is_slide_hidden(pptx_path, slide_index, index=None):
     """Vérifie si une diapositive est masquée en lisant son fichier XML."""
     try:
-        with zipfile.ZipFile(pptx_path, 'r') as zip_ref:
-            # Lecture du fichier XML de la diapositive
-            slide_xml_path = f'ppt/slides/slide{slide_index}.xml'
-            if slide_xml_path in zip_ref.namelist():
-                slide_xml = zip_ref.read(slide_xml_path)
-                root = ET.fromstring(slide_xml)
-                # Vérification de l'attribut show
-                show_attr = root.get('show')
-                return show_attr == '0'
+        with open_index(pptx_path, index) as index:
+            # Vérification de l'attribut show (mis en cache par l'index)
+            return index.is_slide_hidden(slide_index)
     except Exception as e:
         logger.error(f"Erreur lors de la lecture du fichier XML de la diapositive {slide_index}: {str(e)}")
     return False
 
-def analyze_pptx(file_path):
+def analyze_pptx(file_path, cache=None, media_cache=None, incremental=True, backend=DEFAULT_BACKEND):
+    """Analyse un fichier PPTX et retourne un DeckReport indexé par nom de partie.
+
+    cache : AnalysisCache optionnel ; un fichier inchangé n'est alors pas réanalysé.
+    incremental : avec un cache, seules les parties (diapositives, layouts, relations)
+    modifiées depuis une analyse précédente sont relues.
+    media_cache : MediaMetadataCache des en-têtes d'images (par défaut, cache en mémoire du processus).
+    backend : 'iterparse' (lecture en continu du XML de chaque partie) ou 'python-pptx'
+    (chargement complet de la présentation) ; les deux donnent le même rapport.
+    """
+    if backend not in ANALYSIS_BACKENDS:
+        raise ValueError(f"Moteur d'analyse inconnu : {backend} (attendu : {', '.join(ANALYSIS_BACKENDS)})")
     logger.info(f"Début de l'analyse du fichier : {file_path}")
     
     # Vérification que le fichier existe et est accessible
@@ -192,30 +206,57 @@ def analyze_pptx(file_path):
     if file_size == 0:
         raise ValueError("Le fichier est vide")
     
+    # Rapport déjà calculé pour ce contenu : ni chargement de la présentation ni lecture des images
+    cache_key = cache.key_for(file_path) if cache is not None else None
+    if cache_key:
+        report = cache.get(file_path, cache_key)
+        if report is not None:
+            return report
+    
     # Vérification que c'est bien un fichier ZIP (les fichiers PPTX sont des ZIP)
+    # L'index lit le répertoire central et les relations une seule fois pour toute l'analyse
+    part_cache = cache if cache_key and incremental and backend == 'iterparse' else None
+    if part_cache is not None:
+        # Parties d'une analyse précédente interrompue avant son put()
+        part_cache.discard_parts()
     try:
-        with zipfile.ZipFile(file_path, 'r') as zip_ref:
-            # Vérifier la présence des fichiers essentiels d'un PPTX
-            required_files = ['ppt/presentation.xml', 'ppt/slides/slide1.xml']
-            missing_files = [f for f in required_files if f not in zip_ref.namelist()]
-            if missing_files:
-                raise ValueError(f"Fichier PPTX invalide - fichiers manquants : {missing_files}")
-            logger.info("Structure PPTX valide détectée")
+        index = PackageIndex(file_path, part_cache)
     except zipfile.BadZipFile:
         raise ValueError("Le fichier n'est pas un fichier ZIP valide (PPTX corrompu)")
     
-    try:
-        prs = Presentation(file_path)
-    except Exception as e:
-        logger.error(f"Erreur lors de l'ouverture du fichier PPTX : {str(e)}")
-        raise ValueError(f"Impossible d'ouvrir le fichier PowerPoint : {str(e)}")
+    with index:
+        try:
+            report = _analyze_pptx_with_index(file_path, index, media_cache, part_cache, backend)
+        except Exception:
+            # Rien de l'analyse échouée n'est écrit dans le cache
+            if part_cache is not None:
+                part_cache.discard_parts()
+            raise
+    
+    if cache_key:
+        cache.put(file_path, report, cache_key)
+    return report
+
+def _analyze_pptx_with_index(file_path, index, media_cache=None, part_cache=None, backend=DEFAULT_BACKEND):
+    """Analyse le fichier PPTX en s'appuyant sur un index du paquet déjà ouvert.
+
+    Avec le moteur 'iterparse', l'analyse se fait partie par partie (et reprend de
+    part_cache le résultat des parties XML inchangées) ; avec 'python-pptx', la
+    présentation est chargée entièrement.
+    """
+    # Vérifier la présence des fichiers essentiels d'un PPTX
+    required_files = ['ppt/presentation.xml', 'ppt/slides/slide1.xml']
+    missing_files = [f for f in required_files if not index.has_part(f)]
+    if missing_files:
+        raise ValueError(f"Fichier PPTX invalide - fichiers manquants : {missing_files}")
+    logger.info("Structure PPTX valide détectée")
     
     # Récupération des layouts utilisés depuis les fichiers de relations
-    used_layout_ids = get_used_layouts_from_rels(file_path)
+    used_layout_ids = get_used_layouts_from_rels(file_path, index)
     logger.info(f"Layouts utilisés détectés : {sorted(used_layout_ids)}")
     
     # Récupération des images des layouts utilisés
-    layout_images = get_layout_images(file_path, used_layout_ids)
+    layout_images = get_layout_images(file_path, used_layout_ids, index)
     
     # Création d'un ensemble des noms de fichiers des images utilisées dans les layouts
     layout_used_filenames = set()
@@ -225,106 +266,370 @@ def analyze_pptx(file_path):
     
     logger.info(f"Total des images utilisées dans les layouts : {len(layout_used_filenames)}")
     
+    # Images des diapositives et des layouts/masques
+    if backend == 'iterparse':
+        slide_images, all_images = collect_images_from_parts(index, part_cache)
+    else:
+        slide_images, all_images = _collect_images_with_python_pptx(file_path, index)
+    
+    # Images non utilisées : médias qu'aucune chaîne de relations ne relie à la racine du paquet.
+    # Le graphe couvre toutes les parties (groupes, remplissages, arrière-plans, graphiques,
+    # SmartArt, notes, aperçus OLE...) ; seuls les layouts utilisés par une diapositive comptent.
+    reachable = index.graph.reachable()
+    unused_images = {
+        media_name: record for media_name, record in all_images.items()
+        if media_name not in reachable
+    }
+    # Médias sans aucune forme image qui les affiche, voire sans aucune relation
+    for media_name in sorted(index.media):
+        if media_name not in reachable and media_name not in unused_images:
+            unused_images[media_name] = ImageRecord(media_name, size=index.infos[media_name].file_size)
+    
+    # Layouts utilisés et leurs images, identifiées par leur partie ppt/media
+    layout_info = get_layout_info(file_path, used_layout_ids, index)
+    layouts = {}
+    layout_records = {}
+    for layout_id in sorted(used_layout_ids):
+        info = layout_info.get(layout_id, {})
+        part_names = sorted(f'ppt/media/{image_name}' for image_name in layout_images.get(layout_id, ()))
+        layouts[layout_id] = LayoutRecord(layout_id, info.get('name'), info.get('type', 'unknown'), True, part_names)
+        for part_name in part_names:
+            if part_name not in layout_records and index.has_part(part_name):
+                layout_records[part_name] = ImageRecord(part_name, size=index.infos[part_name].file_size, used=True)
+    
+    report = DeckReport(file_path, os.path.getsize(file_path), slide_images, unused_images, layouts, layout_records)
+    
+    # Lecture des dimensions en pixels de toutes les images du rapport
+    logger.debug("\nAnalyse des dimensions des images :")
+    read_image_dimensions(index, [*slide_images.values(), *unused_images.values(), *layout_records.values()],
+                          media_cache)
+
+    logger.info(f"Analyse terminée - Images non utilisées : {len(unused_images)}, Images rognées : {report.percentage_cropped:.2f}%")
+    return report
+
+def _collect_images_with_python_pptx(file_path, index):
+    """Images des diapositives et des layouts/masques, lues avec python-pptx."""
+    try:
+        prs = Presentation(file_path)
+    except Exception as e:
+        logger.error(f"Erreur lors de l'ouverture du fichier PPTX : {str(e)}")
+        raise ValueError(f"Impossible d'ouvrir le fichier PowerPoint : {str(e)}")
+    
     # Analyse des diapositives
     slide_images = {}
     for slide_index, slide in enumerate(prs.slides):
-        slide_shapes = get_images_from_shapes(slide.shapes, file_path, slide_index + 1)
-        for blob, info in slide_shapes.items():
-            if blob not in slide_images:
-                slide_images[blob] = info
-            slide_images[blob]["used"] = True
+        slide_shapes = get_images_from_shapes(slide.shapes, file_path, slide_index + 1, index)
+        for media_name, record in slide_shapes.items():
+            # Une image rognée sur au moins une diapositive est relevée comme rognée
+            if media_name not in slide_images or (record.cropped and not slide_images[media_name].cropped):
+                slide_images[media_name] = record
+            slide_images[media_name].used = True
             # Vérification de la propriété show dans le XML
-            slide_images[blob]["is_hidden"] = is_slide_hidden(file_path, slide_index + 1)
+            slide_images[media_name].is_hidden = is_slide_hidden(file_path, slide_index + 1, index)
     
     # Analyse des masters et layouts pour obtenir toutes les images
     all_images = {}
     for slide_master in prs.slide_masters:
         for layout in slide_master.slide_layouts:
-            layout_id = str(layout.slide_id) if hasattr(layout, "slide_id") else str(layout)
-            layout_shapes = get_images_from_shapes(layout.shapes, file_path)
+            layout_shapes = get_images_from_shapes(layout.shapes, file_path, index=index)
             all_images.update(layout_shapes)
         
-        master_shapes = get_images_from_shapes(slide_master.shapes, file_path)
+        master_shapes = get_images_from_shapes(slide_master.shapes, file_path, index=index)
         all_images.update(master_shapes)
     
-    # Séparation des images utilisées et non utilisées
-    unused_images = {
-        blob: info for blob, info in all_images.items() 
-        if not info.get("used", False) and info['filename'] not in layout_used_filenames
-    }
-    
-    # Images rognées (uniquement celles des slides)
-    used_and_cropped_images = {blob: info for blob, info in slide_images.items() if info["cropped"]}
-    
-    # Calcul des statistiques
-    cropped_count = len(used_and_cropped_images)
-    total_used_images = len(slide_images)
-    percentage_cropped = (cropped_count / total_used_images * 100) if total_used_images > 0 else 0
+    return slide_images, all_images
+
+def _load_part(index, part_name, parser, part_cache=None, parsed=None):
+    """Résultat de l'analyse d'une partie XML, repris du cache si son contenu est déjà connu.
+
+    parsed : dictionnaire optionnel des parties déjà analysées pendant cette analyse
+    (un layout ou un masque partagé par plusieurs diapositives n'est lu qu'une fois).
+    """
+    if parsed is not None and (part_name, parser) in parsed:
+        return parsed[part_name, parser]
+    info = index.infos[part_name]
+    kind = parser.__name__
+    result = digest = None
+    if part_cache is not None:
+        # Hachage en flux : une partie déjà analysée n'est que décompressée
+        with index.open(part_name) as stream:
+            digest = part_digest(stream)
+        result = part_cache.get_part(kind, info.CRC, info.file_size, digest)
+    if result is not None:
+        if parsed is not None:
+            parsed[part_name, parser] = result
+        return result
+    try:
+        # Le XML est lu en continu depuis l'archive, sans copie complète en mémoire
+        with index.open(part_name) as stream:
+            result = parser(stream)
+    except ET.ParseError as e:
+        raise ValueError(f"Partie XML invalide {part_name} : {str(e)}")
+    if part_cache is not None:
+        part_cache.put_part(kind, info.CRC, info.file_size, digest, result)
+    if parsed is not None:
+        parsed[part_name, parser] = result
+    return result
+
+def _related_part(index, source_part, rId=None, rel_type=None):
+    """Partie cible d'une relation interne, désignée par son rId ou par la fin de son type."""
+    relationships = index.rels.get(source_part, {})
+    if rId is not None:
+        candidates = [relationships.get(rId)]
+    else:
+        candidates = [rel for rel in relationships.values() if rel['type'].endswith(f'/{rel_type}')]
+    for rel in candidates:
+        if rel is not None and not rel['external'] and index.has_part(rel['target']):
+            return rel['target']
+    return None
+
+def _placeholder_extent(layout, master, idx):
+    """Taille (EMU) héritée par un espace réservé de diapositive : layout par index, puis masque par type."""
+    placeholder = find_placeholder(layout['placeholders'], idx=idx) if layout else None
+    if placeholder is None:
+        return None, None
+    _, ph_type, is_sp, cx, cy = placeholder
+    if is_sp and (cx is None or cy is None) and master:
+        base = find_placeholder(master['placeholders'], ph_type=LAYOUT_BASE_PLACEHOLDER_TYPES.get(ph_type))
+        if base is not None:
+            cx = cx if cx is not None else base[3]
+            cy = cy if cy is not None else base[4]
+    return cx, cy
+
+def _images_from_part(part_name, parsed, index, slide_index=None, layout=None, master=None):
+    """Équivalent de get_images_from_shapes pour une partie analysée par slide_parser."""
+    images = {}
+    for rId, cx, cy, crop_left, crop_top, crop_right, crop_bottom, ph_idx, *_ in parsed['pictures']:
+        media_name = index.media_for_rel(part_name, rId)
+        if media_name is None:
+            # Repli : recherche du contenu de la cible dans la table (CRC, taille) de l'index
+            target = _related_part(index, part_name, rId)
+            media_name = index.media_for_blob(index.read(target)) if target else None
+        if media_name is None:
+            logger.warning(f"Image sans fichier média correspondant ignorée ({part_name}, {rId})")
+            continue
+        if media_name not in images:
+            images[media_name] = ImageRecord(media_name, size=index.infos[media_name].file_size, slide_index=slide_index)
+        record = images[media_name]
+        
+        # Un espace réservé sans taille propre hérite de celle du layout
+        if ph_idx is not None and slide_index is not None and (cx is None or cy is None):
+            base_cx, base_cy = _placeholder_extent(layout, master, ph_idx)
+            cx = cx if cx is not None else base_cx
+            cy = cy if cy is not None else base_cy
+        record.display_width_cm = (cx or 0) / 360000
+        record.display_height_cm = (cy or 0) / 360000
+        
+        if crop_left > 0 or crop_top > 0 or crop_right > 0 or crop_bottom > 0:
+            record.cropped = True
+            record.crop_left = crop_left
+            record.crop_top = crop_top
+            record.crop_right = crop_right
+            record.crop_bottom = crop_bottom
+    return images
+
+def collect_images_from_parts(index, part_cache=None):
+    """Images des diapositives et des layouts/masques, lues partie par partie sans python-pptx.
+
+    Les diapositives et les masques sont parcourus dans l'ordre de presentation.xml, comme
+    le fait python-pptx. Avec part_cache, seules les parties dont le CRC a changé depuis une
+    analyse précédente sont relues : le coût d'une réanalyse suit l'ampleur de la modification.
+    """
+    presentation_part = 'ppt/presentation.xml'
+    parsed = {}
+    try:
+        presentation = _load_part(index, presentation_part, parse_presentation_part, part_cache, parsed)
+    except ValueError as e:
+        logger.error(f"Erreur lors de l'ouverture du fichier PPTX : {str(e)}")
+        raise ValueError(f"Impossible d'ouvrir le fichier PowerPoint : {str(e)}")
     
-    # Calcul du poids total des parties rognées
-    total_cropped_size = sum(len(blob) * info["crop_ratio"] for blob, info in used_and_cropped_images.items())
+    # Analyse des diapositives
+    slide_images = {}
+    for slide_index, rId in enumerate(presentation['slide_rids']):
+        slide_part = _related_part(index, presentation_part, rId)
+        if slide_part is None:
+            logger.warning(f"Diapositive {rId} introuvable dans le paquet")
+            continue
+        slide = _load_part(index, slide_part, parse_shape_part, part_cache, parsed)
+        layout_part = _related_part(index, slide_part, rel_type='slideLayout')
+        layout = _load_part(index, layout_part, parse_shape_part, part_cache, parsed) if layout_part else None
+        master_part = _related_part(index, layout_part, rel_type='slideMaster') if layout_part else None
+        master = _load_part(index, master_part, parse_shape_part, part_cache, parsed) if master_part else None
+        
+        slide_shapes = _images_from_part(slide_part, slide, index, slide_index + 1, layout, master)
+        for media_name, record in slide_shapes.items():
+            # Une image rognée sur au moins une diapositive est relevée comme rognée
+            if media_name not in slide_images or (record.cropped and not slide_images[media_name].cropped):
+                slide_images[media_name] = record
+            slide_images[media_name].used = True
+            slide_images[media_name].is_hidden = slide['hidden']
     
-    # Calcul du poids total des images inutilisées
-    total_unused_size = sum(len(blob) for blob in unused_images.keys())
-
-    # Analyse des dimensions physiques des images utilisées
-    logger.debug("\nAnalyse des images utilisées :")
-    used_images_info = []
-    for blob, info in slide_images.items():
-        try:
-            # Conversion du blob en image PIL
-            image = Image.open(io.BytesIO(blob))
-            width, height = image.size
-            
-            # Ajout des informations dans la liste
-            used_images_info.append({
-                'filename': info['filename'],
-                'size_kb': len(blob) / 1024,
-                'slide_index': info['slide_index'],
-                'dimensions': f"{width}x{height}",
-                'display_dimensions': f"{info['display_width_cm']:.2f}x{info['display_height_cm']:.2f} cm",
-                'is_cropped': info.get('cropped', False),
-                'is_hidden': info.get('is_hidden', False),
-                'crop_info': f"L={info.get('crop_left', 0)*100:.1f}%, T={info.get('crop_top', 0)*100:.1f}%, R={info.get('crop_right', 0)*100:.1f}%, B={info.get('crop_bottom', 0)*100:.1f}%" if info.get('cropped', False) else "Non rognée"
-            })
-            
-        except Exception as e:
-            logger.error(f"Erreur lors de l'analyse des dimensions de l'image {info['filename']}: {str(e)}")
+    # Analyse des masters et layouts pour obtenir toutes les images
+    all_images = {}
+    for rId in presentation['master_rids']:
+        master_part = _related_part(index, presentation_part, rId)
+        if master_part is None:
+            continue
+        master = _load_part(index, master_part, parse_shape_part, part_cache, parsed)
+        for layout_rId in master['layout_rids']:
+            layout_part = _related_part(index, master_part, layout_rId)
+            if layout_part is not None:
+                layout = _load_part(index, layout_part, parse_shape_part, part_cache, parsed)
+                all_images.update(_images_from_part(layout_part, layout, index))
+        all_images.update(_images_from_part(master_part, master, index))
     
-    # Récupération des informations détaillées des layouts
-    layout_info = get_layout_info(file_path, used_layout_ids)
-
-    logger.info(f"Analyse terminée - Images non utilisées : {len(unused_images)}, Images rognées : {percentage_cropped:.2f}%")
-    return file_path, unused_images, percentage_cropped, total_cropped_size, total_unused_size, used_and_cropped_images, used_layout_ids, layout_images, used_images_info, layout_info, layout_used_filenames
+    return slide_images, all_images
+
+def _is_shape_part(part_name):
+    return part_name.startswith(SHAPE_PART_PREFIXES)
+
+def collect_picture_uses(index, part_cache=None):
+    """Tailles d'affichage de chaque média par les images (p:pic) des diapositives, layouts et masques.
+
+    Retourne (uses, unresolved) : uses associe à chaque média la liste de ses affichages
+    (partie source, rang de l'a:blip, cx, cy en EMU de la zone a:fillRect où l'image est
+    étirée, rognages l, t, r, b en fractions) ; unresolved contient les médias dont au moins
+    un usage n'a pas de taille connue (arrière-plan, remplissage, mosaïque, groupe, graphique,
+    notes...) et dont la résolution utile ne peut donc pas être déterminée.
+    """
+    parsed = {}
+    uses = {}
+    unresolved = set()
+    for media_name, referrers in index.graph.media_referrers().items():
+        for source_part, rId in referrers:
+            if not _is_shape_part(source_part) or not index.has_part(source_part):
+                unresolved.add(media_name)
+                break
+            try:
+                part = _load_part(index, source_part, parse_shape_part, part_cache, parsed)
+                layout = master = None
+                if source_part.startswith('ppt/slides/'):
+                    layout_part = _related_part(index, source_part, rel_type='slideLayout')
+                    layout = _load_part(index, layout_part, parse_shape_part, part_cache, parsed) if layout_part else None
+                    master_part = _related_part(index, layout_part, rel_type='slideMaster') if layout_part else None
+                    master = _load_part(index, master_part, parse_shape_part, part_cache, parsed) if master_part else None
+            except ValueError as e:
+                logger.warning(str(e))
+                unresolved.add(media_name)
+                break
+            pictures = [picture for picture in part['pictures'] if picture[0] == rId]
+            # Toutes les références au média doivent être des images de premier niveau
+            if len(pictures) != part['blips'].get(rId, 0):
+                unresolved.add(media_name)
+                break
+            for (_, cx, cy, crop_left, crop_top, crop_right, crop_bottom, ph_idx, _, ordinal,
+                 fill_left, fill_top, fill_right, fill_bottom, stretched) in pictures:
+                if ph_idx is not None and layout is not None and (cx is None or cy is None):
+                    base_cx, base_cy = _placeholder_extent(layout, master, ph_idx)
+                    cx = cx if cx is not None else base_cx
+                    cy = cy if cy is not None else base_cy
+                if not cx or not cy or not stretched:
+                    unresolved.add(media_name)
+                    break
+                # L'image rognée est étirée dans la zone a:fillRect de la forme
+                cx *= max(1 - fill_left - fill_right, 0)
+                cy *= max(1 - fill_top - fill_bottom, 0)
+                uses.setdefault(media_name, []).append((source_part, ordinal, cx, cy,
+                                                        crop_left, crop_top, crop_right, crop_bottom))
+            if media_name in unresolved:
+                break
+    return uses, unresolved
+
+def plan_downsampling(index, target_dpi=DEFAULT_TARGET_DPI, media_cache=None, part_cache=None, crop_plan=None):
+    """Facteur de réduction des images affichées à une résolution supérieure à target_dpi.
+
+    La résolution effective d'une image est calculée pour chacun de ses affichages à partir
+    de sa taille sur la diapositive (a:xfrm, en EMU) et de la part visible après rognage ;
+    le facteur retenu garantit target_dpi pour le plus grand affichage. Retourne
+    {nom de partie: facteur < 1} pour les seules images matricielles à réduire.
+    crop_plan : CropPlan des rognages à produire ; chaque partie rognée a alors son propre
+    facteur, relatif à sa boîte et calculé sur les seules images redirigées vers elle, et le
+    média d'origine n'est dimensionné que pour les affichages qui le gardent.
+    """
+    uses, unresolved = collect_picture_uses(index, part_cache)
+    records = [ImageRecord(media_name) for media_name in sorted(uses) if media_name not in unresolved]
+    read_image_dimensions(index, records, media_cache)
+    # Image (partie source, rang de l'a:blip) -> (partie rognée, a:srcRect résiduel)
+    redirected = {}
+    for source_part, pictures in (crop_plan.pictures.items() if crop_plan is not None else ()):
+        for _, ordinal, target, residual in pictures:
+            redirected[source_part, ordinal] = (target, residual)
+    scales = {}
+    for record in records:
+        if record.format not in RESAMPLABLE_FORMATS or not record.width or not record.height:
+            continue
+        for source_part, ordinal, cx, cy, crop_left, crop_top, crop_right, crop_bottom in uses[record.part_name]:
+            target, residual = redirected.get((source_part, ordinal), (record.part_name, None))
+            if residual is None:
+                # Pixels nécessaires pour l'image entière : la partie visible occupe cx x cy
+                width, height = record.width, record.height
+                visible_x = 1 - crop_left - crop_right
+                visible_y = 1 - crop_top - crop_bottom
+            else:
+                # Pixels nécessaires pour la boîte : seul le rognage résiduel reste dans a:srcRect
+                x0, y0, x1, y1 = crop_plan.targets[target][1]
+                width, height = x1 - x0, y1 - y0
+                visible_x = 1 - (residual[0] + residual[2]) / PERCENTAGE_UNIT
+                visible_y = 1 - (residual[1] + residual[3]) / PERCENTAGE_UNIT
+            needed_width = target_dpi * cx / EMU_PER_INCH / max(visible_x, MIN_VISIBLE_FRACTION)
+            needed_height = target_dpi * cy / EMU_PER_INCH / max(visible_y, MIN_VISIBLE_FRACTION)
+            scales[target] = max(scales.get(target, 0.0), needed_width / width, needed_height / height)
+    plan = {}
+    for part_name, scale in sorted(scales.items()):
+        if scale < 1:
+            plan[part_name] = scale
+            logger.debug(f"{os.path.basename(part_name)} : {target_dpi / scale:.0f} DPI effectifs -> facteur {scale:.3f}")
+    logger.info(f"Images à réduire à {target_dpi} DPI : {len(plan)} sur {len(scales)} analysées "
+                f"({len(unresolved)} sans taille d'affichage connue)")
+    return plan
+
+def read_image_dimensions(index, records, media_cache=None):
+    """Renseigne les dimensions en pixels, le format et la résolution des enregistrements d'images.
+
+    Les métadonnées sont cherchées par (CRC, taille) dans le cache : seul l'en-tête des
+    images jamais rencontrées est lu, par la sonde d'image_probe.
+    """
+    if media_cache is None:
+        media_cache = default_media_cache()
+    for record in records:
+        info = index.infos[record.part_name]
+        metadata = media_cache.get(info.CRC, info.file_size)
+        if metadata is None:
+            try:
+                # Sonde des premiers octets du flux ZIP, PIL pour les formats non reconnus
+                metadata = read_image_metadata(lambda: index.open(record.part_name))
+            except Exception as e:
+                logger.error(f"Erreur lors de l'analyse des dimensions de l'image {record.filename}: {str(e)}")
+                continue
+            media_cache.put(info.CRC, info.file_size, metadata)
+        record.width, record.height = metadata.width, metadata.height
+        record.format, record.dpi = metadata.format, metadata.dpi
+    media_cache.flush()
 
-def get_media_files_from_pptx(pptx_path):
+def get_media_files_from_pptx(pptx_path, index=None):
     """Extrait la liste des fichiers média et leurs relations depuis le PPTX."""
     media_files = {}
-    with zipfile.ZipFile(pptx_path, 'r') as zip_ref:
-        # Lecture du fichier [Content_Types].xml pour trouver les relations
-        content_types = zip_ref.read('[Content_Types].xml')
-        root = ET.fromstring(content_types)
-        
-        # Lecture du fichier _rels/.rels pour trouver les relations principales
-        rels = zip_ref.read('_rels/.rels')
-        rels_root = ET.fromstring(rels)
-        
-        # Lecture du fichier ppt/_rels/presentation.xml.rels pour trouver les relations des médias
-        ppt_rels = zip_ref.read('ppt/_rels/presentation.xml.rels')
-        ppt_rels_root = ET.fromstring(ppt_rels)
-        
-        # Parcours des fichiers dans ppt/media
-        for file_info in zip_ref.infolist():
-            if file_info.filename.startswith('ppt/media/'):
-                media_files[file_info.filename] = {
-                    'size': file_info.file_size,
-                    'used': False
-                }
+    with open_index(pptx_path, index) as index:
+        # Parcours des fichiers dans ppt/media (répertoire central déjà indexé)
+        for media_name, file_info in index.media.items():
+            media_files[media_name] = {
+                'size': file_info.file_size,
+                'used': False
+            }
     
     return media_files
 
-def create_light_version(file_path, unused_images):
-    """Crée une version allégée du fichier PowerPoint en supprimant les images inutilisées."""
+def create_light_version(file_path, unused_images, policy=None, prune_layouts=False, deduplicate=True):
+    """Crée une version allégée du fichier PowerPoint en supprimant les images inutilisées.
+
+    Les images inutilisées sont supprimées avec toutes les parties devenues inatteignables
+    (voir collect_garbage) ; relations et types de contenu sont mis à jour.
+    policy : CompressionPolicy appliquée aux fichiers écrits (par défaut, médias stockés et XML dégonflé).
+    prune_layouts : supprime aussi les layouts qu'aucune diapositive n'utilise et les masques
+    restés sans layout ; si le fichier obtenu n'est pas valide, la version allégée est
+    recréée sans cet élagage.
+    deduplicate : ne garde qu'un exemplaire des médias identiques (voir deduplicate_media).
+    """
     try:
         logger.info(f"Création de la version allégée pour {file_path}")
         
@@ -332,41 +637,33 @@ def create_light_version(file_path, unused_images):
         base_name = os.path.splitext(file_path)[0]
         output_path = f"{base_name}_light.pptx"
         
-        # Création d'un répertoire temporaire
-        with tempfile.TemporaryDirectory() as temp_dir:
-            logger.debug(f"Création du répertoire temporaire : {temp_dir}")
-            
-            # Extraction du PPTX original
-            with zipfile.ZipFile(file_path, 'r') as zip_ref:
-                zip_ref.extractall(temp_dir)
+        # Réécriture directe de l'archive source vers l'archive allégée
+        with PackageRewriter(file_path, policy) as rewriter, PackageIndex(file_path) as index:
+            # Fichiers média à supprimer, même s'ils sont encore référencés (layouts inutilisés)
+            files_to_remove = [record.part_name for record in unused_images.values() if index.has_part(record.part_name)]
+            logger.debug(f"Fichiers média à supprimer : {files_to_remove}")
             
-            # Analyse des fichiers média
-            media_files = get_media_files_from_pptx(file_path)
+            # Layouts et masques inutilisés, retirés des listes de presentation.xml et des masques
+            if prune_layouts:
+                files_to_remove.extend(prune_unused_layouts(index, rewriter))
             
-            # Identification des fichiers média à supprimer
-            files_to_remove = []
-            for blob, info in unused_images.items():
-                # Recherche du fichier média correspondant
-                for media_file in media_files:
-                    if media_file.endswith(f"/{info['filename']}"):
-                        files_to_remove.append(media_file)
-                        logger.debug(f"Fichier média à supprimer : {media_file}")
+            # Médias identiques : les relations pointent vers un seul exemplaire, les autres
+            # deviennent inatteignables
+            if deduplicate:
+                dedup_report = deduplicate_media(index, rewriter, files_to_remove)
+                logger.info(f"Dédoublonnage des médias :\n{dedup_report.format()}")
             
-            # Suppression des fichiers média inutilisés
-            for file_to_remove in files_to_remove:
-                file_path = os.path.join(temp_dir, file_to_remove)
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                    logger.debug(f"Suppression du fichier : {file_to_remove}")
+            # Suppression des parties inatteignables au passage dans l'archive de sortie
+            garbage_report = collect_garbage(index, rewriter, files_to_remove)
+            logger.info(f"Nettoyage du paquet :\n{garbage_report.format()}")
             
             # Création du nouveau PPTX
-            with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zip_out:
-                for root, dirs, files in os.walk(temp_dir):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        arcname = os.path.relpath(file_path, temp_dir)
-                        zip_out.write(file_path, arcname)
-                        logger.debug(f"Ajout du fichier dans l'archive : {arcname}")
+            rewriter.write(output_path)
+            slide_count = len(find_slides(index))
+        
+        if prune_layouts and not is_valid_pptx(output_path, slide_count):
+            logger.error("Version allégée invalide après l'élagage des layouts : création sans élagage")
+            return create_light_version(file_path, unused_images, policy, deduplicate=deduplicate)
         
         logger.info(f"Version allégée créée avec succès : {output_path}")
         return output_path
@@ -374,6 +671,31 @@ def create_light_version(file_path, unused_images):
         logger.error(f"Erreur lors de la création de la version allégée : {str(e)}")
         return None
 
+def is_valid_pptx(file_path, slide_count=None):
+    """Vérifie un fichier PPTX comme test_pptx.py : parties essentielles présentes et ouverture par python-pptx.
+
+    slide_count : nombre de diapositives attendu, si connu.
+    """
+    try:
+        with zipfile.ZipFile(file_path, 'r') as zip_ref:
+            missing_files = [f for f in ('ppt/presentation.xml', 'ppt/slides/slide1.xml', '[Content_Types].xml')
+                             if f not in zip_ref.NameToInfo]
+        if missing_files:
+            logger.error(f"Fichiers essentiels manquants dans {file_path} : {missing_files}")
+            return False
+        prs = Presentation(file_path)
+        # Les layouts et masques doivent rester accessibles
+        layout_count = len(prs.slide_layouts)
+        if slide_count is not None and len(prs.slides) != slide_count:
+            logger.error(f"{file_path} : {len(prs.slides)} diapositives au lieu de {slide_count}")
+            return False
+        logger.debug(f"{file_path} valide : {len(prs.slides)} diapositives, {layout_count} layouts, "
+                     f"{len(prs.slide_masters)} masques")
+        return True
+    except Exception as e:
+        logger.error(f"Fichier PPTX invalide {file_path} : {str(e)}")
+        return False
+
 def on_create_light_version():
     """Gestionnaire d'événement pour le bouton de création de version allégée"""
     if not hasattr(on_create_light_version, 'last_file_path') or not on_create_light_version.last_file_path:
@@ -394,13 +716,13 @@ def on_create_light_version():
         result_text.delete(1.0, "end")
         result_text.insert("end", f"Erreur : {str(e)}")
 
-def get_layout_info(pptx_path, used_layout_ids):
+def get_layout_info(pptx_path, used_layout_ids, index=None):
     """Récupère les informations détaillées des layouts utilisés."""
     layout_info = {}
     try:
-        with zipfile.ZipFile(pptx_path, 'r') as zip_ref:
+        with open_index(pptx_path, index) as index:
             # Lecture du fichier presentation.xml pour obtenir les noms des layouts
-            presentation_xml = zip_ref.read('ppt/presentation.xml')
+            presentation_xml = index.read('ppt/presentation.xml')
             root = ET.fromstring(presentation_xml)
             
             # Parcours des layouts dans presentation.xml
@@ -419,178 +741,213 @@ def get_layout_info(pptx_path, used_layout_ids):
         logger.error(f"Erreur lors de la récupération des informations des layouts : {str(e)}")
         return {}
 
-def crop_image(blob, info):
-    """Convertit l'image à 150 DPI si sa résolution est supérieure et recadre l'image selon les paramètres de rognage."""
-    try:
-        # Conversion du blob en image PIL
-        image = Image.open(io.BytesIO(blob))
-        
-        # Récupération de la résolution actuelle
-        current_dpi = image.info.get('dpi', (72, 72))[0]
-        
-        # Calcul des dimensions de la zone visible
-        width, height = image.size
-        crop_left = int(width * info.get('crop_left', 0))
-        crop_top = int(height * info.get('crop_top', 0))
-        crop_right = int(width * info.get('crop_right', 0))
-        crop_bottom = int(height * info.get('crop_bottom', 0))
-        
-        # Calcul des dimensions de la zone visible
-        visible_width = width - crop_left - crop_right
-        visible_height = height - crop_top - crop_bottom
-        
-        # Recadrage de l'image
-        if crop_left > 0 or crop_top > 0 or crop_right > 0 or crop_bottom > 0:
-            image = image.crop((crop_left, crop_top, width - crop_right, height - crop_bottom))
-            logger.debug(f"Image recadrée : {info['filename']} - Nouvelles dimensions : {visible_width}x{visible_height}")
-        
-        # Si la résolution est supérieure à 150 DPI, on convertit
-        if current_dpi > 150:
-            logger.debug(f"Conversion de l'image {info['filename']} de {current_dpi} DPI à 150 DPI")
-            
-            # Calcul des nouvelles dimensions pour maintenir la taille physique
-            new_width = int(visible_width * (150 / current_dpi))
-            new_height = int(visible_height * (150 / current_dpi))
-            
-            # Redimensionnement de l'image
-            image = image.resize((new_width, new_height), Image.Resampling.LANCZOS)
-        
-        # Conversion en bytes avec préservation du format et de la transparence
-        output = io.BytesIO()
-        
-        # Détermination du format de l'image
-        format = image.format if image.format else 'PNG'
-        
-        # Paramètres de sauvegarde spécifiques au format
-        save_params = {}
-        if format == 'PNG':
-            save_params = {'format': 'PNG', 'optimize': True}
-        elif format == 'JPEG':
-            save_params = {'format': 'JPEG', 'quality': 95}
-        else:
-            save_params = {'format': format}
-        
-        # Ajout de la résolution si nécessaire
-        if current_dpi > 150:
-            save_params['dpi'] = (150, 150)
-        
-        # Sauvegarde de l'image
-        image.save(output, **save_params)
-        return output.getvalue()
-            
-    except Exception as e:
-        logger.error(f"Erreur lors de la conversion de l'image {info.get('filename', 'inconnue')}: {str(e)}")
-        return blob
-
 def emu_to_percentage(emu_value):
     """Convertit une valeur EMU en pourcentage (0-1)."""
     # 100000 EMU = 1%
     return float(emu_value) / 10000000
 
-def remove_crop_info_from_slide_xml(temp_dir, slide_index, cropped_images):
-    """Supprime les infos de rognage dans slideN.xml sans modifier la position ni la taille d'affichage de l'image."""
-    try:
-        slide_xml_path = os.path.join(temp_dir, 'ppt', 'slides', f'slide{slide_index}.xml')
-        rels_path = os.path.join(temp_dir, 'ppt', 'slides', '_rels', f'slide{slide_index}.xml.rels')
-
-        if not os.path.exists(slide_xml_path) or not os.path.exists(rels_path):
-            logger.warning(f"Fichier XML ou RELS manquant pour la diapositive {slide_index}")
-            return
-
-        # Parse des fichiers
-        tree = ET.parse(slide_xml_path)
-        root = tree.getroot()
-        ns = {
-            'p': 'http://schemas.openxmlformats.org/presentationml/2006/main',
-            'a': 'http://schemas.openxmlformats.org/drawingml/2006/main',
-            'r': 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
-        }
-
-        # Parse du fichier .rels
-        rels_tree = ET.parse(rels_path)
-        rels_root = rels_tree.getroot()
-        rId_to_filename = {
-            rel.get('Id'): os.path.basename(rel.get('Target'))
-            for rel in rels_root.findall('r:Relationship', {'r': 'http://schemas.openxmlformats.org/package/2006/relationships'})
-            if rel.get('Type') and 'image' in rel.get('Type')
-        }
-
-        # Traitement des <p:pic>
-        for pic in root.findall('.//p:pic', ns):
-            blip = pic.find('.//a:blip', ns)
-            if blip is None:
+def _media_format(part_name):
+    """Format d'image attendu d'après l'extension de la partie (ex: 'JPEG' pour .jpg), ou None."""
+    extension = os.path.splitext(part_name)[1].lower().lstrip('.')
+    return next((format for format, names in MEDIA_FORMAT_NAMES.items() if extension in names), None)
+
+def _free_part_name(index, rewriter, part_name):
+    """part_name, ou une variante numérotée s'il est déjà pris dans le paquet."""
+    base, extension = os.path.splitext(part_name)
+    candidate, number = part_name, 1
+    while index.has_part(candidate) or rewriter.has_part(candidate):
+        candidate = f'{base}_{number}{extension}'
+        number += 1
+    return candidate
+
+def _blips_patchable(index, source_part, part):
+    """Indique si repoint_blips retrouve toutes les a:blip des images rognables d'une partie."""
+    ordinals = {picture[9] for picture in part['pictures'] if picture[14]}
+    if not ordinals:
+        return True
+    _, patched = repoint_blips(index.read(source_part), {ordinal: (None, (0, 0, 0, 0)) for ordinal in ordinals})
+    if patched != len(ordinals):
+        logger.warning(f"{source_part} : {patched} image(s) retrouvée(s) sur {len(ordinals)}, "
+                       f"leur rognage ne sera pas appliqué")
+        return False
+    return True
+
+def collect_crop_uses(index, media_names, part_cache=None):
+    """Utilisations des médias media_names, avec le rognage (a:srcRect) de chaque image.
+
+    Retourne, pour plan_crops, {média: [(partie source, rId, rang de l'a:blip, (l, t, r, b))]} ;
+    les utilisations hors d'une p:pic de premier niveau étirée (arrière-plan, remplissage,
+    mosaïque, groupe, partie illisible...) ont un rang et un rognage None : elles gardent le
+    média d'origine, de même que toutes celles d'une partie dont repoint_blips ne retrouverait
+    pas chaque a:blip.
+    """
+    parsed = {}
+    patchable = {}
+    uses = {}
+    referrers = index.graph.media_referrers()
+    for media_name in sorted(media_names):
+        media_uses = uses.setdefault(media_name, [])
+        for source_part, rId in referrers.get(media_name, ()):
+            part = None
+            if _is_shape_part(source_part) and index.has_part(source_part):
+                try:
+                    part = _load_part(index, source_part, parse_shape_part, part_cache, parsed)
+                except ValueError as e:
+                    logger.warning(str(e))
+            if part is not None:
+                if source_part not in patchable:
+                    patchable[source_part] = _blips_patchable(index, source_part, part)
+                if not patchable[source_part]:
+                    part = None
+            pictures = [picture for picture in part['pictures'] if picture[0] == rId] if part is not None else []
+            for picture in pictures:
+                if picture[14]:
+                    media_uses.append((source_part, rId, picture[9], tuple(picture[3:7])))
+                else:
+                    # Mosaïque : l'image est répétée à sa taille, le rognage n'est pas reporté
+                    media_uses.append((source_part, rId, None, None))
+            if not pictures or part['blips'].get(rId, 0) > len(pictures):
+                media_uses.append((source_part, rId, None, None))
+    return uses
+
+def _apply_crop_plan(index, rewriter, crop_plan, written):
+    """Redirige les images rognées vers les parties écrites et réduit leur a:srcRect au rognage résiduel.
+
+    written : partie prévue par crop_plan -> partie effectivement écrite (son extension change
+    si le format a changé) ; les images dont la partie n'a pas été écrite restent inchangées.
+    Les relations d'une partie ne sont modifiées qu'une fois toutes ses a:blip retrouvées
+    (voir collect_crop_uses) ; sinon la partie garde ses images d'origine.
+    """
+    graph = index.graph
+    for source_part, pictures in sorted(crop_plan.pictures.items()):
+        relationships = index.rels.get(source_part, {})
+        rels_name = rels_path_for(source_part)
+        rels_xml = rewriter.read(rels_name)
+        retargets = {}
+        added = {}
+        rel_types = {}
+        blips = {}
+        for rId, ordinal, target, residual in pictures:
+            if target not in written:
                 continue
-
-            rId = blip.get('{http://schemas.openxmlformats.org/officeDocument/2006/relationships}embed')
-            filename = rId_to_filename.get(rId)
-            if not filename:
+            if target == crop_plan.targets[target][0]:
+                # Média remplacé sous son nom : la relation désigne déjà la partie rognée
+                blips[ordinal] = (None, residual)
                 continue
-
-            # Trouve le bon blob/image info dans cropped_images
-            image_info = next((info for blob, info in cropped_images.items()
-                               if info['filename'] == filename and info['slide_index'] == slide_index), None)
-            if not image_info:
+            if (source_part, rId) in crop_plan.retargets:
+                retargets[rId] = target
+                blips[ordinal] = (None, residual)
                 continue
-
-            # NE PAS MODIFIER ext (cx, cy) NI off (x, y) !
-            # Juste nettoyer srcRect
-            src_rect = pic.find('.//a:srcRect', ns)
-            if src_rect is not None:
-                for attr in ['l', 't', 'r', 'b']:
-                    if attr in src_rect.attrib:
-                        del src_rect.attrib[attr]
-
-        # Écriture du fichier modifié
-        tree.write(slide_xml_path, encoding='UTF-8', xml_declaration=True)
-
-    except Exception as e:
-        logger.error(f"Erreur dans remove_crop_info_from_slide_xml pour slide {slide_index}: {e}")
-
-def update_pptx_with_cropped_images(file_path, cropped_images):
-    """Met à jour le fichier PPTX avec les images rognées."""
+            if target not in added:
+                # Nouvelle relation vers la partie rognée, au premier rId libre
+                number = 1
+                while f'rId{number}' in relationships or f'rId{number}' in added.values():
+                    number += 1
+                added[target] = f'rId{number}'
+                rel_types[target] = relationships[rId]['type']
+            blips[ordinal] = (added[target], residual)
+        if not blips:
+            continue
+        part_xml, patched = repoint_blips(rewriter.read(source_part), blips)
+        if patched != len(blips):
+            if any(target == crop_plan.targets[target][0] for _, _, target, _ in pictures if target in written):
+                # Le média d'origine est déjà remplacé par son rognage : l'image serait rognée deux fois
+                raise ValueError(f"{patched} image(s) rognée(s) retrouvée(s) sur {len(blips)} dans {source_part}")
+            logger.warning(f"{source_part} : {patched} image(s) rognée(s) retrouvée(s) sur {len(blips)}, "
+                           f"images d'origine conservées")
+            continue
+
+        for rId, target in sorted(retargets.items()):
+            relative = posixpath.relpath(written[target], posixpath.dirname(source_part) or '.')
+            rels_xml = retarget_relationship(rels_xml, rId, relative)
+            graph.retarget(source_part, rId, written[target])
+        for target, rId in added.items():
+            relative = posixpath.relpath(written[target], posixpath.dirname(source_part) or '.')
+            rels_xml = add_relationship(rels_xml, rId, rel_types[target], relative)
+            graph.add(source_part, rId, rel_types[target], written[target])
+        if retargets or added:
+            rewriter.replace(rels_name, rels_xml)
+        rewriter.replace(source_part, part_xml)
+        logger.debug(f"Rognage appliqué à {len(blips)} image(s) de {source_part}, {len(added)} relation(s) ajoutée(s)")
+
+def update_pptx_with_cropped_images(file_path, cropped_images, policy=None, workers=None, target_dpi=None,
+                                    media_cache=None):
+    """Met à jour le fichier PPTX avec les images rognées.
+
+    Chaque zone visible distincte (a:srcRect) d'un média devient une partie, découpée au pixel
+    près (voir plan_crops) ; les images des diapositives, layouts et masques sont redirigées
+    vers la leur et leur a:srcRect ne garde que le rognage résiduel (fraction de pixel, marge
+    ajoutée autour de l'image). Le média d'origine n'est
+    conservé que s'il est encore utilisé sans rognage (ou hors d'une image), sinon il est
+    remplacé par son premier rognage (voir plan_crops).
+    policy : CompressionPolicy appliquée aux fichiers écrits (par défaut, médias stockés et XML dégonflé).
+    workers : nombre de processus de rognage (par défaut, un par cœur).
+    target_dpi : réduit aussi, rognées ou non, les images affichées au-delà de cette résolution
+    (voir plan_downsampling) ; sans valeur, seules les images rognées déclarant plus de 150 DPI
+    sont réduites.
+    """
     try:
         # Création du nom du fichier de sortie
         base_name = os.path.splitext(file_path)[0]
         output_path = f"{base_name}_cropped.pptx"
         
-        # Création d'un répertoire temporaire
-        with tempfile.TemporaryDirectory() as temp_dir:
-            logger.debug(f"Création du répertoire temporaire : {temp_dir}")
-            
-            # Extraction du PPTX original
-            with zipfile.ZipFile(file_path, 'r') as zip_ref:
-                zip_ref.extractall(temp_dir)
+        # Réécriture directe de l'archive source vers l'archive rognée
+        with PackageRewriter(file_path, policy) as rewriter, PackageIndex(file_path) as index:
+            # Une partie par zone visible distincte des images rognées présentes dans l'archive source
+            media_names = [media_name for media_name, info in cropped_images.items()
+                           if info.cropped and index.has_part(media_name)]
+            records = [ImageRecord(media_name) for media_name in sorted(media_names)]
+            read_image_dimensions(index, records, media_cache)
+            sizes = {record.part_name: (record.width, record.height)
+                     for record in records if record.format in CROPPABLE_FORMATS and record.width and record.height}
+            crop_plan = plan_crops(collect_crop_uses(index, media_names), sizes,
+                                   lambda name: index.has_part(name) or rewriter.has_part(name))
+            # Facteurs de réduction d'après la taille d'affichage de chaque partie produite
+            plan = plan_downsampling(index, target_dpi, media_cache, crop_plan=crop_plan) if target_dpi else None
+            jobs = []
+            targets = []
+            for target, (media_name, box) in crop_plan.targets.items():
+                jobs.append((media_name, ImageRecord(media_name, cropped=True),
+                             plan.get(target, 1.0) if plan is not None else None, box))
+                targets.append(target)
+            # Images à réduire sans rognage (un média remplacé par son rognage l'est déjà)
+            for media_name, scale in sorted((plan or {}).items()):
+                if media_name not in crop_plan.targets:
+                    jobs.append((media_name, ImageRecord(media_name), scale, None))
+                    targets.append(media_name)
             
-            # Mise à jour des images rognées
-            processed_slides = set()
-            for blob, info in cropped_images.items():
-                if info["cropped"]:
-                    # Recherche du fichier image dans le répertoire temporaire
-                    image_path = os.path.join(temp_dir, 'ppt', 'media', info['filename'])
-                    if os.path.exists(image_path):
-                        # Rogne l'image avec les informations stockées
-                        cropped_blob = crop_image(blob, info)
-                        # Écrit l'image rognée
-                        with open(image_path, 'wb') as f:
-                            f.write(cropped_blob)
-                        logger.debug(f"Image rognée mise à jour : {info['filename']}")
-                        
-                        # Suppression des informations de rognage dans le XML de la diapositive
-                        if info.get('slide_index') is not None:
-                            processed_slides.add(info['slide_index'])
+            # Rognage en parallèle ; chaque image produite est écrite dans l'archive de sortie
+            encode_report = EncodeReport()
+            written = {}
+            for target, (media_name, result) in zip(targets, crop_images_parallel(file_path, jobs, workers)):
+                encode_report.add(target, result)
+                if result.method == FAILED_METHOD:
+                    continue
+                if result.format in MEDIA_FORMAT_EXTENSIONS and _media_format(target) != result.format:
+                    # Changement de format (PNG photographique devenu JPEG) : la partie change d'extension
+                    extension, content_type = MEDIA_FORMAT_EXTENSIONS[result.format]
+                    written[target] = _free_part_name(index, rewriter, f'{os.path.splitext(target)[0]}.{extension}')
+                    logger.debug(f"Image convertie en {result.format} : {target} -> {written[target]}")
+                else:
+                    written[target] = target
+                    content_type = rewriter.content_type(media_name)
+                if target == media_name and written[target] != media_name:
+                    rename_part(index, rewriter, media_name, written[target], result.data, content_type)
+                    continue
+                rewriter.replace(written[target], result.data)
+                if written[target] != media_name and content_type and rewriter.has_part(CONTENT_TYPES_PART):
+                    rewriter.replace(CONTENT_TYPES_PART, add_default_content_type(
+                        rewriter.read(CONTENT_TYPES_PART), os.path.splitext(written[target])[1].lstrip('.'), content_type))
+                logger.debug(f"Image rognée mise à jour : {os.path.basename(written[target])}")
+            logger.info(f"Encodage des images :\n{encode_report.format()}")
             
-            # Suppression des informations de rognage et ajustement des dimensions pour toutes les diapositives traitées
-            for slide_index in processed_slides:
-                remove_crop_info_from_slide_xml(temp_dir, slide_index, cropped_images)
+            # Redirection des images rognées et suppression de leurs informations de rognage
+            _apply_crop_plan(index, rewriter, crop_plan, written)
+            logger.info(f"Rognage : {len(crop_plan.targets)} partie(s) pour {len(media_names)} image(s) rognée(s), "
+                        f"{len(crop_plan.kept)} conservée(s) pour d'autres utilisations")
             
             # Création du nouveau PPTX
-            with zipfile.ZipFile(output_path, 'w', zipfile.ZIP_DEFLATED) as zip_out:
-                for root, dirs, files in os.walk(temp_dir):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        arcname = os.path.relpath(file_path, temp_dir)
-                        zip_out.write(file_path, arcname)
-                        logger.debug(f"Ajout du fichier dans l'archive : {arcname}")
+            rewriter.write(output_path)
         
         logger.info(f"Version avec images rognées créée : {output_path}")
         return output_path
@@ -629,7 +986,10 @@ def on_drop(event):
     if os.path.isfile(file_path) and file_path.lower().endswith(".pptx"):
         logger.info(f"Fichier valide détecté : {file_path}")
         try:
-            file_name, unused_images, percentage_cropped, total_cropped_size, total_unused_size, cropped_images, used_layout_ids, layout_images, used_images_info, layout_info, layout_used_filenames = analyze_pptx(file_path)
+            report = analyze_pptx(file_path, analysis_cache, media_cache)
+            unused_images = report.unused_images
+            cropped_images = report.cropped_images
+            layout_used_filenames = report.layout_used_filenames
             
             # Stockage des informations pour les boutons
             on_create_light_version.last_file_path = file_path
@@ -644,11 +1004,11 @@ def on_drop(event):
             layout_tree.delete(*layout_tree.get_children())
 
             # Affichage des informations générales
-            result_text.insert("end", f"Nom du fichier : {file_name}\n"
+            result_text.insert("end", f"Nom du fichier : {report.file_path}\n"
                                     f"Nombre total d'images non utilisées : {len(unused_images)}\n"
-                                    f"Poids total des images non utilisées : {total_unused_size/1024:.2f} KB\n"
-                                    f"Pourcentage d'images utilisées qui sont rognées : {percentage_cropped:.2f}%\n"
-                                    f"Poids total estimé des parties rognées : {total_cropped_size/1024:.2f} KB\n\n")
+                                    f"Poids total des images non utilisées : {report.total_unused_size/1024:.2f} KB\n"
+                                    f"Pourcentage d'images utilisées qui sont rognées : {report.percentage_cropped:.2f}%\n"
+                                    f"Poids total estimé des parties rognées : {report.total_cropped_size/1024:.2f} KB\n\n")
 
             # Configuration des colonnes du tableau pour les images non utilisées
             unused_tree['columns'] = ('slide', 'visible', 'filename', 'size', 'dimensions', 'display_dimensions', 'real_dpi', 'crop_info')
@@ -719,105 +1079,84 @@ def on_drop(event):
             # Affichage des images non utilisées
             if unused_images:
                 # Trier les images par taille décroissante
-                sorted_images = sorted(unused_images.items(), key=lambda x: len(x[0]), reverse=True)
-                for blob, info in sorted_images:
-                    try:
-                        image = Image.open(io.BytesIO(blob))
-                        width, height = image.size
-                        # Calcul de la résolution réelle en DPI
-                        # 1 pouce = 2.54 cm
-                        real_dpi = int((width / (info['display_width_cm'] * 2.54)) * 100) / 100
-                        unused_tree.insert('', 'end', values=(
-                            "N/A",
-                            "N/A",
-                            info['filename'],
-                            f"{len(blob)/1024:.2f}",
-                            f"{width}x{height}",
-                            f"{info['display_width_cm']:.2f}x{info['display_height_cm']:.2f} cm",
-                            f"{real_dpi:.1f} DPI",
-                            "Non rognée"
-                        ))
-                    except Exception as e:
-                        logger.error(f"Erreur lors de l'analyse des dimensions de l'image {info['filename']}: {str(e)}")
+                for record in sorted(unused_images.values(), key=lambda record: record.size, reverse=True):
+                    # Résolution réelle en DPI, déjà calculable depuis l'enregistrement
+                    real_dpi = record.real_dpi
+                    unused_tree.insert('', 'end', values=(
+                        "N/A",
+                        "N/A",
+                        record.filename,
+                        f"{record.size/1024:.2f}",
+                        f"{record.width}x{record.height}",
+                        f"{record.display_width_cm:.2f}x{record.display_height_cm:.2f} cm",
+                        f"{real_dpi:.1f} DPI" if real_dpi else "N/A",
+                        "Non rognée"
+                    ))
             else:
                 unused_tree.insert('', 'end', values=("N/A", "N/A", "Aucune image non utilisée trouvée", "N/A", "N/A", "N/A", "N/A", "N/A"))
 
             # Affichage des images des layouts
             layout_total_size = 0
-            for layout_id, images in layout_images.items():
+            for layout_id, layout in report.layouts.items():
                 try:
                     layout_num = int(layout_id)  # Conversion en entier
                     layout_name = f"Layout {layout_num:03d}"  # Format "Layout 999"
                 except ValueError:
                     layout_name = f"Layout {layout_id}"  # Fallback si la conversion échoue
-                
-                # Vérification si le layout est utilisé dans les slides
-                is_used = layout_id in used_layout_ids
-                
-                for image_name in sorted(images):
-                    try:
-                        with zipfile.ZipFile(file_path, 'r') as zip_ref:
-                            image_path = f'ppt/media/{image_name}'
-                            if image_path in zip_ref.namelist():
-                                image_data = zip_ref.read(image_path)
-                                image = Image.open(io.BytesIO(image_data))
-                                width, height = image.size
-                                size_kb = len(image_data) / 1024
-                                layout_total_size += size_kb
-                                layout_tree.insert('', 'end', values=(
-                                    layout_name,
-                                    "Oui" if is_used else "Non",
-                                    image_name,
-                                    f"{size_kb:.2f}",
-                                    f"{width}x{height}",
-                                    "N/A",  # Les images des layouts n'ont pas de dimensions d'affichage
-                                    "N/A",  # Pas de résolution calculée pour les layouts
-                                    "Non rognée"
-                                ))
-                    except Exception as e:
-                        logger.error(f"Erreur lors de l'analyse des dimensions de l'image {image_name}: {str(e)}")
+            
+                for part_name in layout.images:
+                    record = report.layout_images.get(part_name)
+                    if record is None:
+                        continue
+                    size_kb = record.size / 1024
+                    layout_total_size += size_kb
+                    layout_tree.insert('', 'end', values=(
+                        layout_name,
+                        "Oui" if layout.used else "Non",
+                        record.filename,
+                        f"{size_kb:.2f}",
+                        f"{record.width}x{record.height}",
+                        "N/A",  # Les images des layouts n'ont pas de dimensions d'affichage
+                        "N/A",  # Pas de résolution calculée pour les layouts
+                        "Non rognée"
+                    ))
 
             # Ajout des images dans le tableau des images utilisées
-            for img_info in used_images_info:
+            total_used_size = 0
+            for record in report.used_images.values():
                 # Détermination si l'image est dans un layout ou une slide
-                is_layout = img_info['filename'] in layout_used_filenames
-                if not is_layout:  # On n'affiche que les images des slides ici
-                    slide_info = f"{img_info['slide_index']:03d} S"
-                    # Calcul de la résolution réelle en DPI
-                    width, height = map(int, img_info['dimensions'].split('x'))
-                    # Extraction des dimensions d'affichage en supprimant "cm"
-                    display_dims = img_info['display_dimensions'].replace(' cm', '').split('x')
-                    display_width_cm, display_height_cm = map(float, display_dims)
-                    real_dpi = int((width / (display_width_cm * 2.54)) * 100) / 100
-                    tree.insert('', 'end', values=(
-                        slide_info,
-                        "Non" if img_info.get('is_hidden', False) else "Oui",
-                        img_info['filename'],
-                        f"{img_info['size_kb']:.2f}",
-                        img_info['dimensions'],
-                        img_info['display_dimensions'],
-                        f"{real_dpi:.1f} DPI",
-                        img_info['crop_info']
-                    ))
+                if record.filename in layout_used_filenames:  # On n'affiche que les images des slides ici
+                    continue
+                total_used_size += record.size / 1024
+                real_dpi = record.real_dpi
+                crop_info = (f"L={record.crop_left*100:.1f}%, T={record.crop_top*100:.1f}%, "
+                             f"R={record.crop_right*100:.1f}%, B={record.crop_bottom*100:.1f}%") if record.cropped else "Non rognée"
+                tree.insert('', 'end', values=(
+                    f"{record.slide_index:03d} S",
+                    "Non" if record.is_hidden else "Oui",
+                    record.filename,
+                    f"{record.size/1024:.2f}",
+                    f"{record.width}x{record.height}",
+                    f"{record.display_width_cm:.2f}x{record.display_height_cm:.2f} cm",
+                    f"{real_dpi:.1f} DPI" if real_dpi else "N/A",
+                    crop_info
+                ))
 
             # Mise à jour des titres avec les poids totaux
-            total_used_size = sum(img_info['size_kb'] for img_info in used_images_info if img_info['filename'] not in layout_used_filenames)
-            unused_label.config(text=f"Images supprimables : poids {total_unused_size/1024:.2f} Ko")
+            unused_label.config(text=f"Images supprimables : poids {report.total_unused_size/1024:.2f} Ko")
             used_label.config(text=f"Images des slides : poids {total_used_size:.2f} Ko")
             layout_label.config(text=f"Images des layouts : poids {layout_total_size:.2f} Ko")
 
             # Affichage des layouts utilisés
-            result_text.insert("end", f"\nLayouts utilisés ({len(used_layout_ids)}) :\n")
-            for layout_id in sorted(used_layout_ids):
-                info = layout_info.get(layout_id, {})
-                name = info.get('name', f'Layout {layout_id}')
-                type_attr = info.get('type', 'unknown')
-                result_text.insert("end", f"\n- Layout {layout_id} : {name} (Type: {type_attr})")
+            result_text.insert("end", f"\nLayouts utilisés ({len(report.used_layout_ids)}) :\n")
+            for layout_id in sorted(report.used_layout_ids):
+                layout = report.layouts[layout_id]
+                result_text.insert("end", f"\n- Layout {layout_id} : {layout.name} (Type: {layout.type})")
                 
-                if layout_id in layout_images and layout_images[layout_id]:
+                if layout.images:
                     result_text.insert("end", "\n  Images utilisées :")
-                    for image_name in sorted(layout_images[layout_id]):
-                        result_text.insert("end", f"\n    - {image_name}")
+                    for part_name in layout.images:
+                        result_text.insert("end", f"\n    - {os.path.basename(part_name)}")
 
         except Exception as e:
             logger.error(f"Erreur lors de l'analyse du fichier : {str(e)}")
@@ -850,6 +1189,8 @@ def sort_treeview(tree_widget, col, reverse):
 def on_closing():
     """Fonction appelée lors de la fermeture de l'application"""
     logger.info("Fermeture de l'application")
+    analysis_cache.close()
+    media_cache.close()
     root.destroy()
 
 def draw_dashed_rectangle(draw, xy, outline, width=1, dash_length=5, gap_length=5):
@@ -894,8 +1235,8 @@ def show_image_with_frame(filename, window_title):
                 # Recherche des informations de rognage dans les données de l'image
                 is_cropped = False
                 crop_info = None
-                for blob, info in on_create_cropped_version.last_cropped_images.items():
-                    if info['filename'] == filename:
+                for info in on_create_cropped_version.last_cropped_images.values():
+                    if info.filename == filename:
                         is_cropped = True
                         crop_info = info
                         break
@@ -903,10 +1244,10 @@ def show_image_with_frame(filename, window_title):
                     image_with_frame = image.copy()
                     draw = ImageDraw.Draw(image_with_frame)
                     if is_cropped and crop_info:
-                        crop_left = int(new_width * crop_info['crop_left'])
-                        crop_top = int(new_height * crop_info['crop_top'])
-                        crop_right = int(new_width * (1 - crop_info['crop_right']))
-                        crop_bottom = int(new_height * (1 - crop_info['crop_bottom']))
+                        crop_left = int(new_width * crop_info.crop_left)
+                        crop_top = int(new_height * crop_info.crop_top)
+                        crop_right = int(new_width * (1 - crop_info.crop_right))
+                        crop_bottom = int(new_height * (1 - crop_info.crop_bottom))
                         draw.rectangle([(crop_left, crop_top), (crop_right, crop_bottom)], outline=color1, width=4)
                         draw_dashed_rectangle(draw, [(0, 0), (new_width-1, new_height-1)], outline='blue', width=2)
                     else:
@@ -960,94 +1301,117 @@ def show_layout_image(event):
         logger.error(f"Erreur lors de l'affichage de l'image du layout : {str(e)}")
         messagebox.showerror("Erreur", f"Impossible d'afficher l'image : {str(e)}")
 
-# Configuration de l'application
-root = TkinterDnD.Tk()
-root.title("Analyse PPTX")
-
-# Message d'accueil
-welcome_text = "Déposez un fichier PowerPoint (.pptx) ici pour l'analyser\n\n" + \
-               "L'application va :\n" + \
-               "- Identifier les images non utilisées\n" + \
-               "- Calculer le pourcentage d'images rognées\n" + \
-               "- Estimer le poids des parties rognées\n" + \
-               "- Trier les images par taille décroissante\n" + \
-               "- Permettre de créer une version allégée\n" + \
-               "- Permettre de créer une version avec images rognées"
-
-# Création du widget Text avec scrollbar pour les informations générales
-text_frame = Text(root, wrap="word", width=60, height=10)
-text_scrollbar = Scrollbar(text_frame, command=text_frame.yview)
-text_frame.configure(yscrollcommand=text_scrollbar.set)
-
-# Création du widget Treeview pour les images non utilisées
-unused_frame = Frame(root)
-unused_label = Label(unused_frame, text="Images supprimables : poids 0 Ko")
-unused_tree = ttk.Treeview(unused_frame)
-unused_scrollbar = Scrollbar(unused_frame, orient="vertical", command=unused_tree.yview)
-unused_tree.configure(yscrollcommand=unused_scrollbar.set)
-
-# Création du widget Treeview pour les images des layouts
-layout_frame = Frame(root)
-layout_label = Label(layout_frame, text="Images des layouts : poids 0 Ko")
-layout_tree = ttk.Treeview(layout_frame)
-layout_scrollbar = Scrollbar(layout_frame, orient="vertical", command=layout_tree.yview)
-layout_tree.configure(yscrollcommand=layout_scrollbar.set)
-
-# Création du widget Treeview pour les images utilisées
-tree_frame = Frame(root)
-used_label = Label(tree_frame, text="Images affichées : poids 0 Ko")
-tree = ttk.Treeview(tree_frame)
-tree_scrollbar = Scrollbar(tree_frame, orient="vertical", command=tree.yview)
-tree.configure(yscrollcommand=tree_scrollbar.set)
-
-# Création des boutons
-button_frame = Frame(root)
-close_button = Button(button_frame, text="Fermer", command=on_closing)
-light_version_button = Button(button_frame, text="Créer version allégée", command=on_create_light_version)
-cropped_version_button = Button(button_frame, text="Créer version rognée", command=on_create_cropped_version)
-close_button.pack(side="top", padx=5, pady=5, fill="x")
-cropped_version_button.pack(side="top", padx=5, pady=5, fill="x")
-light_version_button.pack(side="top", padx=5, pady=5, fill="x")
-
-# Placement des widgets principaux dans la fenêtre
-main_content = Frame(root)
-main_content.pack(side="left", fill="both", expand=True)
-button_frame.pack(side="right", fill="y")
-
-# Placement des widgets dans main_content
-text_scrollbar.pack(side="right", fill="y")
-text_frame.pack(side="top", fill="x", padx=5, pady=5)
-
-unused_label.pack(side="top", anchor="w", padx=5)
-unused_scrollbar.pack(side="right", fill="y")
-unused_tree.pack(side="left", fill="both", expand=True)
-unused_frame.pack(side="top", fill="x", padx=5, pady=5)
-
-layout_label.pack(side="top", anchor="w", padx=5)
-layout_scrollbar.pack(side="right", fill="y")
-layout_tree.pack(side="left", fill="both", expand=True)
-layout_frame.pack(side="top", fill="x", padx=5, pady=5)
-
-used_label.pack(side="top", anchor="w", padx=5)
-tree_scrollbar.pack(side="right", fill="y")
-tree.pack(side="left", fill="both", expand=True)
-tree_frame.pack(side="top", fill="both", expand=True, padx=5, pady=5)
-
-# Configuration du texte
-result_text = text_frame
-result_text.insert("end", welcome_text)
-
-# Configuration du glisser-déposer
-root.drop_target_register(DND_FILES)
-root.dnd_bind('<<Drop>>', on_drop)
-
-# Configuration de la fermeture propre
-root.protocol("WM_DELETE_WINDOW", on_closing)
-
-# Configuration des événements de double-clic
-tree.bind('<Double-1>', show_image)
-unused_tree.bind('<Double-1>', show_unused_image)
-layout_tree.bind('<Double-1>', show_layout_image)
-
-logger.info("Démarrage de l'application")
-root.mainloop()
\ No newline at end of file
+if __name__ == "__main__":
+    # Nécessaire pour le pool de processus dans la version portable (PyInstaller)
+    multiprocessing.freeze_support()
+
+    # Avec des arguments : traitement en ligne de commande, sans importer Tk
+    if len(sys.argv) > 1:
+        from slim_cli import main
+        sys.exit(main())
+
+    # Les imports Tk ne sont faits que pour l'interface graphique : le module reste
+    # importable sur une machine sans affichage
+    from tkinter import Tk, Label, StringVar, Scrollbar, Text, Button, Frame
+    from tkinterdnd2 import DND_FILES, TkinterDnD
+    from tkinter import ttk
+    from PIL import ImageTk
+    import tkinter.messagebox as messagebox
+    from tkinter import Toplevel
+
+    # Cache des analyses : un fichier déposé à nouveau sans modification s'affiche immédiatement
+    analysis_cache = AnalysisCache()
+    # Métadonnées des images partagées entre les fichiers (logos, fonds des modèles)
+    media_cache = MediaMetadataCache.persistent()
+
+    # Configuration de l'application
+    root = TkinterDnD.Tk()
+    root.title("Analyse PPTX")
+
+    # Message d'accueil
+    welcome_text = "Déposez un fichier PowerPoint (.pptx) ici pour l'analyser\n\n" + \
+                   "L'application va :\n" + \
+                   "- Identifier les images non utilisées\n" + \
+                   "- Calculer le pourcentage d'images rognées\n" + \
+                   "- Estimer le poids des parties rognées\n" + \
+                   "- Trier les images par taille décroissante\n" + \
+                   "- Permettre de créer une version allégée\n" + \
+                   "- Permettre de créer une version avec images rognées"
+
+    # Création du widget Text avec scrollbar pour les informations générales
+    text_frame = Text(root, wrap="word", width=60, height=10)
+    text_scrollbar = Scrollbar(text_frame, command=text_frame.yview)
+    text_frame.configure(yscrollcommand=text_scrollbar.set)
+
+    # Création du widget Treeview pour les images non utilisées
+    unused_frame = Frame(root)
+    unused_label = Label(unused_frame, text="Images supprimables : poids 0 Ko")
+    unused_tree = ttk.Treeview(unused_frame)
+    unused_scrollbar = Scrollbar(unused_frame, orient="vertical", command=unused_tree.yview)
+    unused_tree.configure(yscrollcommand=unused_scrollbar.set)
+
+    # Création du widget Treeview pour les images des layouts
+    layout_frame = Frame(root)
+    layout_label = Label(layout_frame, text="Images des layouts : poids 0 Ko")
+    layout_tree = ttk.Treeview(layout_frame)
+    layout_scrollbar = Scrollbar(layout_frame, orient="vertical", command=layout_tree.yview)
+    layout_tree.configure(yscrollcommand=layout_scrollbar.set)
+
+    # Création du widget Treeview pour les images utilisées
+    tree_frame = Frame(root)
+    used_label = Label(tree_frame, text="Images affichées : poids 0 Ko")
+    tree = ttk.Treeview(tree_frame)
+    tree_scrollbar = Scrollbar(tree_frame, orient="vertical", command=tree.yview)
+    tree.configure(yscrollcommand=tree_scrollbar.set)
+
+    # Création des boutons
+    button_frame = Frame(root)
+    close_button = Button(button_frame, text="Fermer", command=on_closing)
+    light_version_button = Button(button_frame, text="Créer version allégée", command=on_create_light_version)
+    cropped_version_button = Button(button_frame, text="Créer version rognée", command=on_create_cropped_version)
+    close_button.pack(side="top", padx=5, pady=5, fill="x")
+    cropped_version_button.pack(side="top", padx=5, pady=5, fill="x")
+    light_version_button.pack(side="top", padx=5, pady=5, fill="x")
+
+    # Placement des widgets principaux dans la fenêtre
+    main_content = Frame(root)
+    main_content.pack(side="left", fill="both", expand=True)
+    button_frame.pack(side="right", fill="y")
+
+    # Placement des widgets dans main_content
+    text_scrollbar.pack(side="right", fill="y")
+    text_frame.pack(side="top", fill="x", padx=5, pady=5)
+
+    unused_label.pack(side="top", anchor="w", padx=5)
+    unused_scrollbar.pack(side="right", fill="y")
+    unused_tree.pack(side="left", fill="both", expand=True)
+    unused_frame.pack(side="top", fill="x", padx=5, pady=5)
+
+    layout_label.pack(side="top", anchor="w", padx=5)
+    layout_scrollbar.pack(side="right", fill="y")
+    layout_tree.pack(side="left", fill="both", expand=True)
+    layout_frame.pack(side="top", fill="x", padx=5, pady=5)
+
+    used_label.pack(side="top", anchor="w", padx=5)
+    tree_scrollbar.pack(side="right", fill="y")
+    tree.pack(side="left", fill="both", expand=True)
+    tree_frame.pack(side="top", fill="both", expand=True, padx=5, pady=5)
+
+    # Configuration du texte
+    result_text = text_frame
+    result_text.insert("end", welcome_text)
+
+    # Configuration du glisser-déposer
+    root.drop_target_register(DND_FILES)
+    root.dnd_bind('<<Drop>>', on_drop)
+
+    # Configuration de la fermeture propre
+    root.protocol("WM_DELETE_WINDOW", on_closing)
+
+    # Configuration des événements de double-clic
+    tree.bind('<Double-1>', show_image)
+    unused_tree.bind('<Double-1>', show_unused_image)
+    layout_tree.bind('<Double-1>', show_layout_image)
+
+    logger.info("Démarrage de l'application")
+    root.mainloop()
@@ -0,0 +1,98 @@
+import io
+import os
+import re
+import sys
+import zipfile
+import xml.etree.ElementTree as ET
+
+import numpy as np
+import pytest
+from PIL import Image
+
+# Les modules du projet sont à la racine du dépôt
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from package_index import resolve_target, source_part_for  # noqa: E402
+from package_writer import CONTENT_TYPES_PART  # noqa: E402
+
+
+def image_bytes(width, height, format='PNG', seed=0, **params):
+    """Image aléatoire (bruit par blocs de 10 pixels) encodée dans le format demandé."""
+    rng = np.random.default_rng(seed)
+    blocks = rng.integers(0, 255, ((height + 9) // 10, (width + 9) // 10, 3), dtype=np.uint8)
+    pixels = np.repeat(np.repeat(blocks, 10, 0), 10, 1)[:height, :width]
+    output = io.BytesIO()
+    Image.fromarray(pixels).save(output, format, **params)
+    return output.getvalue()
+
+
+@pytest.fixture
+def make_image():
+    return image_bytes
+
+
+def build_deck(path, pictures, slide_count=None):
+    """Présentation python-pptx avec une image par entrée de pictures.
+
+    pictures : [(rang de la diapositive, données de l'image, rognage (l, t, r, b) en fractions ou None)] ;
+    une même donnée d'image sur plusieurs diapositives partage un seul média.
+    """
+    from pptx import Presentation
+    from pptx.util import Cm
+
+    presentation = Presentation()
+    slide_count = slide_count or max(slide for slide, _, _ in pictures) + 1
+    slides = [presentation.slides.add_slide(presentation.slide_layouts[6]) for _ in range(slide_count)]
+    for slide, data, crop in pictures:
+        picture = slides[slide].shapes.add_picture(io.BytesIO(data), Cm(1), Cm(1), Cm(8))
+        if crop:
+            picture.crop_left, picture.crop_top, picture.crop_right, picture.crop_bottom = crop
+    presentation.save(path)
+    return str(path)
+
+
+def rewrite_part(path, part_name, transform):
+    """Réécrit une partie d'une archive avec transform(données) -> données (b'' pour une partie absente)."""
+    with zipfile.ZipFile(path) as source:
+        items = [(info.filename, source.read(info)) for info in source.infolist()]
+    if part_name not in dict(items):
+        items.append((part_name, b''))
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as target:
+        for name, data in items:
+            target.writestr(name, transform(data) if name == part_name else data)
+
+
+def package_problems(path):
+    """Incohérences d'un paquet : relation vers une partie absente, rId non déclaré, partie sans type
+    de contenu, Override sans partie, membre corrompu. Liste vide si le paquet est cohérent."""
+    problems = []
+    with zipfile.ZipFile(path) as archive:
+        if archive.testzip() is not None:
+            problems.append(f"membre corrompu : {archive.testzip()}")
+        names = set(archive.namelist())
+        types = ET.fromstring(archive.read(CONTENT_TYPES_PART))
+        defaults = {element.get('Extension').lower() for element in types if element.tag.endswith('Default')}
+        overrides = {element.get('PartName').lstrip('/') for element in types if element.tag.endswith('Override')}
+        problems += [f"Override sans partie : {name}" for name in sorted(overrides - names)]
+        for name in sorted(names - {CONTENT_TYPES_PART}):
+            if name not in overrides and name.rsplit('.', 1)[-1].lower() not in defaults:
+                problems.append(f"partie sans type de contenu : {name}")
+            if not name.endswith('.rels'):
+                continue
+            source = source_part_for(name)
+            ids = set()
+            for relationship in ET.fromstring(archive.read(name)):
+                ids.add(relationship.get('Id'))
+                if (relationship.get('TargetMode') != 'External'
+                        and resolve_target(source, relationship.get('Target')) not in names):
+                    problems.append(f"cible absente : {name} -> {relationship.get('Target')}")
+            if source in names and source.endswith('.xml'):
+                for rId in set(re.findall(rb':(?:embed|link|id|pict)="(rId\d+)"', archive.read(source))):
+                    if rId.decode() not in ids:
+                        problems.append(f"rId non déclaré : {source} {rId.decode()}")
+    return problems
+
+
+@pytest.fixture
+def deck_builder():
+    return build_deck
@@ -0,0 +1,61 @@
+import io
+
+import pptx.parts.image
+import pytest
+from pptx import Presentation
+from pptx.util import Cm
+
+from slim_pptx import analyze_pptx
+
+
+def _mixed_deck(path, make_image):
+    """Image dans un groupe, image dans un espace réservé, diapositive masquée, image partagée."""
+    shared = make_image(120, 90)
+    presentation = Presentation()
+    blank, picture_layout = presentation.slide_layouts[6], presentation.slide_layouts[8]
+
+    slide = presentation.slides.add_slide(blank)
+    picture = slide.shapes.add_picture(io.BytesIO(shared), Cm(1), Cm(1), Cm(6))
+    picture.crop_left = 0.25
+    group = slide.shapes.add_group_shape()
+    group.shapes.add_picture(io.BytesIO(make_image(60, 60, seed=1)), Cm(10), Cm(1), Cm(3))
+
+    slide = presentation.slides.add_slide(picture_layout)
+    placeholder = next(shape for shape in slide.placeholders if shape.placeholder_format.type == 18)
+    placeholder.insert_picture(io.BytesIO(make_image(200, 100, seed=2)))
+
+    slide = presentation.slides.add_slide(blank)
+    slide.shapes.add_picture(io.BytesIO(shared), Cm(2), Cm(2), Cm(10))
+    slide._element.set('show', '0')
+
+    presentation.save(path)
+    return str(path)
+
+
+def test_iterparse_and_python_pptx_backends_give_the_same_report(tmp_path, make_image):
+    deck = _mixed_deck(tmp_path / 'deck.pptx', make_image)
+    iterparse = analyze_pptx(deck, backend='iterparse')
+    python_pptx = analyze_pptx(deck, backend='python-pptx')
+
+    assert iterparse.to_dict() == python_pptx.to_dict()
+    # Image partagée (rognée, puis sur une diapositive masquée) et image de l'espace réservé,
+    # dont la taille est héritée du layout
+    images = iterparse.used_images
+    assert len(images) == 2
+    assert any(record.cropped and record.is_hidden for record in images.values())
+    assert all(record.display_width_cm > 0 and record.display_height_cm > 0 for record in images.values())
+    # L'image du groupe n'est pas une forme de premier niveau, mais reste atteignable
+    assert iterparse.unused_images == {}
+
+
+@pytest.mark.parametrize('backend', ['iterparse', 'python-pptx'])
+def test_pictures_are_resolved_without_reading_image_bytes(tmp_path, make_image, monkeypatch, backend):
+    deck = _mixed_deck(tmp_path / 'deck.pptx', make_image)
+
+    def no_blob(self):
+        raise AssertionError("octets de l'image lus pendant l'analyse")
+    monkeypatch.setattr(pptx.parts.image.Image, 'blob', property(no_blob))
+    monkeypatch.setattr(pptx.parts.image.ImagePart, 'blob', property(no_blob))
+
+    report = analyze_pptx(deck, backend=backend)
+    assert sorted(report.used_images) == ['ppt/media/image1.png', 'ppt/media/image3.png']
@@ -0,0 +1,84 @@
+import io
+import os
+
+import pytest
+
+import slim_pptx
+from analysis_cache import AnalysisCache, fingerprint, part_digest
+from conftest import rewrite_part
+from slim_pptx import analyze_pptx
+
+
+def _count_analyses(monkeypatch):
+    calls = []
+    analyze = slim_pptx._analyze_pptx_with_index
+
+    def counting(*args, **kwargs):
+        calls.append(args[0])
+        return analyze(*args, **kwargs)
+    monkeypatch.setattr(slim_pptx, '_analyze_pptx_with_index', counting)
+    return calls
+
+
+def test_unchanged_file_is_served_from_the_cache(tmp_path, make_image, deck_builder, monkeypatch):
+    deck = deck_builder(tmp_path / 'deck.pptx', [(0, make_image(100, 50), (0.2, 0, 0, 0))])
+    calls = _count_analyses(monkeypatch)
+    with AnalysisCache(str(tmp_path / 'cache.sqlite3')) as cache:
+        first = analyze_pptx(deck, cache)
+        second = analyze_pptx(deck, cache)
+    assert len(calls) == 1
+    assert second.to_msgpack() == first.to_msgpack()
+
+
+def test_content_change_invalidates_the_cached_report(tmp_path, make_image, deck_builder, monkeypatch):
+    deck = deck_builder(tmp_path / 'deck.pptx', [(0, make_image(100, 50), (0.2, 0, 0, 0))])
+    calls = _count_analyses(monkeypatch)
+    with AnalysisCache(str(tmp_path / 'cache.sqlite3')) as cache:
+        before = analyze_pptx(deck, cache)
+        key = fingerprint(deck)
+        stat = os.stat(deck)
+        rewrite_part(deck, 'ppt/slides/slide1.xml', lambda data: data.replace(b'l="20000"', b'l="40000"'))
+        # Même date de modification : le hachage du répertoire central (CRC des parties) suffit
+        os.utime(deck, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        assert fingerprint(deck) != key
+        after = analyze_pptx(deck, cache)
+    assert len(calls) == 2
+    [record] = after.used_images.values()
+    assert record.crop_left == 0.4
+    assert [record.crop_left for record in before.used_images.values()] == [0.2]
+
+
+def test_unusable_cache_falls_back_to_analysis(tmp_path, make_image, deck_builder):
+    deck = deck_builder(tmp_path / 'deck.pptx', [(0, make_image(100, 50), None)])
+    (tmp_path / 'cache').write_text('pas un répertoire')
+    with AnalysisCache(str(tmp_path / 'cache' / 'cache.sqlite3')) as cache:
+        assert cache.key_for(deck) is None
+        assert len(analyze_pptx(deck, cache).used_images) == 1
+
+
+def test_parts_with_the_same_crc_and_size_are_told_apart(tmp_path):
+    first, second = b'<sld a="1"/>', b'<sld b="2"/>'
+    with AnalysisCache(str(tmp_path / 'cache.sqlite3')) as cache:
+        # Collision CRC32 simulée : même CRC et même taille, contenus différents
+        cache.put_part('parse_shape_part', 0x1234, len(first), part_digest(first), {'pictures': [1]})
+        assert cache.get_part('parse_shape_part', 0x1234, len(first), part_digest(first)) == {'pictures': [1]}
+        assert cache.get_part('parse_shape_part', 0x1234, len(second), part_digest(second)) is None
+    assert part_digest(io.BytesIO(first * 100000)) == part_digest(first * 100000)
+
+
+def test_failed_analysis_leaves_no_pending_parts(tmp_path, make_image, deck_builder, monkeypatch):
+    deck = deck_builder(tmp_path / 'deck.pptx', [(0, make_image(100, 50), None)])
+
+    def failing(*args, **kwargs):
+        raise OSError("lecture impossible")
+    with AnalysisCache(str(tmp_path / 'cache.sqlite3')) as cache:
+        with monkeypatch.context() as patch:
+            patch.setattr(slim_pptx, 'read_image_dimensions', failing)
+            with pytest.raises(OSError):
+                analyze_pptx(deck, cache)
+        assert cache._pending_parts == {}
+
+        # Parties laissées par une analyse interrompue hors d'analyze_pptx : oubliées au départ suivant
+        cache.put_part('parse_shape_part', 1, 2, part_digest(b'xx'), {'pictures': []})
+        analyze_pptx(deck, cache)
+        assert cache.get_part('parse_shape_part', 1, 2, part_digest(b'xx')) is None
@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from analysis_model import REPORT_FORMAT_VERSION, DeckReport, ImageRecord, LayoutRecord
+from conftest import rewrite_part
+from slim_pptx import analyze_pptx
+
+
+def _report():
+    cropped = ImageRecord('ppt/media/image1.jpeg', size=52000, width=1200, height=800, format='JPEG', dpi=300.0,
+                          slide_index=2, used=True, is_hidden=True, cropped=True, crop_left=0.125, crop_top=0.0,
+                          crop_right=0.25, crop_bottom=-0.05, display_width_cm=8.5, display_height_cm=4.25)
+    plain = ImageRecord('ppt/media/image2.png', size=900, width=40, height=30, format='PNG', slide_index=1, used=True)
+    unused = ImageRecord('ppt/media/image3.emf', size=1234, format='WMF')
+    layout_image = ImageRecord('ppt/media/image4.png', size=321, used=True)
+    layout = LayoutRecord(6, 'Vide', 'blank', True, ['ppt/media/image4.png'])
+    return DeckReport('/tmp/présentation.pptx', 98765, {record.part_name: record for record in (cropped, plain)},
+                      {unused.part_name: unused}, {6: layout}, {layout_image.part_name: layout_image})
+
+
+def _assert_same(restored, report):
+    assert restored.to_dict() == report.to_dict()
+    assert restored.cropped_images.keys() == report.cropped_images.keys() == {'ppt/media/image1.jpeg'}
+    assert restored.total_unused_size == report.total_unused_size
+    assert restored.total_cropped_size == report.total_cropped_size
+    assert restored.layout_used_filenames == report.layout_used_filenames
+    record = restored.used_images['ppt/media/image1.jpeg']
+    assert (record.crop_ratio, record.real_dpi) == (report.used_images['ppt/media/image1.jpeg'].crop_ratio,
+                                                    report.used_images['ppt/media/image1.jpeg'].real_dpi)
+
+
+def test_report_round_trips_through_json():
+    report = _report()
+    _assert_same(DeckReport.from_dict(json.loads(json.dumps(report.to_dict()))), report)
+    _assert_same(DeckReport.from_json(report.to_json()), report)
+
+
+def test_report_round_trips_through_msgpack():
+    report = _report()
+    _assert_same(DeckReport.from_msgpack(report.to_msgpack()), report)
+
+
+def test_analyzed_report_round_trips(tmp_path, make_image, deck_builder):
+    deck = deck_builder(tmp_path / 'deck.pptx', [(0, make_image(100, 50), (0.2, 0.1, 0, 0)),
+                                                 (1, make_image(80, 40, seed=1), None)])
+    # Média sans aucune relation : image non utilisée
+    rewrite_part(deck, 'ppt/media/orpheline.png', lambda _: make_image(30, 20, seed=2))
+    report = analyze_pptx(deck)
+    assert report.cropped_images and list(report.unused_images) == ['ppt/media/orpheline.png']
+    for restored in (DeckReport.from_json(report.to_json()), DeckReport.from_msgpack(report.to_msgpack())):
+        assert restored.to_dict() == report.to_dict()
+
+
+def test_other_report_versions_are_rejected():
+    data = _report().to_dict()
+    data['version'] = REPORT_FORMAT_VERSION + 1
+    with pytest.raises(ValueError):
+        DeckReport.from_dict(data)
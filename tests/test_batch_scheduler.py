@@ -0,0 +1,103 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import batch_scheduler
+from batch_scheduler import run_batch, resource
+from slim_cli import SUMMARY_FIELDS
+
+
+def _quick(file_path):
+    return {'file': file_path, 'status': 'ok'}
+
+
+def _sleep(file_path, seconds=30):
+    time.sleep(seconds)
+    return {'file': file_path, 'status': 'ok'}
+
+
+def _spawn_and_sleep(file_path, pid_file):
+    # Comme un pool de rognage : un processus enfant qui survivrait à son parent
+    child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])
+    with open(pid_file, 'w') as f:
+        f.write(str(child.pid))
+    time.sleep(60)
+
+
+def _allocate(file_path, size):
+    if 'big' in os.path.basename(file_path):
+        bytearray(size)
+    return {'file': file_path, 'status': 'ok'}
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    # Un processus zombie (déjà terminé, pas encore recueilli) compte comme arrêté
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().split(')')[-1].split()[0] != 'Z'
+    except OSError:
+        return True
+
+
+def test_results_and_failures_share_summary_fields(tmp_path):
+    files = [str(tmp_path / 'a.pptx'), str(tmp_path / 'b.pptx')]
+    summaries = list(run_batch(files, _sleep, jobs=2, timeout=0.5, worker_kwargs={'seconds': 30},
+                               summary_fields=SUMMARY_FIELDS))
+    assert sorted(s['file'] for s in summaries) == sorted(files)
+    for summary in summaries:
+        assert tuple(summary) == SUMMARY_FIELDS
+        assert summary['status'] == 'error'
+        assert 'Délai dépassé' in summary['error']
+        assert summary['seconds'] < 10
+
+
+def test_quick_files_are_not_timed_out(tmp_path):
+    summaries = list(run_batch([str(tmp_path / 'a.pptx')], _quick, timeout=30))
+    assert summaries == [{'file': str(tmp_path / 'a.pptx'), 'status': 'ok'}]
+
+
+@pytest.mark.skipif(not hasattr(os, 'killpg'), reason="groupes de processus POSIX")
+def test_timeout_kills_worker_children(tmp_path):
+    pid_file = tmp_path / 'child.pid'
+    summaries = list(run_batch([str(tmp_path / 'a.pptx')], _spawn_and_sleep, timeout=2,
+                               worker_kwargs={'pid_file': str(pid_file)}))
+    assert summaries[0]['status'] == 'error'
+    child_pid = int(pid_file.read_text())
+    deadline = time.monotonic() + 5
+    while _alive(child_pid) and time.monotonic() < deadline:
+        time.sleep(0.1)
+    assert not _alive(child_pid)
+
+
+@pytest.mark.skipif(resource is None, reason="limite mémoire POSIX")
+def test_memory_limit_fails_only_the_offending_file(tmp_path):
+    files = [str(tmp_path / 'big.pptx'), str(tmp_path / 'small.pptx')]
+    summaries = {s['file']: s for s in run_batch(
+        files, _allocate, jobs=1, max_memory=1024 * 1024 * 1024,
+        worker_kwargs={'size': 4 * 1024 * 1024 * 1024}, summary_fields=SUMMARY_FIELDS)}
+    assert summaries[files[0]]['status'] == 'error'
+    assert 'MemoryError' in summaries[files[0]]['error']
+    assert tuple(summaries[files[0]]) == SUMMARY_FIELDS
+    assert summaries[files[1]] == {'file': files[1], 'status': 'ok'}
+
+
+def _hang_after_summary(file_path):
+    # Thread non démon : le processus ne se termine pas après l'envoi de son résumé
+    import threading
+    threading.Thread(target=time.sleep, args=(60,)).start()
+    return {'file': file_path, 'status': 'ok'}
+
+
+def test_worker_hanging_after_its_summary_does_not_block_the_batch(tmp_path, monkeypatch):
+    monkeypatch.setattr(batch_scheduler, 'JOIN_GRACE', 0.5)
+    start = time.monotonic()
+    summaries = list(run_batch([str(tmp_path / 'a.pptx')], _hang_after_summary))
+    assert summaries == [{'file': str(tmp_path / 'a.pptx'), 'status': 'ok'}]
+    assert time.monotonic() - start < 10
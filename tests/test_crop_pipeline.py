@@ -0,0 +1,66 @@
+import io
+import re
+import zipfile
+
+from PIL import Image
+
+from conftest import rewrite_part
+from slim_pptx import analyze_pptx, update_pptx_with_cropped_images
+
+
+def _blip_targets(path, slide):
+    """Médias désignés par les a:blip d'une diapositive, dans l'ordre du document, et leurs a:srcRect."""
+    with zipfile.ZipFile(path) as archive:
+        slide_xml = archive.read(f'ppt/slides/slide{slide}.xml').decode()
+        rels_xml = archive.read(f'ppt/slides/_rels/slide{slide}.xml.rels').decode()
+        targets = dict(re.findall(r'Id="(rId\d+)"[^>]*Target="\.\./media/([^"]+)"', rels_xml))
+        targets.update((rId, target) for target, rId in
+                       re.findall(r'Target="\.\./media/([^"]+)"[^>]*Id="(rId\d+)"', rels_xml))
+        blips = re.findall(r':embed="(rId\d+)"', slide_xml)
+        sizes = {name: Image.open(io.BytesIO(archive.read(f'ppt/media/{name}'))).size for name in targets.values()}
+        return [(targets[rId], sizes[targets[rId]]) for rId in blips], re.findall(r'<\w+:srcRect[^>]*>', slide_xml)
+
+
+def _slide_xml(path, slide):
+    with zipfile.ZipFile(path) as archive:
+        return archive.read(f'ppt/slides/slide{slide}.xml').decode()
+
+
+def test_shared_media_cropped_under_default_drawingml_namespace(tmp_path, make_image, deck_builder):
+    image = make_image(400, 300)
+    deck = deck_builder(tmp_path / 'deck.pptx', [(0, image, (0.25, 0, 0.25, 0)), (1, image, None)])
+
+    def rename_prefixes(data):
+        # DrawingML en espace de noms par défaut, relations sous un autre préfixe
+        data = re.sub(rb'xmlns:a=', b'xmlns=', data)
+        data = re.sub(rb'<(/?)a:', rb'<\1', data)
+        return data.replace(b'xmlns:r=', b'xmlns:rel=').replace(b' r:', b' rel:')
+    rewrite_part(deck, 'ppt/slides/slide1.xml', rename_prefixes)
+
+    report = analyze_pptx(deck)
+    output = update_pptx_with_cropped_images(deck, report.cropped_images, workers=1)
+    assert output is not None
+    with zipfile.ZipFile(output) as archive:
+        assert archive.testzip() is None
+
+    cropped, src_rects = _blip_targets(output, 1)
+    assert [size for _, size in cropped] == [(200, 300)]
+    assert src_rects == [] and '<srcRect/>' in _slide_xml(output, 1)
+    kept, _ = _blip_targets(output, 2)
+    assert [size for _, size in kept] == [(400, 300)]
+    assert cropped[0][0] != kept[0][0]
+
+
+def test_parts_with_unmatched_blips_keep_their_original_media(tmp_path, make_image, deck_builder, monkeypatch):
+    import slim_pptx
+
+    image = make_image(400, 300)
+    deck = deck_builder(tmp_path / 'deck.pptx', [(0, image, (0.25, 0, 0.25, 0))])
+    monkeypatch.setattr(slim_pptx, 'repoint_blips', lambda part_xml, blips: (part_xml, 0))
+
+    report = analyze_pptx(deck)
+    output = update_pptx_with_cropped_images(deck, report.cropped_images, workers=1)
+    assert output is not None
+    pictures, src_rects = _blip_targets(output, 1)
+    assert [size for _, size in pictures] == [(400, 300)]
+    assert src_rects == ['<a:srcRect l="25000" r="25000"/>']
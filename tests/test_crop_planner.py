@@ -0,0 +1,72 @@
+import pytest
+
+from crop_planner import PERCENTAGE_UNIT, crop_boxes, plan_crops
+
+
+def test_crop_boxes_cover_the_visible_pixels():
+    boxes, residuals, valid = crop_boxes([(0.25, 0.1, 0.25, 0.1), (0.101, 0, 0, 0)], [(400, 300), (100, 50)])
+    assert boxes.tolist() == [[100, 30, 300, 270], [10, 0, 100, 50]]
+    assert valid.tolist() == [True, True]
+    assert residuals[0].tolist() == [0, 0, 0, 0]
+    # Fraction de pixel en bordure : rendue en marge résiduelle relative à la boîte
+    assert residuals[1] == pytest.approx([0.1 / 90, 0, 0, 0])
+
+
+def test_negative_insets_are_kept_as_residual_margins():
+    # Marge ajoutée à gauche (l < 0), rognage en haut et en bas
+    boxes, residuals, valid = crop_boxes([(-0.1, 0.2, 0, -0.05)], [(200, 100)])
+    assert boxes.tolist() == [[0, 20, 200, 100]]
+    assert residuals[0] == pytest.approx([-0.1, 0, 0, -5 / 80])
+    assert valid.tolist() == [True]
+    # La zone affichée est inchangée : bords de la boîte étendus par les marges résiduelles
+    width, height = 200, 80
+    left = boxes[0, 0] + residuals[0, 0] * width
+    bottom = boxes[0, 3] - residuals[0, 3] * height
+    assert (left, bottom) == pytest.approx((-20, 105))
+
+
+def test_empty_visible_area_is_invalid():
+    _, _, valid = crop_boxes([(0.6, 0, 0.5, 0), (0, 1.2, 0, 0), (0, 0, 0, 0)], [(100, 100)] * 3)
+    assert valid.tolist() == [False, False, True]
+
+
+def test_margins_only_leave_the_media_untouched():
+    plan = plan_crops({'ppt/media/image1.png': [('ppt/slides/slide1.xml', 'rId2', 0, (-0.1, -0.1, 0, 0))]},
+                      {'ppt/media/image1.png': (200, 100)}, lambda name: False)
+    assert plan.targets == {} and plan.pictures == {} and plan.kept == set()
+
+
+def test_shared_media_gets_one_part_per_distinct_box():
+    media = 'ppt/media/image1.png'
+    uses = {media: [
+        ('ppt/slides/slide1.xml', 'rId2', 0, (0.5, 0, 0, 0)),
+        ('ppt/slides/slide2.xml', 'rId2', 0, (0.5, 0, 0, 0)),
+        ('ppt/slides/slide3.xml', 'rId4', 0, (0, 0, 0.5, 0)),
+    ]}
+    plan = plan_crops(uses, {media: (200, 100)}, lambda name: False)
+    # Le média n'est plus utilisé tel quel : la première boîte le remplace sous son nom
+    assert plan.targets == {media: (media, (0, 0, 100, 100)),
+                            'ppt/media/image1_crop2.png': (media, (100, 0, 200, 100))}
+    assert plan.kept == set()
+    assert plan.retargets == {('ppt/slides/slide1.xml', 'rId2'): 'ppt/media/image1_crop2.png',
+                              ('ppt/slides/slide2.xml', 'rId2'): 'ppt/media/image1_crop2.png',
+                              ('ppt/slides/slide3.xml', 'rId4'): media}
+    assert plan.pictures['ppt/slides/slide1.xml'] == [('rId2', 0, 'ppt/media/image1_crop2.png', (0, 0, 0, 0))]
+
+
+def test_uncropped_use_keeps_the_original_media():
+    media = 'ppt/media/image1.png'
+    uses = {media: [('ppt/slides/slide1.xml', 'rId2', 0, (0.5, 0, 0, 0)),
+                    ('ppt/slides/slide1.xml', 'rId3', None, None)]}
+    plan = plan_crops(uses, {media: (200, 100)}, lambda name: name == 'ppt/media/image1_crop1.png')
+    assert plan.kept == {media}
+    assert list(plan.targets) == ['ppt/media/image1_crop2.png']
+    assert plan.pictures['ppt/slides/slide1.xml'] == [('rId2', 0, 'ppt/media/image1_crop2.png', (0, 0, 0, 0))]
+
+
+def test_negative_insets_are_planned_in_st_percentage():
+    media = 'ppt/media/image1.png'
+    plan = plan_crops({media: [('ppt/slides/slide1.xml', 'rId2', 0, (-0.1, 0.2, 0, 0))]},
+                      {media: (200, 100)}, lambda name: False)
+    assert plan.targets == {media: (media, (0, 20, 200, 100))}
+    assert plan.pictures['ppt/slides/slide1.xml'] == [('rId2', 0, media, (-PERCENTAGE_UNIT // 10, 0, 0, 0))]
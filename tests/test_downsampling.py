@@ -0,0 +1,95 @@
+import io
+import zipfile
+
+import pytest
+from pptx import Presentation
+from pptx.util import Cm
+
+from conftest import rewrite_part
+from crop_planner import plan_crops
+from package_index import PackageIndex
+from slim_pptx import (EMU_PER_INCH, analyze_pptx, collect_crop_uses, collect_picture_uses, plan_downsampling,
+                       update_pptx_with_cropped_images)
+
+
+def _pixels(dpi, emu):
+    return dpi * emu / EMU_PER_INCH
+
+
+def test_cropped_and_uncropped_uses_are_sized_separately(tmp_path, make_image, deck_builder):
+    # Même image : rognée de moitié et affichée sur 8 cm, entière sur 4 cm
+    deck = deck_builder(tmp_path / 'deck.pptx', [(0, make_image(2000, 1000), (0.5, 0, 0, 0)),
+                                                 (1, make_image(2000, 1000), None)])
+    rewrite_part(deck, 'ppt/slides/slide2.xml', lambda data: data.replace(b'cx="2880000"', b'cx="1440000"')
+                 .replace(b'cy="1440000"', b'cy="720000"'))
+    with PackageIndex(deck) as index:
+        crop_plan = plan_crops(collect_crop_uses(index, ['ppt/media/image1.png']),
+                               {'ppt/media/image1.png': (2000, 1000)}, index.has_part)
+        plan = plan_downsampling(index, 150, crop_plan=crop_plan)
+
+    assert crop_plan.targets == {'ppt/media/image1_crop1.png': ('ppt/media/image1.png', (1000, 0, 2000, 1000))}
+    # L'original n'est plus dimensionné pour l'affichage rogné (facteur 0.472 auparavant)
+    assert plan['ppt/media/image1.png'] == pytest.approx(_pixels(150, Cm(4)) / 2000)
+    assert plan['ppt/media/image1_crop1.png'] == pytest.approx(_pixels(150, Cm(8)) / 1000)
+
+    output = update_pptx_with_cropped_images(deck, analyze_pptx(deck).cropped_images, target_dpi=150)
+    # Parties affichées par chaque diapositive (l'extension suit un éventuel passage en JPEG)
+    widths = {record.slide_index: record.width for record in analyze_pptx(output).used_images.values()}
+    assert widths == {1: round(_pixels(150, Cm(8))), 2: round(_pixels(150, Cm(4)))}
+
+
+def test_placeholder_picture_inherits_the_layout_size(tmp_path, make_image):
+    presentation = Presentation()
+    slide = presentation.slides.add_slide(presentation.slide_layouts[8])
+    placeholder = next(shape for shape in slide.placeholders if shape.placeholder_format.type == 18)
+    layout_placeholder = placeholder._base_placeholder
+    placeholder.insert_picture(io.BytesIO(make_image(3000, 2000)))
+    presentation.save(tmp_path / 'deck.pptx')
+
+    with PackageIndex(str(tmp_path / 'deck.pptx')) as index:
+        uses, unresolved = collect_picture_uses(index)
+        plan = plan_downsampling(index, 96)
+    (media_name, media_uses), = uses.items()
+    assert not unresolved
+    _, _, cx, cy, *_ = media_uses[0]
+    assert (cx, cy) == (layout_placeholder.width, layout_placeholder.height)
+    assert 0 < plan[media_name] < 1
+
+
+def test_fill_rect_reduces_the_displayed_area(tmp_path, make_image, deck_builder):
+    deck = deck_builder(tmp_path / 'deck.pptx', [(0, make_image(2000, 1000), None)])
+    with PackageIndex(deck) as index:
+        before = plan_downsampling(index, 150)['ppt/media/image1.png']
+    # L'image n'occupe que le quart central de la forme
+    rewrite_part(deck, 'ppt/slides/slide1.xml', lambda data: data.replace(
+        b'<a:fillRect/>', b'<a:fillRect l="25000" t="25000" r="25000" b="25000"/>'))
+    with PackageIndex(deck) as index:
+        (_, _, cx, cy, *_), = collect_picture_uses(index)[0]['ppt/media/image1.png']
+        after = plan_downsampling(index, 150)['ppt/media/image1.png']
+    assert (cx, cy) == (pytest.approx(Cm(8) / 2), pytest.approx(Cm(4) / 2))
+    assert after == pytest.approx(before / 2)
+
+
+def test_unresolved_uses_are_left_alone(tmp_path, make_image):
+    presentation = Presentation()
+    slide = presentation.slides.add_slide(presentation.slide_layouts[6])
+    group = slide.shapes.add_group_shape()
+    group.shapes.add_picture(io.BytesIO(make_image(2000, 1000)), Cm(1), Cm(1), Cm(2))
+    presentation.save(tmp_path / 'deck.pptx')
+
+    with PackageIndex(str(tmp_path / 'deck.pptx')) as index:
+        uses, unresolved = collect_picture_uses(index)
+        plan = plan_downsampling(index, 96)
+    assert unresolved == {'ppt/media/image1.png'}
+    assert plan == {}
+
+
+def test_images_below_the_target_resolution_are_unchanged(tmp_path, make_image, deck_builder):
+    image = make_image(200, 100)
+    deck = deck_builder(tmp_path / 'deck.pptx', [(0, image, None)])
+    with PackageIndex(deck) as index:
+        assert plan_downsampling(index, 150) == {}
+
+    output = update_pptx_with_cropped_images(deck, {}, target_dpi=150)
+    with zipfile.ZipFile(output) as archive:
+        assert archive.read('ppt/media/image1.png') == image
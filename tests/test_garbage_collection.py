@@ -0,0 +1,91 @@
+import io
+import zipfile
+
+from lxml import etree
+from pptx import Presentation
+from pptx.util import Cm
+
+from conftest import package_problems, rewrite_part
+from package_index import PackageIndex
+from slim_pptx import analyze_pptx, create_light_version, is_valid_pptx
+
+P_NS = 'http://schemas.openxmlformats.org/presentationml/2006/main'
+A_NS = 'http://schemas.openxmlformats.org/drawingml/2006/main'
+R_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+
+ORPHAN_PART = 'ppt/customXml/orphan.xml'
+ORPHAN_TYPE = 'application/vnd.openxmlformats-officedocument.customXmlProperties+xml'
+
+
+def _add_orphans(deck, image):
+    """Parties inatteignables : un média sans relation, et une partie XML (avec Override) et son média."""
+    rewrite_part(deck, 'ppt/media/orphan1.png', lambda _: image)
+    rewrite_part(deck, 'ppt/media/orphan2.png', lambda _: image + b'\0')
+    rewrite_part(deck, ORPHAN_PART, lambda _: b'<orphan/>')
+    rewrite_part(deck, 'ppt/customXml/_rels/orphan.xml.rels', lambda _: (
+        b'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        b'<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/image"'
+        b' Target="../media/orphan2.png"/></Relationships>'))
+    rewrite_part(deck, '[Content_Types].xml', lambda data: data.replace(
+        b'</Types>', f'<Override PartName="/{ORPHAN_PART}" ContentType="{ORPHAN_TYPE}"/></Types>'.encode()))
+
+
+def test_light_version_drops_unreachable_parts_and_stays_valid(tmp_path, make_image, deck_builder):
+    image = make_image(120, 80)
+    deck = deck_builder(tmp_path / 'deck.pptx', [(0, image, None), (1, make_image(60, 40, seed=1), None)])
+    _add_orphans(deck, image)
+    assert package_problems(deck) == []
+
+    report = analyze_pptx(deck)
+    light = create_light_version(deck, report.unused_images, deduplicate=False)
+    assert light is not None
+    assert package_problems(light) == []
+    assert is_valid_pptx(light, slide_count=2)
+    with zipfile.ZipFile(deck) as source, zipfile.ZipFile(light) as output:
+        removed = set(source.namelist()) - set(output.namelist())
+        content_types = output.read('[Content_Types].xml')
+    assert {'ppt/media/orphan1.png', 'ppt/media/orphan2.png', ORPHAN_PART,
+            'ppt/customXml/_rels/orphan.xml.rels'} <= removed
+    assert not any(name.startswith(('ppt/slides/', 'ppt/slideLayouts/', 'ppt/slideMasters/')) for name in removed)
+    assert ORPHAN_PART.encode() not in content_types
+    # Les images des diapositives restent en place
+    assert len(analyze_pptx(light).used_images) == 2
+
+
+def _deck_with_indirect_images(path, make_image):
+    """Images hors des p:pic de premier niveau : dans un groupe, en arrière-plan, dans les notes."""
+    presentation = Presentation()
+    slide = presentation.slides.add_slide(presentation.slide_layouts[6])
+    group = slide.shapes.add_group_shape()
+    group.shapes.add_picture(io.BytesIO(make_image(60, 40)), Cm(1), Cm(1), Cm(3))
+    _, rId = slide.part.get_or_add_image_part(io.BytesIO(make_image(80, 60, seed=1)))
+    slide._element.cSld.get_or_add_bg().append(etree.fromstring(
+        f'<p:bgPr xmlns:p="{P_NS}" xmlns:a="{A_NS}" xmlns:r="{R_NS}"><a:blipFill><a:blip r:embed="{rId}"/>'
+        f'<a:stretch><a:fillRect/></a:stretch></a:blipFill><a:effectLst/></p:bgPr>'))
+    slide.notes_slide.part.get_or_add_image_part(io.BytesIO(make_image(40, 30, seed=2)))
+    presentation.save(path)
+    return str(path)
+
+
+def test_images_outside_slide_pictures_are_kept(tmp_path, make_image):
+    deck = _deck_with_indirect_images(tmp_path / 'deck.pptx', make_image)
+    rewrite_part(deck, 'ppt/media/orphan1.png', lambda _: make_image(20, 20, seed=3))
+    assert package_problems(deck) == []
+    with zipfile.ZipFile(deck) as archive:
+        media = {name for name in archive.namelist() if name.startswith('ppt/media/')}
+    assert len(media) == 4
+
+    with PackageIndex(deck) as index:
+        referrers = index.graph.media_referrers()
+        reachable = index.graph.reachable()
+    assert {source for name in media - {'ppt/media/orphan1.png'} for source, _ in referrers[name]} == {
+        'ppt/slides/slide1.xml', 'ppt/notesSlides/notesSlide1.xml'}
+    assert media & reachable == media - {'ppt/media/orphan1.png'}
+
+    report = analyze_pptx(deck)
+    assert list(report.unused_images) == ['ppt/media/orphan1.png']
+    light = create_light_version(deck, report.unused_images, deduplicate=False)
+    assert package_problems(light) == []
+    with zipfile.ZipFile(light) as archive:
+        kept = {name for name in archive.namelist() if name.startswith('ppt/media/')}
+    assert kept == media - {'ppt/media/orphan1.png'}
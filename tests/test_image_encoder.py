@@ -0,0 +1,35 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+from image_encoder import HIGH_DEPTH_MODES, encode_image
+
+
+def _png(image):
+    output = io.BytesIO()
+    image.save(output, 'PNG')
+    return output.getvalue()
+
+
+def test_high_depth_png_is_kept_lossless():
+    # Quelques niveaux de gris 16 bits : une palette 8 bits les confondrait
+    levels = np.array([0, 1000, 1001, 40000, 65535], dtype=np.uint16)
+    pixels = np.tile(np.repeat(levels, 20), (60, 1))
+    original = _png(Image.frombytes('I;16', (100, 60), pixels.astype('<u2').tobytes()))
+    image = Image.open(io.BytesIO(original))
+    assert image.mode in HIGH_DEPTH_MODES
+    result = encode_image(image, 'PNG', original)
+    assert result.format == 'PNG'
+    decoded = Image.open(io.BytesIO(result.data))
+    assert np.array_equal(np.asarray(decoded, dtype=np.int64), pixels)
+
+
+def test_flat_png_uses_exact_palette():
+    pixels = np.zeros((60, 100, 3), dtype=np.uint8)
+    pixels[:, 50:] = (200, 30, 30)
+    original = _png(Image.fromarray(pixels))
+    result = encode_image(Image.open(io.BytesIO(original)), 'PNG', original)
+    assert result.method in ('PNG palette', 'PNG optimisé')
+    decoded = Image.open(io.BytesIO(result.data)).convert('RGB')
+    assert np.array_equal(np.asarray(decoded), pixels)
@@ -0,0 +1,167 @@
+import io
+import zipfile
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import image_ops
+
+from analysis_model import ImageRecord
+from image_ops import FAILED_METHOD, transform_image, _crop_decoded_rows
+
+
+def _jpeg(make_image):
+    return make_image(600, 800, 'JPEG', quality=90)
+
+
+def test_partial_decode_matches_full_decode(make_image):
+    blob = _jpeg(make_image)
+    box = (60, 40, 500, 300)
+    partial = _crop_decoded_rows(Image.open(io.BytesIO(blob)), box)
+    full = Image.open(io.BytesIO(blob)).crop(box)
+    assert partial.size == full.size
+    assert np.array_equal(np.asarray(partial), np.asarray(full))
+
+
+def test_truncated_jpeg_keeps_original(make_image):
+    blob = _jpeg(make_image)[:20000]
+    record = ImageRecord('ppt/media/image1.jpeg', cropped=True)
+    result = transform_image(blob, record, box=(0, 0, 600, 700))
+    assert result.method == FAILED_METHOD
+    assert result.data == blob
+
+
+def test_truncation_below_visible_rows_is_decoded(make_image):
+    blob = _jpeg(make_image)
+    truncated = blob[:len(blob) * 3 // 4]
+    box = (0, 0, 600, 100)
+    partial = _crop_decoded_rows(Image.open(io.BytesIO(truncated)), box)
+    full = Image.open(io.BytesIO(blob)).crop(box)
+    assert np.array_equal(np.asarray(partial), np.asarray(full))
+
+
+def _corrupt(blob, marker):
+    """JPEG dont les données de l'image contiennent un marqueur parasite en leur milieu."""
+    middle = (blob.index(b'\xff\xda') + len(blob)) // 2
+    return blob[:middle] + marker + blob[middle:]
+
+
+@pytest.mark.parametrize('marker', [b'\xff\xc0\x00\x11', b'\xff\xc4\x00\x03\x00'])
+def test_corrupt_jpeg_fails_like_a_full_decode(make_image, marker):
+    blob = _corrupt(_jpeg(make_image), marker)
+    with pytest.raises(OSError):
+        Image.open(io.BytesIO(blob)).load()
+    for bottom in (100, 500):
+        with pytest.raises(OSError):
+            _crop_decoded_rows(Image.open(io.BytesIO(blob)), (0, 0, 600, bottom))
+    record = ImageRecord('ppt/media/image1.jpeg', cropped=True)
+    result = transform_image(blob, record, box=(0, 0, 600, 500))
+    assert result.method == FAILED_METHOD
+    assert result.data == blob
+
+
+@pytest.mark.parametrize('subsampling', [0, 2])
+@pytest.mark.parametrize('draft', [None, (150, 200)])
+def test_partial_decode_matches_full_decode_at_every_scale(make_image, subsampling, draft):
+    blob = make_image(600, 803, 'JPEG', quality=90, subsampling=subsampling)
+    for bottom in (1, 9, 17, 101):
+        partial, full = Image.open(io.BytesIO(blob)), Image.open(io.BytesIO(blob))
+        if draft:
+            partial.draft('RGB', draft)
+            full.draft('RGB', draft)
+        box = (3, 0, partial.size[0] - 1, bottom)
+        assert np.array_equal(np.asarray(_crop_decoded_rows(partial, box)), np.asarray(full.crop(box)))
+
+
+def test_missing_pillow_internals_fall_back_to_a_full_decode(make_image, monkeypatch):
+    blob = _jpeg(make_image)
+    box = (60, 40, 500, 300)
+    expected = np.asarray(Image.open(io.BytesIO(blob)).crop(box))
+
+    # API interne absente pour le décodage limité (premier appel), présente pour le décodage complet
+    get_decoder = Image._getdecoder
+    calls = []
+
+    def changed(*args):
+        calls.append(args)
+        if len(calls) == 1:
+            raise AttributeError('_getdecoder')
+        return get_decoder(*args)
+    monkeypatch.setattr(Image, '_getdecoder', changed)
+    assert np.array_equal(np.asarray(_crop_decoded_rows(Image.open(io.BytesIO(blob)), box)), expected)
+    assert len(calls) == 2
+
+    monkeypatch.undo()
+    monkeypatch.setattr(image_ops, 'PILLOW_INTERNALS', False)
+    assert np.array_equal(np.asarray(_crop_decoded_rows(Image.open(io.BytesIO(blob)), box)), expected)
+
+
+def _ssim(first, second):
+    """SSIM moyen de deux images en niveaux de gris, sur des fenêtres de 8 x 8 pixels."""
+    first, second = (np.asarray(image.convert('L'), dtype=np.float64) for image in (first, second))
+    height, width = (size - size % 8 for size in first.shape)
+    windows = [image[:height, :width].reshape(height // 8, 8, width // 8, 8).swapaxes(1, 2).reshape(-1, 64)
+               for image in (first, second)]
+    mean_x, mean_y = (window.mean(axis=1) for window in windows)
+    var_x, var_y = (window.var(axis=1) for window in windows)
+    covariance = ((windows[0] - mean_x[:, None]) * (windows[1] - mean_y[:, None])).mean(axis=1)
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    return float(np.mean((2 * mean_x * mean_y + c1) * (2 * covariance + c2)
+                         / ((mean_x ** 2 + mean_y ** 2 + c1) * (var_x + var_y + c2))))
+
+
+def _photo(make_image, size=(2400, 1600)):
+    """Grand JPEG aux variations douces, comme une photographie (le bruit par blocs de 10 pixels
+    de make_image n'a plus de sens à l'échelle 1/8)."""
+    output = io.BytesIO()
+    small = Image.open(io.BytesIO(make_image(size[0] // 10, size[1] // 10)))
+    small.resize(size, Image.Resampling.BICUBIC).save(output, 'JPEG', quality=90)
+    return output.getvalue()
+
+
+@pytest.mark.parametrize('scale', [0.5, 0.2, 0.1])
+def test_draft_decode_gives_the_target_size_and_matches_a_full_decode(make_image, scale):
+    blob = _photo(make_image)
+    box = (312, 205, 2212, 1405)
+    record = ImageRecord('ppt/media/image1.jpeg', cropped=True)
+    result = transform_image(blob, record, scale=scale, box=box)
+    assert result.method != FAILED_METHOD
+
+    new_size = (round((box[2] - box[0]) * scale), round((box[3] - box[1]) * scale))
+    reduced = Image.open(io.BytesIO(result.data))
+    reference = Image.open(io.BytesIO(blob)).crop(box).resize(new_size, Image.Resampling.LANCZOS)
+    assert reduced.size == new_size
+    assert _ssim(reduced, reference) > 0.9
+
+
+def test_draft_decode_rescales_the_box_origin(make_image):
+    blob = _photo(make_image)
+    image = Image.open(io.BytesIO(blob))
+    box = image_ops._draft_decode(image, (400, 240, 2000, 1440), (400, 300))
+    # Échelle 1/4 : la boîte suit l'image décodée, origine comprise
+    assert image.size == (600, 400)
+    assert box == (100, 60, 500, 360)
+    decoded = image.crop(box)
+    reference = Image.open(io.BytesIO(blob)).crop((400, 240, 2000, 1440)).resize(decoded.size, Image.Resampling.BOX)
+    assert _ssim(decoded, reference) > 0.9
+    # Une origine non ramenée à l'échelle désignerait une autre zone
+    assert _ssim(image.crop((400, 240, 800, 540)).resize(decoded.size), reference) < 0.5
+
+
+def test_parallel_cropping_matches_serial_order_and_output(tmp_path, make_image):
+    deck = tmp_path / 'images.pptx'
+    jobs = []
+    with zipfile.ZipFile(deck, 'w') as archive:
+        for number in range(5):
+            part_name = f'ppt/media/image{number + 1}.png'
+            archive.writestr(part_name, make_image(120 + number * 10, 90, seed=number))
+            jobs.append((part_name, ImageRecord(part_name, cropped=True), 0.5 if number % 2 else None,
+                         (number, 0, 100, 80)))
+
+    serial = list(image_ops.crop_images_parallel(str(deck), jobs, workers=1))
+    parallel = list(image_ops.crop_images_parallel(str(deck), jobs, workers=3, max_pending=2))
+    assert [name for name, _ in parallel] == [name for name, _, _, _ in jobs]
+    assert [(result.data, result.method) for _, result in parallel] == [(result.data, result.method)
+                                                                         for _, result in serial]
+    assert all(result.method != FAILED_METHOD for _, result in parallel)
@@ -0,0 +1,96 @@
+import io
+import struct
+
+import pytest
+from PIL import Image
+
+from image_probe import probe_image, read_image_metadata
+
+
+def _encode(format, size=(37, 21), mode='RGB', **params):
+    output = io.BytesIO()
+    Image.new(mode, size, 'teal').save(output, format, **params)
+    return output.getvalue()
+
+
+def _pil_metadata(data):
+    """Dimensions, format et résolution tels que PIL les lit (comme le repli de read_image_metadata)."""
+    with Image.open(io.BytesIO(data)) as image:
+        dpi = image.info.get('dpi', (0, 0))
+        if not isinstance(dpi, tuple):
+            dpi = (dpi, dpi)
+        return image.width, image.height, image.format, float(dpi[0])
+
+
+def _exif(x_resolution, unit):
+    """Bloc EXIF (IFD0 avec XResolution et ResolutionUnit), sans densité JFIF."""
+    exif = Image.Exif()
+    exif[0x011A] = x_resolution
+    exif[0x0128] = unit
+    return exif.tobytes()
+
+
+def _jpeg_without_jfif(**params):
+    """JPEG dont le segment APP0 JFIF est retiré (seul l'EXIF éventuel porte la résolution)."""
+    data = _encode('JPEG', **params)
+    assert data[2:4] == b'\xff\xe0'
+    length = struct.unpack('>H', data[4:6])[0]
+    return data[:2] + data[4 + length:]
+
+
+def _emf(bounds=(0, 0, 399, 299), frame=(0, 0, 10583, 7937)):
+    header = struct.pack('<II4i4i4sIIIHH', 1, 88, *bounds, *frame, b' EMF', 0x10000, 88, 1, 1, 0)
+    return header + bytes(88 - len(header))
+
+
+CASES = {
+    'png sans pHYs': lambda: _encode('PNG'),
+    'png avec pHYs': lambda: _encode('PNG', dpi=(300, 300)),
+    'png 16 bits': lambda: _encode('PNG', mode='I;16', dpi=(96, 96)),
+    'jpeg sans densité': lambda: _encode('JPEG'),
+    'jpeg densité JFIF': lambda: _encode('JPEG', dpi=(220, 220)),
+    'jpeg progressif': lambda: _encode('JPEG', dpi=(150, 150), progressive=True),
+    'jpeg EXIF seul': lambda: _jpeg_without_jfif(exif=_exif(180, 2)),
+    'jpeg EXIF en centimètres': lambda: _jpeg_without_jfif(exif=_exif(100, 3)),
+    'jpeg EXIF sans résolution': lambda: _jpeg_without_jfif(exif=Image.Exif().tobytes()),
+    'jpeg sans JFIF ni EXIF': lambda: _jpeg_without_jfif(),
+    'bmp': lambda: _encode('BMP', dpi=(96, 96)),
+    'gif': lambda: _encode('GIF'),
+    'emf': _emf,
+}
+
+
+@pytest.mark.parametrize('case', sorted(CASES))
+def test_probe_matches_pil(case):
+    data = CASES[case]()
+    metadata = probe_image(io.BytesIO(data))
+    assert metadata is not None
+    width, height, format, dpi = _pil_metadata(data)
+    assert (metadata.width, metadata.height, metadata.format) == (width, height, format)
+    assert metadata.dpi == pytest.approx(dpi, abs=1e-6)
+
+
+@pytest.mark.parametrize('data', [
+    b'',
+    b'garbage bytes that are not an image',
+    b'\x89PNG\r\n\x1a\n\x00\x00\x00\x0dIHDR\x00\x00',
+    b'\xff\xd8\xff\xe0\x00\x10JFIF',
+    b'\xff\xd8\x00\x00',
+    b'GIF89a\x01',
+    b'BM' + bytes(12) + struct.pack('<I', 7),
+])
+def test_unusable_headers_return_none(data):
+    assert probe_image(io.BytesIO(data)) is None
+
+
+def test_truncated_real_headers_return_none():
+    for data in (_encode('PNG', dpi=(300, 300)), _encode('JPEG', dpi=(220, 220)), _encode('BMP')):
+        for length in (3, 12, 20):
+            assert probe_image(io.BytesIO(data[:length])) is None
+
+
+def test_unknown_formats_fall_back_to_pil():
+    data = _encode('TIFF', dpi=(120, 120))
+    assert probe_image(io.BytesIO(data)) is None
+    metadata = read_image_metadata(lambda: io.BytesIO(data))
+    assert (metadata.width, metadata.height, metadata.format, metadata.dpi) == _pil_metadata(data)
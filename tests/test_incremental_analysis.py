@@ -0,0 +1,30 @@
+import zipfile
+
+from analysis_cache import AnalysisCache
+from conftest import rewrite_part
+from slim_pptx import analyze_pptx
+
+
+def test_only_changed_parts_are_parsed_again(tmp_path, make_image, deck_builder, monkeypatch):
+    deck = deck_builder(tmp_path / 'deck.pptx', [(0, make_image(100, 50), (0.2, 0, 0, 0)),
+                                                 (1, make_image(80, 40, seed=1), None)])
+    parsed = []
+    put_part = AnalysisCache.put_part
+
+    def recording(self, kind, crc, size, digest, value):
+        parsed.append((kind, crc))
+        put_part(self, kind, crc, size, digest, value)
+    monkeypatch.setattr(AnalysisCache, 'put_part', recording)
+
+    with AnalysisCache(str(tmp_path / 'cache.sqlite3')) as cache:
+        analyze_pptx(deck, cache)
+        assert len(parsed) > 2
+        parsed.clear()
+
+        rewrite_part(deck, 'ppt/slides/slide2.xml', lambda data: data.replace(b'<p:cSld>', b'<p:cSld name="x">'))
+        incremental = analyze_pptx(deck, cache)
+
+    with zipfile.ZipFile(deck) as archive:
+        changed_crc = archive.getinfo('ppt/slides/slide2.xml').CRC
+    assert parsed and all(crc == changed_crc for _, crc in parsed)
+    assert incremental.to_msgpack() == analyze_pptx(deck).to_msgpack()
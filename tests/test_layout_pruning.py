@@ -0,0 +1,52 @@
+import io
+import re
+import zipfile
+
+from pptx import Presentation
+from pptx.util import Cm
+
+from conftest import package_problems
+from slim_pptx import analyze_pptx, create_light_version, is_valid_pptx
+
+
+def _deck_with_layout_image(path, image):
+    """Deux diapositives sur les layouts 0 et 6, une image référencée par le layout 5 inutilisé."""
+    presentation = Presentation()
+    for layout in (0, 6):
+        presentation.slides.add_slide(presentation.slide_layouts[layout])
+    presentation.slides[1].shapes.add_picture(io.BytesIO(image), Cm(1), Cm(1), Cm(4))
+    presentation.slide_layouts[5].part.get_or_add_image_part(io.BytesIO(image[:-1] + b'\0'))
+    presentation.save(path)
+    return str(path)
+
+
+def test_pruned_light_version_keeps_used_layouts_and_stays_valid(tmp_path, make_image):
+    deck = _deck_with_layout_image(tmp_path / 'deck.pptx', make_image(80, 60))
+    with zipfile.ZipFile(deck) as source:
+        layout_count = len([name for name in source.namelist() if re.fullmatch(r'ppt/slideLayouts/\w+\.xml', name)])
+        media_count = len([name for name in source.namelist() if name.startswith('ppt/media/')])
+    assert layout_count == 11 and media_count == 2
+
+    report = analyze_pptx(deck)
+    light = create_light_version(deck, report.unused_images, prune_layouts=True, deduplicate=False)
+    assert light is not None
+    assert package_problems(light) == []
+    assert is_valid_pptx(light, slide_count=2)
+
+    presentation = Presentation(light)
+    assert len(presentation.slide_layouts) == 2
+    assert [slide.slide_layout.name for slide in presentation.slides] == ['Title Slide', 'Blank']
+    with zipfile.ZipFile(light) as output:
+        names = output.namelist()
+        master = output.read('ppt/slideMasters/slideMaster1.xml')
+    assert len([name for name in names if re.fullmatch(r'ppt/slideLayouts/\w+\.xml', name)]) == 2
+    # L'image du layout élagué disparaît avec lui, celle de la diapositive reste
+    assert len([name for name in names if name.startswith('ppt/media/')]) == 1
+    assert len(re.findall(rb'<p:sldLayoutId\b', master)) == 2
+
+
+def test_light_version_without_pruning_keeps_every_layout(tmp_path, make_image):
+    deck = _deck_with_layout_image(tmp_path / 'deck.pptx', make_image(80, 60))
+    light = create_light_version(deck, {}, deduplicate=False)
+    assert package_problems(light) == []
+    assert len(Presentation(light).slide_layouts) == 11
@@ -0,0 +1,41 @@
+import zipfile
+
+from conftest import rewrite_part
+from media_cache import MediaMetadata, MediaMetadataCache
+from slim_pptx import analyze_pptx
+
+
+def test_entries_persist_and_are_keyed_by_crc_and_size(tmp_path):
+    path = str(tmp_path / 'media.sqlite3')
+    with MediaMetadataCache(path) as cache:
+        cache.put(0x1234, 100, MediaMetadata(40, 30, 'PNG', 96.0))
+    with MediaMetadataCache(path) as cache:
+        metadata = cache.get(0x1234, 100)
+        assert (metadata.width, metadata.height, metadata.format, metadata.dpi) == (40, 30, 'PNG', 96.0)
+        assert cache.get(0x1234, 101) is None
+        assert cache.get(0x1235, 100) is None
+        assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_memory_entries_are_bounded():
+    cache = MediaMetadataCache(max_entries=2)
+    for crc in range(3):
+        cache.put(crc, 10, MediaMetadata(crc, crc))
+    assert cache.get(0, 10) is None
+    assert cache.get(2, 10).width == 2
+
+
+def test_changed_image_is_probed_again(tmp_path, make_image, deck_builder):
+    deck = deck_builder(tmp_path / 'deck.pptx', [(0, make_image(100, 50), None)])
+    cache = MediaMetadataCache()
+    analyze_pptx(deck, media_cache=cache)
+    assert (cache.hits, cache.misses) == (0, 1)
+    analyze_pptx(deck, media_cache=cache)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    with zipfile.ZipFile(deck) as archive:
+        [media_name] = [name for name in archive.namelist() if name.startswith('ppt/media/')]
+    rewrite_part(deck, media_name, lambda _: make_image(64, 48, seed=7))
+    [record] = analyze_pptx(deck, media_cache=cache).used_images.values()
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert (record.width, record.height) == (64, 48)
@@ -0,0 +1,49 @@
+import zipfile
+
+from conftest import package_problems, rewrite_part
+from media_dedup import deduplicate_media
+from package_index import PackageIndex
+from package_writer import PackageRewriter
+from slim_pptx import create_light_version
+
+LAYOUT_RELS = 'ppt/slideLayouts/_rels/slideLayout1.xml.rels'
+
+
+def _deck_with_duplicates(tmp_path, make_image, deck_builder):
+    """image1.png utilisée par la diapositive 1 ; copie image9.png utilisée par la diapositive 2 et un layout."""
+    image = make_image(90, 60)
+    deck = deck_builder(tmp_path / 'deck.pptx', [(0, image, None), (1, image, None), (1, make_image(90, 60, seed=3), None)])
+    with zipfile.ZipFile(deck) as archive:
+        original = archive.read('ppt/media/image1.png')
+    rewrite_part(deck, 'ppt/media/image9.png', lambda _: original)
+    rewrite_part(deck, 'ppt/slides/_rels/slide2.xml.rels',
+                 lambda data: data.replace(b'../media/image1.png', b'../media/image9.png'))
+    rewrite_part(deck, LAYOUT_RELS, lambda data: data.replace(b'</Relationships>', (
+        b'<Relationship Id="rId99" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/image"'
+        b' Target="../media/image9.png"/></Relationships>')))
+    assert package_problems(deck) == []
+    return deck
+
+
+def test_duplicates_are_retargeted_to_one_copy(tmp_path, make_image, deck_builder):
+    deck = _deck_with_duplicates(tmp_path, make_image, deck_builder)
+    with PackageRewriter(deck) as rewriter, PackageIndex(deck) as index:
+        report = deduplicate_media(index, rewriter)
+        assert report.groups == {'ppt/media/image1.png': ['ppt/media/image9.png']}
+        assert report.relationships_retargeted == 2
+        assert not index.graph.referrers.get('ppt/media/image9.png')
+        assert b'../media/image9.png' not in rewriter.read('ppt/slides/_rels/slide2.xml.rels')
+        assert b'Id="rId99"' in rewriter.read(LAYOUT_RELS)
+
+
+def test_light_version_keeps_a_single_copy(tmp_path, make_image, deck_builder):
+    deck = _deck_with_duplicates(tmp_path, make_image, deck_builder)
+    light = create_light_version(deck, {})
+    assert package_problems(light) == []
+    with zipfile.ZipFile(light) as archive:
+        media = sorted(name for name in archive.namelist() if name.startswith('ppt/media/'))
+        slide_rels = archive.read('ppt/slides/_rels/slide2.xml.rels')
+        layout_rels = archive.read(LAYOUT_RELS)
+    assert media == ['ppt/media/image1.png', 'ppt/media/image2.png']
+    assert b'../media/image1.png' in slide_rels and b'../media/image2.png' in slide_rels
+    assert b'../media/image1.png' in layout_rels
@@ -0,0 +1,97 @@
+import io
+import zipfile
+import zlib
+
+from pptx import Presentation
+from pptx.util import Cm
+
+import package_index
+from conftest import rewrite_part
+from package_index import PackageIndex
+from slim_pptx import analyze_pptx
+
+
+def _deck(path, make_image):
+    """Trois diapositives (layouts 0, 6, 6), la deuxième masquée, une image sur le layout 5 et une sur la diapositive 3."""
+    presentation = Presentation()
+    for layout in (0, 6, 6):
+        presentation.slides.add_slide(presentation.slide_layouts[layout])
+    presentation.slides[1]._element.set('show', '0')
+    presentation.slides[2].shapes.add_picture(io.BytesIO(make_image(80, 60)), Cm(1), Cm(1), Cm(4))
+    presentation.slide_layouts[5].part.get_or_add_image_part(io.BytesIO(make_image(40, 30, seed=1)))
+    presentation.save(path)
+    return str(path)
+
+
+def test_index_lookups(tmp_path, make_image):
+    deck = _deck(tmp_path / 'deck.pptx', make_image)
+    with PackageIndex(deck) as index:
+        assert index.slide_layouts == {'1': '1', '2': '7', '3': '7'}
+        assert index.layout_for_slide(3) == '7'
+        assert [index.is_slide_hidden(number) for number in (1, 2, 3, 4)] == [False, True, False, False]
+        [layout_image] = index.media_for_layout(6)
+        assert index.media_by_name(layout_image).filename == f'ppt/media/{layout_image}'
+        [(rId, target)] = [(rId, rel['target']) for rId, rel in index.rels['ppt/slides/slide3.xml'].items()
+                           if rel['target'] in index.media]
+        assert index.media_for_rel('ppt/slides/slide3.xml', rId) == target
+        assert index.media_for_rel('ppt/slides/slide3.xml', 'rId99') is None
+        assert target in index.media_names_for_crc(index.infos[target].CRC)
+
+
+def test_analysis_opens_the_archive_once(tmp_path, make_image, monkeypatch):
+    deck = _deck(tmp_path / 'deck.pptx', make_image)
+    opened = []
+
+    class CountingZipFile(zipfile.ZipFile):
+        def __init__(self, file, *args, **kwargs):
+            opened.append(file)
+            super().__init__(file, *args, **kwargs)
+    monkeypatch.setattr(package_index.zipfile, 'ZipFile', CountingZipFile)
+
+    report = analyze_pptx(deck)
+    assert opened == [deck]
+    assert len(report.used_images) == 1
+    assert report.used_layout_ids == {'1', '7'}
+
+
+def _crc_collision(data):
+    """Variante de data, de même longueur et de même CRC32 (le CRC est affine sur GF(2))."""
+    base = zlib.crc32(bytes(len(data)))
+    # Image de chacun des 40 derniers bits isolés, puis combinaison nulle par élimination de Gauss
+    rows = []
+    for bit in range(40):
+        delta = bytearray(len(data))
+        delta[-1 - bit // 8] = 1 << bit % 8
+        rows.append((zlib.crc32(bytes(delta)) ^ base, 1 << bit))
+    pivots = {}
+    for image, combination in rows:
+        for position in range(31, -1, -1):
+            if not image >> position & 1:
+                continue
+            if position not in pivots:
+                pivots[position] = (image, combination)
+                break
+            image ^= pivots[position][0]
+            combination ^= pivots[position][1]
+        if image == 0:
+            flips = combination.to_bytes(5, 'little')
+            collided = bytearray(data)
+            for offset, value in enumerate(flips):
+                collided[-1 - offset] ^= value
+            return bytes(collided)
+    raise AssertionError("aucune collision trouvée")
+
+
+def test_media_for_blob_settles_crc_collisions_by_content(tmp_path, make_image, deck_builder):
+    image = make_image(60, 40)
+    twin = _crc_collision(image)
+    assert twin != image and (zlib.crc32(twin), len(twin)) == (zlib.crc32(image), len(image))
+    deck = deck_builder(tmp_path / 'deck.pptx', [(0, image, None)])
+    rewrite_part(deck, 'ppt/media/jumelle.png', lambda _: twin)
+
+    with PackageIndex(deck) as index:
+        assert sorted(index.media_by_key[zlib.crc32(image), len(image)]) == ['ppt/media/image1.png',
+                                                                            'ppt/media/jumelle.png']
+        assert index.media_for_blob(image) == 'ppt/media/image1.png'
+        assert index.media_for_blob(twin) == 'ppt/media/jumelle.png'
+        assert index.media_for_blob(image + b'\0') is None
@@ -0,0 +1,145 @@
+import io
+import os
+import shutil
+import sys
+import tempfile
+import zipfile
+
+import pytest
+
+import package_writer
+from conftest import package_problems, rewrite_part
+from package_index import PackageIndex
+from package_writer import FLAG_DATA_DESCRIPTOR, CompressionPolicy, PackageRewriter
+from slim_pptx import _free_part_name, analyze_pptx, create_light_version, update_pptx_with_cropped_images
+
+MEMBERS = {
+    '[Content_Types].xml': b'<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types"/>',
+    'ppt/slides/slide1.xml': b'<sld>' + b'texte ' * 2000 + b'</sld>',
+    'ppt/media/diapositive été.png': bytes(range(256)) * 40,
+    'ppt/media/image2.jpeg': b'\xff\xd8' + bytes(5000) + b'\xff\xd9',
+    'ppt/notes/stocké.xml': b'<notes>' + b'a' * 3000 + b'</notes>',
+}
+
+
+class _Unseekable(io.RawIOBase):
+    """Flux sans retour arrière : zipfile y écrit chaque membre avec un descripteur de données."""
+
+    def __init__(self, target):
+        self.target = target
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self.target.write(data)
+
+
+def _source_archive(path):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(_Unseekable(buffer), 'w') as archive:
+        for number, (name, data) in enumerate(MEMBERS.items()):
+            info = zipfile.ZipInfo(name, date_time=(2024, 1, 2, 3, 4, 6))
+            info.compress_type = zipfile.ZIP_STORED if name.endswith('stocké.xml') else zipfile.ZIP_DEFLATED
+            with archive.open(info, 'w', force_zip64=number % 2 == 0) as member:
+                member.write(data)
+    path.write_bytes(buffer.getvalue())
+    with zipfile.ZipFile(path) as archive:
+        assert all(info.flag_bits & FLAG_DATA_DESCRIPTOR for info in archive.infolist())
+    return str(path)
+
+
+@pytest.mark.parametrize('internals', [True, False])
+def test_rewrite_round_trip(tmp_path, monkeypatch, internals):
+    if internals and not package_writer.ZIPFILE_INTERNALS:
+        pytest.skip("version de Python sans copie brute")
+    monkeypatch.setattr(package_writer, 'ZIPFILE_INTERNALS', internals)
+    source = _source_archive(tmp_path / 'source.pptx')
+    output = tmp_path / 'output.pptx'
+    with PackageRewriter(source) as rewriter:
+        rewriter.delete('ppt/media/image2.jpeg')
+        rewriter.replace('ppt/slides/slide1.xml', b'<sld/>')
+        rewriter.replace('ppt/media/nouvelle é.png', b'png' * 100)
+        rewriter.write(str(output))
+        report = rewriter.report.entries
+
+    expected = dict(MEMBERS)
+    del expected['ppt/media/image2.jpeg']
+    expected['ppt/slides/slide1.xml'] = b'<sld/>'
+    expected['ppt/media/nouvelle é.png'] = b'png' * 100
+    with zipfile.ZipFile(output) as archive:
+        assert archive.testzip() is None
+        assert {info.filename: archive.read(info) for info in archive.infolist()} == expected
+        infos = {info.filename: info for info in archive.infolist()}
+        assert infos['ppt/media/diapositive été.png'].date_time == (2024, 1, 2, 3, 4, 6)
+        # Le XML stocké dans la source est dégonflé selon la politique
+        assert infos['ppt/notes/stocké.xml'].compress_type == zipfile.ZIP_DEFLATED
+    assert ('copie brute' in report) == internals
+
+
+def test_added_parts_are_taken(tmp_path):
+    source = _source_archive(tmp_path / 'source.pptx')
+    with PackageRewriter(source) as rewriter, PackageIndex(source) as index:
+        assert rewriter.has_part('ppt/media/image2.jpeg')
+        assert not rewriter.has_part('ppt/media/image3.jpeg')
+        rewriter.replace('ppt/media/image3.jpeg', b'jpeg')
+        assert rewriter.has_part('ppt/media/image3.jpeg')
+        # Deux conversions vers le même nom ne s'écrasent pas
+        assert _free_part_name(index, rewriter, 'ppt/media/image3.jpeg') == 'ppt/media/image3_1.jpeg'
+        rewriter.replace('ppt/media/image3_1.jpeg', b'jpeg')
+        assert _free_part_name(index, rewriter, 'ppt/media/image3.jpeg') == 'ppt/media/image3_2.jpeg'
+
+
+def test_compression_policy_stores_media_and_deflates_xml():
+    policy = CompressionPolicy(deflate_level=9)
+    assert policy.choose('ppt/media/image1.JPG') == (zipfile.ZIP_STORED, None)
+    assert policy.choose('ppt/media/clip.mp4') == (zipfile.ZIP_STORED, None)
+    # Extension inconnue : le type de contenu décide
+    assert policy.choose('ppt/media/image1.bin', 'image/png') == (zipfile.ZIP_STORED, None)
+    assert policy.choose('ppt/media/image1.emf', 'image/x-emf') == (zipfile.ZIP_DEFLATED, 9)
+    assert policy.choose('ppt/slides/slide1.xml') == (zipfile.ZIP_DEFLATED, 9)
+    assert policy.choose('ppt/slides/_rels/slide1.xml.rels') == (zipfile.ZIP_DEFLATED, 9)
+    assert CompressionPolicy(stored_extensions=['.xml']).choose('ppt/slides/slide1.xml') == (zipfile.ZIP_STORED, None)
+
+
+def test_written_members_follow_the_policy(tmp_path):
+    source = _source_archive(tmp_path / 'source.pptx')
+    output = tmp_path / 'output.pptx'
+    with PackageRewriter(source, CompressionPolicy(deflate_level=1)) as rewriter:
+        rewriter.replace('ppt/media/image2.jpeg', b'\xff\xd8' + bytes(3000) + b'\xff\xd9')
+        rewriter.replace('ppt/media/nouvelle.png', bytes(3000))
+        rewriter.replace('ppt/slides/slide1.xml', b'<sld>' + b'modifi\xc3\xa9 ' * 500 + b'</sld>')
+        rewriter.write(str(output))
+        report = rewriter.report.entries
+
+    with zipfile.ZipFile(output) as archive:
+        infos = {info.filename: info for info in archive.infolist()}
+    assert infos['ppt/media/image2.jpeg'].compress_type == zipfile.ZIP_STORED
+    assert infos['ppt/media/nouvelle.png'].compress_type == zipfile.ZIP_STORED
+    assert infos['ppt/slides/slide1.xml'].compress_type == zipfile.ZIP_DEFLATED
+    assert report['stockage']['files'] == 2 and report['deflate-1']['files'] >= 1
+    # Membres inchangés déjà dégonflés : copiés sans recompression là où zipfile le permet
+    assert ('copie brute' in report) == package_writer.ZIPFILE_INTERNALS
+    if (3, 8) <= sys.version_info[:2] <= (3, 13):
+        assert package_writer.ZIPFILE_INTERNALS and report['copie brute']['files'] >= 1
+
+
+def test_outputs_are_written_without_a_temporary_directory(tmp_path, make_image, deck_builder, monkeypatch):
+    deck = deck_builder(tmp_path / 'deck.pptx', [(0, make_image(200, 100), (0.25, 0, 0, 0)),
+                                                 (1, make_image(80, 40, seed=1), None)])
+    rewrite_part(deck, 'ppt/media/orpheline.png', lambda _: make_image(30, 20, seed=2))
+    report = analyze_pptx(deck)
+
+    def forbidden(*args, **kwargs):
+        raise AssertionError("extraction ou répertoire temporaire")
+    for target, name in ((zipfile.ZipFile, 'extract'), (zipfile.ZipFile, 'extractall'), (tempfile, 'mkdtemp'),
+                         (tempfile, 'TemporaryDirectory'), (shutil, 'rmtree'), (os, 'walk')):
+        monkeypatch.setattr(target, name, forbidden)
+
+    light = create_light_version(deck, report.unused_images)
+    cropped = update_pptx_with_cropped_images(deck, report.cropped_images, workers=1)
+    assert light is not None and cropped is not None
+    assert package_problems(light) == [] and package_problems(cropped) == []
+    with zipfile.ZipFile(light) as archive:
+        assert 'ppt/media/orpheline.png' not in archive.namelist()
+    assert sorted(os.listdir(tmp_path)) == ['deck.pptx', 'deck_cropped.pptx', 'deck_light.pptx']
@@ -0,0 +1,49 @@
+from package_gc import repoint_blips
+
+A = 'http://schemas.openxmlformats.org/drawingml/2006/main'
+R = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+P = 'http://schemas.openxmlformats.org/presentationml/2006/main'
+
+
+def _picture(blip, src_rect, fill='p:blipFill'):
+    return f'<p:pic><{fill}>{blip}{src_rect}</{fill}></p:pic>'
+
+
+def test_prefixed_blips_are_repointed():
+    xml = (f'<p:sld xmlns:p="{P}" xmlns:a="{A}" xmlns:r="{R}">'
+           + _picture('<a:blip r:embed="rId2"/>', '<a:srcRect l="20000" r="10000"/><a:stretch/>')
+           + _picture('<a:blip r:embed="rId3"/>', '<a:srcRect t="5000"/>')
+           + '</p:sld>').encode()
+    result, patched = repoint_blips(xml, {1: ('rId9', (0, 120, 0, 0))})
+    assert patched == 1
+    assert b'<a:blip r:embed="rId2"/><a:srcRect l="20000" r="10000"/>' in result
+    assert b'<a:blip r:embed="rId9"/><a:srcRect t="120"/>' in result
+
+
+def test_blips_are_matched_by_namespace_not_prefix():
+    # Espace de noms DrawingML par défaut, relations sous un autre préfixe déclaré sur la forme
+    xml = (f'<p:sld xmlns:p="{P}" xmlns="{A}">'
+           f'<p:pic xmlns:rel="{R}"><p:blipFill><blip rel:embed="rId2"><extLst/></blip>'
+           '<srcRect l="20000"><extLst/></srcRect><stretch/></p:blipFill></p:pic>'
+           '</p:sld>').encode()
+    result, patched = repoint_blips(xml, {0: ('rId5', (0, 0, 0, 0))})
+    assert patched == 1
+    assert b'<blip rel:embed="rId5"><extLst/></blip><srcRect/><stretch/>' in result
+
+
+def test_foreign_blips_and_missing_ordinals_are_not_counted():
+    xml = (f'<p:sld xmlns:p="{P}" xmlns:a="urn:other" xmlns:r="{R}">'
+           + _picture('<a:blip r:embed="rId2"/>', '<a:srcRect l="20000"/>')
+           + '</p:sld>').encode()
+    result, patched = repoint_blips(xml, {0: ('rId5', (0, 0, 0, 0))})
+    assert patched == 0
+    assert result == xml
+
+
+def test_src_rect_outside_the_blip_fill_is_kept():
+    xml = (f'<p:sld xmlns:p="{P}" xmlns:a="{A}" xmlns:r="{R}">'
+           + _picture('<a:blip r:embed="rId2"/>', '<a:stretch/>')
+           + '<a:srcRect l="1"/></p:sld>').encode()
+    result, patched = repoint_blips(xml, {0: (None, (0, 0, 0, 0))})
+    assert patched == 1
+    assert result == xml
@@ -0,0 +1,23 @@
+import os
+
+from slim_cli import collect_pptx_files
+
+
+def _touch(path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b'PK')
+    return str(path)
+
+
+def test_outputs_are_skipped_for_directories_globs_and_explicit_paths(tmp_path):
+    deck = _touch(tmp_path / 'a' / 'deck.pptx')
+    light = _touch(tmp_path / 'a' / 'deck_light.pptx')
+    cropped = _touch(tmp_path / 'a' / 'deck_CROPPED.pptx')
+    other = _touch(tmp_path / 'b' / 'autre.pptx')
+    _touch(tmp_path / 'b' / 'notes.txt')
+
+    assert collect_pptx_files([str(tmp_path)]) == [deck, other]
+    assert collect_pptx_files([os.path.join(str(tmp_path), '**', '*.pptx')]) == [deck, other]
+    assert collect_pptx_files([light, cropped, deck]) == [deck]
+    # Un même fichier désigné plusieurs fois n'est traité qu'une fois
+    assert collect_pptx_files([deck, str(tmp_path / 'a'), os.path.join(str(tmp_path), 'a', '*.pptx')]) == [deck]